@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class BackendConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'backend'
+
+    def ready(self):
+        from .metrics import install_query_observer
+        install_query_observer()
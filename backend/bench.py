@@ -0,0 +1,235 @@
+# backend/bench.py
+
+"""
+In-process load drivers for comparing the WSGI and ASGI entry points.
+
+Requests go straight into the application callables, so the numbers show
+the cost of Django, the views and the database, not of a web server or
+the network.
+"""
+
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Query count of the benchmark request running in this context, if counted
+_query_count = ContextVar('bench_query_count', default=None)
+
+
+class BenchRequest:
+    """One request template: method, path (with query string), body and headers"""
+    __slots__ = ('name', 'method', 'path', 'query', 'body', 'headers')
+
+    def __init__(self, name, method, path, body=b'', headers=None):
+        self.name = name
+        self.method = method
+        self.path, _, self.query = path.partition('?')
+        self.body = body
+        self.headers = {'host': 'localhost', **(headers or {})}
+        if body:
+            self.headers.setdefault('content-type', 'application/json')
+            self.headers['content-length'] = str(len(body))
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(results, elapsed):
+    """
+    results: list of (latency seconds, status, queries or None) -> report
+    dict (latencies in ms). Queries per request are included when counted.
+    """
+    latencies = sorted(latency for latency, _, _ in results)
+    errors = sum(1 for _, status, _ in results if status >= 400)
+    report = {
+        'requests': len(results),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'rps': round(len(results) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+    queries = [count for _, _, count in results if count is not None]
+    if queries:
+        report['queries_per_request'] = round(sum(queries) / len(queries), 2)
+    return report
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _attach_counter(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def install_query_counter():
+    """
+    Count queries on every connection of this process, including ones
+    opened later by other threads. Drivers built with count_queries=True
+    then report how many queries each request ran.
+    """
+    connection_created.connect(_attach_counter, dispatch_uid='bench-query-counter')
+    for connection in connections.all(initialized_only=True):
+        _attach_counter(None, connection)
+
+
+class _Counted:
+    """Context manager giving one request its own query counter"""
+    __slots__ = ('enabled', 'counter', 'token')
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.counter = [0]
+
+    def __enter__(self):
+        if self.enabled:
+            self.token = _query_count.set(self.counter)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            _query_count.reset(self.token)
+
+    @property
+    def queries(self):
+        return self.counter[0] if self.enabled else None
+
+
+class WsgiDriver:
+    """Calls a WSGI application from ``concurrency`` threads, like a threaded server"""
+
+    def __init__(self, app, count_queries=False):
+        self.app = app
+        self.count_queries = count_queries
+
+    def environ(self, request):
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'PATH_INFO': request.path,
+            'QUERY_STRING': request.query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(request.body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in request.headers.items():
+            key = name.upper().replace('-', '_')
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = f'HTTP_{key}'
+            environ[key] = value
+        return environ
+
+    def call(self, request):
+        status = []
+
+        def start_response(line, headers, exc_info=None):
+            status.append(int(line.split(' ', 1)[0]))
+
+        with _Counted(self.count_queries) as counted:
+            started = time.perf_counter()
+            response = self.app(self.environ(request), start_response)
+            try:
+                for _ in response:
+                    pass
+            finally:
+                if hasattr(response, 'close'):
+                    response.close()
+            latency = time.perf_counter() - started
+        return latency, status[0], counted.queries
+
+    def run(self, requests, concurrency):
+        """Issue every request in ``requests``; returns (results, elapsed seconds)"""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(self.call, requests))
+        return results, time.perf_counter() - started
+
+
+class AsgiDriver:
+    """Runs ``concurrency`` client coroutines against an ASGI application on one event loop"""
+
+    def __init__(self, app, count_queries=False):
+        self.app = app
+        self.count_queries = count_queries
+
+    def scope(self, request):
+        return {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': request.method,
+            'scheme': 'http',
+            'path': request.path,
+            'raw_path': request.path.encode(),
+            'query_string': request.query.encode(),
+            'root_path': '',
+            'headers': [(name.lower().encode(), value.encode()) for name, value in request.headers.items()],
+            'client': ('127.0.0.1', 50000),
+            'server': ('localhost', 80),
+        }
+
+    async def call(self, request):
+        body_sent = False
+        finished = asyncio.Event()
+        status = []
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {'type': 'http.request', 'body': request.body, 'more_body': False}
+            # Only a disconnect comes next; the client stays until the response is done
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                finished.set()
+
+        with _Counted(self.count_queries) as counted:
+            started = time.perf_counter()
+            await self.app(self.scope(request), receive, send)
+            latency = time.perf_counter() - started
+        return latency, status[0], counted.queries
+
+    async def _run(self, requests, concurrency):
+        queue = iter(enumerate(requests))
+        results = [None] * len(requests)
+
+        async def client():
+            for index, request in queue:
+                results[index] = await self.call(request)
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return results
+
+    def run(self, requests, concurrency):
+        """Issue every request in ``requests``; results are in request order"""
+        started = time.perf_counter()
+        results = asyncio.run(self._run(requests, concurrency))
+        return results, time.perf_counter() - started
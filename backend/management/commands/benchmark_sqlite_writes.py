@@ -0,0 +1,169 @@
+# backend/management/commands/benchmark_sqlite_writes.py
+
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from backend.bench import percentile
+from backend.sqlite import WriteSerializer
+
+PROFILES = ('default', 'production', 'serialized')
+
+
+def submission(alias, writer, n):
+    """
+    One write shaped like a quiz submission: read the learner's progress row,
+    log the attempt, then update progress. A deferred transaction that reads
+    first has to upgrade to the write lock, which is where SQLite gives up
+    with "database is locked" rather than waiting.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT score FROM bench_progress WHERE id = %s', [writer])
+        cursor.fetchone()
+        cursor.execute('INSERT INTO bench_attempt (writer, n, payload) VALUES (%s, %s, %s)', [writer, n, 'x' * 200])
+        cursor.execute('UPDATE bench_progress SET score = %s, attempts = attempts + 1 WHERE id = %s', [n % 100, writer])
+
+
+class Command(BaseCommand):
+    help = 'Drive concurrent write transactions at a target rate against each SQLite profile and count lock errors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=float, default=200, help='Target writes per second across all writers')
+        parser.add_argument('--writers', type=int, default=16, help='Concurrent writer threads')
+        parser.add_argument('--seconds', type=float, default=5, help='Duration of each run')
+        parser.add_argument('--profiles', default=','.join(PROFILES),
+                            help=f'Comma-separated subset of {", ".join(PROFILES)}')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        profiles = [p.strip() for p in options['profiles'].split(',') if p.strip()]
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f'Unknown profile(s): {", ".join(sorted(unknown))}')
+        if options['rate'] <= 0 or options['writers'] < 1 or options['seconds'] <= 0:
+            raise CommandError('--rate, --writers and --seconds must be positive')
+
+        report = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                alias = self.add_database(profile, os.path.join(directory, f'{profile}.sqlite3'), options['writers'])
+                try:
+                    report[profile] = self.run_profile(alias, profile, options)
+                finally:
+                    connections[alias].close()
+                    del connections[alias]
+                    del connections.settings[alias]
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_table(report, options)
+
+    def add_database(self, profile, path, writers):
+        """Register a scratch database configured like DATABASES['default'] under the profile"""
+        alias = f'bench_{profile}'
+        config = copy.deepcopy(connections.settings['default'])
+        config.update(NAME=path, OPTIONS={}, CONN_MAX_AGE=0)
+        if profile != 'default':
+            config['OPTIONS'] = dict(getattr(settings, 'SQLITE_PRODUCTION_OPTIONS', {}))
+        connections.settings[alias] = config
+        if connections[alias].vendor != 'sqlite':
+            raise CommandError('This benchmark only runs against SQLite')
+        with connections[alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE bench_progress (id INTEGER PRIMARY KEY, score INTEGER, attempts INTEGER)')
+            cursor.execute('CREATE TABLE bench_attempt (id INTEGER PRIMARY KEY, writer INTEGER, n INTEGER, payload TEXT)')
+            cursor.executemany('INSERT INTO bench_progress VALUES (%s, 0, 0)', [(i,) for i in range(writers)])
+        return alias
+
+    def run_profile(self, alias, profile, options):
+        writers = options['writers']
+        interval = writers / options['rate']
+        deadline = time.perf_counter() + options['seconds']
+        serializer = WriteSerializer(alias, getattr(settings, 'SQLITE_WRITE_BATCH_SIZE', 64)) \
+            if profile == 'serialized' else None
+        results = []
+        results_lock = threading.Lock()
+
+        def write(writer, n):
+            if serializer is not None:
+                serializer.submit(submission, alias, writer, n).result()
+            else:
+                with transaction.atomic(using=alias):
+                    submission(alias, writer, n)
+
+        def worker(writer):
+            local = []
+            # Stagger the writers so the target rate is spread evenly
+            next_at = time.perf_counter() + interval * writer / writers
+            n = 0
+            try:
+                while next_at < deadline:
+                    delay = next_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    started = time.perf_counter()
+                    try:
+                        write(writer, n)
+                        outcome = 'ok'
+                    except OperationalError as e:
+                        outcome = 'locked' if 'locked' in str(e) else 'error'
+                    except Exception:
+                        outcome = 'error'
+                    local.append((time.perf_counter() - started, outcome))
+                    n += 1
+                    # Keep to the schedule after a slow write, but do not
+                    # pile up more than one missed slot
+                    next_at = max(next_at + interval, time.perf_counter() - interval)
+            finally:
+                connections[alias].close()
+                with results_lock:
+                    results.extend(local)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if serializer is not None:
+            serializer.stop()
+        elapsed = time.perf_counter() - started
+
+        committed = [latency for latency, outcome in results if outcome == 'ok']
+        latencies = sorted(latency for latency, _ in results)
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM bench_attempt')
+            rows = cursor.fetchone()[0]
+        return {
+            'attempted': len(results),
+            'committed': len(committed),
+            'rows_written': rows,
+            'lock_errors': sum(1 for _, outcome in results if outcome == 'locked'),
+            'other_errors': sum(1 for _, outcome in results if outcome == 'error'),
+            'writes_per_second': round(len(committed) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        }
+
+    def print_table(self, report, options):
+        self.stdout.write(
+            f"target {options['rate']:g} writes/s from {options['writers']} writers for {options['seconds']:g}s\n"
+        )
+        self.stdout.write(
+            f"{'profile':<11} {'attempted':>9} {'committed':>9} {'locked':>7} {'errors':>7} "
+            f"{'writes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for profile, row in report.items():
+            self.stdout.write(
+                f"{profile:<11} {row['attempted']:>9} {row['committed']:>9} {row['lock_errors']:>7} "
+                f"{row['other_errors']:>7} {row['writes_per_second']:>9} {row['p50_ms']:>8} "
+                f"{row['p95_ms']:>8} {row['p99_ms']:>8}"
+            )
@@ -0,0 +1,260 @@
+# backend/management/commands/check_query_plans.py
+
+import io
+import json
+import re
+import threading
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+
+from certificates.minting import claim_batch
+from certificates.models import Certificate
+from courses.models import Course, Question, Quiz, QuizAttempt, UserProgress
+
+# "SCAN courses_course" is a full table scan; "SCAN ... USING INDEX" walks an
+# index in order (bounded by LIMIT) and "SEARCH" is an index lookup.
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\S+)(?: AS \S+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Statements worth a plan; inserts and transaction control have none
+PLANNED = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+PASSWORD = 'check-query-plans-1'
+
+# Caches off so every request reaches the database; no replicas, throttles
+# or write serializer, whose queries would run on connections outside the
+# capture or never happen.
+CAPTURE_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    'DATABASE_REPLICAS': [],
+    'THROTTLES': {},
+    'CONCURRENCY_LIMITS': {},
+    'SQLITE_WRITE_SERIALIZER': False,
+    'ALLOWED_HOSTS': ['testserver'],
+    'DEBUG': False,
+}
+
+
+class QueryRecorder:
+    """
+    Records (label, sql, params) for every statement on every connection.
+
+    CaptureQueriesContext only sees the calling thread's connection; login
+    and registration run their queries on the CPU offload pool, so the
+    recorder is attached to each connection as it is created instead.
+    """
+
+    def __init__(self):
+        self.label = None
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.label is not None and not many:
+            with self.lock:
+                self.queries.append((self.label, sql, params))
+        return execute(sql, params, many, context)
+
+    def attach(self, sender=None, connection=None, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def start(self):
+        connection_created.connect(self.attach, dispatch_uid='check-query-plans')
+        for connection in connections.all(initialized_only=True):
+            self.attach(connection=connection)
+
+    def stop(self):
+        self.label = None
+        connection_created.disconnect(dispatch_uid='check-query-plans')
+        for connection in connections.all(initialized_only=True):
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+
+def fetch(client, method, path, **kwargs):
+    """Make a request and read the whole body, so a streamed one runs its queries"""
+    response = getattr(client, method)(path, **kwargs)
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def seed():
+    """The smallest dataset on which every endpoint reaches its queries"""
+    User = get_user_model()
+    courses = [
+        Course.objects.create(
+            title=f'Plan check {i}', slug=f'plan-check-{i}', description='Query plan check',
+            category='ai', difficulty='beginner', duration=10, content='# Plan check\n\n*content*',
+        )
+        for i in range(3)
+    ]
+    quiz = Quiz.objects.create(course=courses[0], passing_score=50)
+    question = Question.objects.create(
+        quiz=quiz, question_text='?', option_a='a', option_b='b', option_c='c', option_d='d',
+        correct_answer='A', points=1,
+    )
+    learner = User.objects.create_user(
+        username='plan-learner', email='plan-learner@example.com', password=PASSWORD,
+        wallet_address='0x' + '1' * 40,
+    )
+    UserProgress.objects.create(user=learner, course=courses[1], score=10)
+    certificate = Certificate.objects.create(user=learner, course=courses[2], score=90)
+    QuizAttempt.objects.create(user=learner, course=courses[1], score=10, passed=False)
+    expired = SessionStore()
+    expired.set_expiry(-1)
+    expired.create()
+    return courses, question, learner, certificate
+
+
+def exercise(recorder):
+    """Drive each endpoint and background job once, labelling its queries"""
+    courses, question, learner, certificate = seed()
+    course = courses[0].slug
+    client = Client()
+
+    def run(label, method, path, **kwargs):
+        recorder.label = label
+        body = fetch(client, method, path, **kwargs)
+        recorder.label = None
+        return body
+
+    def post_json(label, path, data):
+        return run(label, 'post', path, data=json.dumps(data), content_type='application/json')
+
+    post_json('users:register', '/api/users/register/', {
+        'username': 'plan-new', 'email': 'plan-new@example.com', 'password': PASSWORD,
+    })
+    post_json('users:login', '/api/users/login/', {'username': learner.username, 'password': PASSWORD})
+
+    run('courses:list', 'get', '/api/courses/?page_size=1')
+    cursor = json.loads(fetch(client, 'get', '/api/courses/?page_size=1'))['next_cursor']
+    run('courses:list (cursor)', 'get', f'/api/courses/?page_size=1&cursor={cursor}')
+    run('courses:list (category)', 'get', '/api/courses/?category=ai')
+    run('courses:list (difficulty)', 'get', '/api/courses/?difficulty=beginner')
+    run('courses:list (category + difficulty)', 'get', '/api/courses/?category=ai&difficulty=beginner')
+    run('courses:list (category, cursor)', 'get', f'/api/courses/?category=ai&page_size=1&cursor={cursor}')
+    run('courses:search', 'get', '/api/courses/search/?q=plan')
+    run('courses:detail', 'get', f'/api/courses/{course}/')
+    run('courses:content', 'get', f'/api/courses/{course}/content/')
+    run('courses:stats', 'get', f'/api/courses/{course}/stats/')
+    run('courses:stats bulk', 'get', f'/api/courses/stats/?slugs={course},{courses[1].slug}')
+    run('courses:quiz', 'get', f'/api/courses/{course}/quiz/')
+    post_json('courses:submit', f'/api/courses/{course}/submit/', {'answers': {str(question.pk): 'A'}})
+    run('courses:progress', 'get', '/api/courses/progress/')
+
+    run('certificates:list', 'get', '/api/certificates/')
+    run('certificates:detail', 'get', f'/api/certificates/{certificate.certificate_id}/?format=json')
+    run('certificates:verify', 'get', f'/api/certificates/verify/{certificate.certificate_id}/')
+    post_json('certificates:verify bulk', '/api/certificates/verify/', {
+        'certificate_ids': [certificate.certificate_id, 'SP-0000ABCD'],
+    })
+    post_json('certificates:update-blockchain', '/api/certificates/update-blockchain/', {
+        'certificate_id': certificate.certificate_id, 'transaction_hash': '0x' + 'a' * 64, 'nft_token_id': '1',
+    })
+    post_json('certificates:mint', f'/api/certificates/mint/{certificate.pk}/', {
+        'transaction_hash': '0x' + 'a' * 64, 'nft_token_id': '1',
+    })
+
+    run('dashboard', 'get', '/api/dashboard/')
+    run('pages:course', 'get', f'/course/{course}/')
+    run('pages:verify', 'get', f'/verify/?id={certificate.certificate_id}')
+    post_json('users:update-wallet', '/api/users/update-wallet/', {'wallet_address': '0x' + '2' * 40})
+    run('users:profile', 'get', '/api/users/profile/')
+    run('users:logout', 'get', '/api/users/logout/')
+
+    # Background jobs and admin lookups, through the code that runs them
+    recorder.label = 'certificates:mint queue'
+    claim_batch(50)
+    recorder.label = 'certificates:admin tx search'
+    model_admin = admin.site._registry[Certificate]
+    list(model_admin.get_search_results(None, Certificate.objects.all(), '0x' + 'a' * 64)[0])
+    recorder.label = 'courses:rollup'
+    call_command('rollup_quiz_attempts', '--retention-days', '0', stdout=io.StringIO())
+    recorder.label = 'sessions:purge'
+    call_command('purge_sessions', stdout=io.StringIO())
+    recorder.label = None
+
+
+def explain(connection, sql, params):
+    """The detail column of EXPLAIN QUERY PLAN, one step per row"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def capture_plans(verbosity=0):
+    """
+    Run exercise() against a throwaway test database and return
+    (label, sql, plan) for each distinct statement it issued, in order.
+    The plans are taken on that database, before it is destroyed: the
+    one the command was started with may be empty or unmigrated.
+    """
+    connection = connections['default']
+    old_name = connection.settings_dict['NAME']
+    recorder = QueryRecorder()
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        with override_settings(**CAPTURE_SETTINGS):
+            recorder.start()
+            try:
+                exercise(recorder)
+            finally:
+                recorder.stop()
+
+        seen = set()
+        plans = []
+        for label, sql, params in recorder.queries:
+            if sql in seen or not sql.lstrip().upper().startswith(PLANNED):
+                continue
+            seen.add(sql)
+            plans.append((label, sql, explain(connection, sql, params)))
+        return plans
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+class Command(BaseCommand):
+    help = (
+        'Call every endpoint on a throwaway test database, run EXPLAIN QUERY PLAN on the SQL '
+        'they issue and fail on full table scans'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strict', action='store_true',
+                            help='Also fail on sorts that need a temporary B-tree')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN checks only run against SQLite')
+
+        plans = capture_plans()
+        failures = []
+        for label, sql, plan in plans:
+            problems = [step for step in plan if FULL_SCAN_RE.match(step)]
+            if options['strict']:
+                problems += [step for step in plan if step.startswith(TEMP_SORT)]
+
+            if problems:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f'FAIL {label}'))
+            elif options['verbosity'] > 1 or any(step.startswith(TEMP_SORT) for step in plan):
+                self.stdout.write(f'ok   {label}')
+            else:
+                continue
+            if options['verbosity'] > 1 or problems:
+                self.stdout.write(f'       {sql}')
+            for step in plan:
+                self.stdout.write(f'       {step}')
+
+        if failures:
+            raise CommandError(
+                f'{len(failures)} queries fail the plan check: {", ".join(dict.fromkeys(failures))}'
+            )
+        self.stdout.write(self.style.SUCCESS(f'All {len(plans)} endpoint queries use an index'))
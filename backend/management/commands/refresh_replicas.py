@@ -0,0 +1,56 @@
+# backend/management/commands/refresh_replicas.py
+
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into each local replica with the online backup API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('replicas', nargs='*', help='Replica aliases (default: DATABASE_REPLICAS)')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep refreshing every this many seconds instead of once')
+
+    def handle(self, *args, **options):
+        replicas = options['replicas'] or getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            raise CommandError('No replicas configured; set SQLITE_REPLICAS or DATABASE_REPLICAS')
+        for alias in ['default', *replicas]:
+            if alias not in connections.settings:
+                raise CommandError(f'Unknown database {alias!r}')
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError('Replicas can only be refreshed this way for SQLite databases')
+        if options['interval'] < 0:
+            raise CommandError('--interval must not be negative')
+
+        while True:
+            started = time.perf_counter()
+            for alias in replicas:
+                self.refresh(alias)
+            if options['verbosity'] > 0:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Refreshed {", ".join(replicas)} in {time.perf_counter() - started:.2f}s'
+                ))
+            if not options['interval']:
+                return
+            time.sleep(max(0, options['interval'] - (time.perf_counter() - started)))
+
+    def refresh(self, alias):
+        """
+        One pass of sqlite3's online backup: the primary stays readable and
+        writable throughout (in WAL mode the copy only holds a read
+        snapshot), and readers of the replica see either the old or the new
+        copy, never a mix.
+        """
+        source = sqlite3.connect(connections['default'].settings_dict['NAME'])
+        target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
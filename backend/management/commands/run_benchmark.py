@@ -0,0 +1,366 @@
+# backend/management/commands/run_benchmark.py
+
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.sessions.models import Session
+from django.core.asgi import get_asgi_application
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections, transaction
+from django.db.backends.base.creation import TEST_DATABASE_PREFIX
+from django.test import Client, override_settings
+
+from backend.bench import AsgiDriver, BenchRequest, WsgiDriver, install_query_counter, summarize
+from certificates.identifiers import allocate_certificate_ids
+from certificates.models import Certificate
+from courses.models import Course, Question, Quiz
+
+PREFIX = 'bench-run'
+SERVERS = ('wsgi', 'asgi')
+# Default share of each scenario in the mixed workload
+MIX = {'catalogue': 35, 'quiz': 15, 'submit': 10, 'verify': 25, 'dashboard': 15}
+CATEGORIES = [choice for choice, _ in Course.CATEGORY_CHOICES]
+DIFFICULTIES = [choice for choice, _ in Course.DIFFICULTY_CHOICES]
+
+
+def parse_mix(value):
+    """'catalogue=40,verify=60' -> {'catalogue': 40, 'verify': 60}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in MIX:
+            raise CommandError(f'Unknown scenario {name!r}; choose from {", ".join(MIX)}')
+        try:
+            mix[name] = int(weight)
+        except ValueError:
+            raise CommandError(f'Invalid weight for {name!r}: {weight!r}')
+        if mix[name] < 0:
+            raise CommandError(f'Weight for {name!r} must not be negative')
+    if not sum(mix.values()):
+        raise CommandError('The workload mix needs at least one positive weight')
+    return mix
+
+
+def is_test_database(name):
+    """An in-memory database or one named like Django's test databases"""
+    name = str(name)
+    return name == ':memory:' or 'mode=memory' in name or os.path.basename(name).startswith(TEST_DATABASE_PREFIX)
+
+
+def _worker(index, server, requests, concurrency, barrier, results):
+    """
+    Child process: warm up, wait for the other workers, run its share of
+    the workload and send back (index, (results in request order, elapsed)).
+    """
+    try:
+        install_query_counter()
+        if server == 'wsgi':
+            driver = WsgiDriver(get_wsgi_application(), count_queries=True)
+        else:
+            driver = AsgiDriver(get_asgi_application(), count_queries=True)
+
+        # Reads only, so warming up leaves the dataset as seeded
+        warmup = [request for request in requests if request.method == 'GET'][:concurrency * 2]
+        if warmup:
+            driver.run(warmup, concurrency)
+        barrier.wait()
+        results.put((index, driver.run(requests, concurrency)))
+    except BaseException:
+        # Release the other workers and the parent instead of leaving them waiting
+        barrier.abort()
+        results.put((index, None))
+        raise
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a dataset into a throwaway database and drive a mixed API workload against the '
+        'WSGI and ASGI apps from several processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Learners to seed')
+        parser.add_argument('--courses', type=int, default=20, help='Courses to seed, each with a quiz')
+        parser.add_argument('--questions', type=int, default=10, help='Questions per quiz')
+        parser.add_argument('--certificates', type=int, default=3, help='Certificates seeded per learner')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per server, across all processes')
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes per server')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Concurrent clients per process (threads for WSGI, coroutines for ASGI)')
+        parser.add_argument('--servers', default=','.join(SERVERS), help=f'Comma-separated subset of {", ".join(SERVERS)}')
+        parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in MIX.items()),
+                            help='Scenario weights, e.g. catalogue=40,verify=60')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the dataset and the workload')
+        parser.add_argument('--keep-throttles', action='store_true',
+                            help='Leave THROTTLES and CONCURRENCY_LIMITS in force (off by default)')
+        parser.add_argument('--database',
+                            help='SQLite file to seed and benchmark, created and migrated if needed. '
+                                 'Required unless the configured database is a test database')
+        parser.add_argument('--keep-data', action='store_true', help='Do not delete the seeded dataset')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--table', action='store_true', help='Print a table instead of the JSON report')
+
+    def handle(self, *args, **options):
+        servers = [s.strip() for s in options['servers'].split(',') if s.strip()]
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError(f'Unknown server(s): {", ".join(sorted(unknown))}')
+        for name in ('users', 'courses', 'questions', 'requests', 'processes', 'concurrency'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be positive')
+        if not 0 <= options['certificates'] <= options['courses']:
+            raise CommandError('--certificates must be between 0 and --courses')
+        mix = parse_mix(options['mix'])
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('run_benchmark needs the fork start method (Linux or macOS)')
+
+        self.use_throwaway_database(options['database'])
+
+        # Replicas are copies of the real database, not of the throwaway one
+        overrides = {'DEBUG': False, 'DATABASE_REPLICAS': []}
+        if not options['keep_throttles']:
+            overrides.update(THROTTLES={}, CONCURRENCY_LIMITS={})
+
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        dataset = self.seed(options, rng)
+        seeded_in = time.perf_counter() - started
+        try:
+            with override_settings(**overrides):
+                workload = self.build_workload(dataset, mix, options['requests'], rng)
+                # Each server starts from the seeded data, not from the attempts,
+                # progress and certificates the previous one submitted
+                snapshot = self.snapshot()
+                try:
+                    results = {}
+                    for server in servers:
+                        self.restore(snapshot)
+                        results[server] = self.run_server(server, workload, options)
+                finally:
+                    snapshot.close()
+        finally:
+            if not options['keep_data']:
+                self.cleanup(dataset)
+
+        report = {
+            'config': {
+                name: options[name] for name in (
+                    'users', 'courses', 'questions', 'certificates', 'requests',
+                    'processes', 'concurrency', 'seed',
+                )
+            },
+            'environment': {
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connections['default'].vendor,
+                'cpus': multiprocessing.cpu_count(),
+            },
+            'mix': mix,
+            'seed_seconds': round(seeded_in, 2),
+            'results': results,
+        }
+        if options['table']:
+            self.print_table(report)
+            return
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def use_throwaway_database(self, path):
+        """
+        Point the default database at ``path``, or check that it already is a
+        test database: the benchmark creates and deletes users, courses and
+        certificates, which must never happen in a real one.
+        """
+        connection = connections['default']
+        if connection.vendor != 'sqlite':
+            raise CommandError('run_benchmark only runs against SQLite')
+        if path is None:
+            if not is_test_database(connection.settings_dict['NAME']):
+                raise CommandError(
+                    'run_benchmark seeds and deletes data; pass --database with a scratch SQLite file, '
+                    f'or configure a database whose name starts with {TEST_DATABASE_PREFIX!r}'
+                )
+            return
+        if os.path.abspath(path) == os.path.abspath(str(connection.settings_dict['NAME'])):
+            raise CommandError('--database must not be the configured database')
+        connection.close()
+        # The same switch the test runner makes for a test database
+        settings.DATABASES['default']['NAME'] = path
+        connection.settings_dict['NAME'] = path
+        call_command('migrate', verbosity=0, interactive=False)
+
+    def seed(self, options, rng):
+        """Create (or recreate) the benchmark users, courses, quizzes and certificates"""
+        User = get_user_model()
+        self.cleanup({'users': User.objects.filter(username__startswith=f'{PREFIX}-'), 'sessions': []})
+        password = make_password('bench-password-1')
+
+        with transaction.atomic():
+            # One at a time, so the catalogue version and search index signals run
+            courses = [
+                Course.objects.create(
+                    title=f'Benchmark course {i}',
+                    slug=f'{PREFIX}-course-{i}',
+                    description=f'Seeded by run_benchmark ({i})',
+                    category=rng.choice(CATEGORIES),
+                    difficulty=rng.choice(DIFFICULTIES),
+                    duration=rng.randint(1, 20),
+                    content=f'# Course {i}\n\n' + 'Benchmark *content*. ' * 50,
+                )
+                for i in range(options['courses'])
+            ]
+            quizzes = Quiz.objects.bulk_create([Quiz(course=course, passing_score=70) for course in courses])
+            Question.objects.bulk_create([
+                Question(quiz=quiz, question_text=f'Question {n}', option_a='a', option_b='b',
+                         option_c='c', option_d='d', correct_answer=rng.choice('ABCD'), points=1)
+                for quiz in quizzes for n in range(options['questions'])
+            ])
+            User.objects.bulk_create([
+                User(username=f'{PREFIX}-user-{i}', email=f'{PREFIX}-user-{i}@example.com', password=password)
+                for i in range(options['users'])
+            ])
+            users = list(User.objects.filter(username__startswith=f'{PREFIX}-user-').order_by('id'))
+
+            pairs = [(user, course) for user in users for course in rng.sample(courses, options['certificates'])]
+            ids = allocate_certificate_ids(len(pairs))
+            Certificate.objects.bulk_create([
+                Certificate(user=user, course=course, score=rng.randint(70, 100), certificate_id=certificate_id)
+                for (user, course), certificate_id in zip(pairs, ids)
+            ])
+
+        answers = {}
+        for question_id, quiz_id, correct in Question.objects.filter(quiz__in=quizzes).values_list(
+            'id', 'quiz_id', 'correct_answer',
+        ):
+            answers.setdefault(quiz_id, {})[str(question_id)] = correct
+        cookies = {}
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            cookies[user.pk] = client.cookies['sessionid'].value
+
+        return {
+            'users': User.objects.filter(pk__in=[user.pk for user in users]),
+            'user_ids': [user.pk for user in users],
+            'courses': [(course.slug, answers[quiz.pk]) for course, quiz in zip(courses, quizzes)],
+            'certificates': list(Certificate.objects.filter(user__in=users).values_list('certificate_id', flat=True)),
+            'sessions': list(cookies.values()),
+            'cookies': cookies,
+        }
+
+    def snapshot(self):
+        """Copy the seeded database into memory with SQLite's backup API"""
+        connection = connections['default']
+        connection.ensure_connection()
+        snapshot = sqlite3.connect(':memory:')
+        connection.connection.backup(snapshot)
+        return snapshot
+
+    def restore(self, snapshot):
+        """Overwrite the database with a copy taken by snapshot()"""
+        connection = connections['default']
+        connection.ensure_connection()
+        snapshot.backup(connection.connection)
+
+    def build_workload(self, dataset, mix, count, rng):
+        """``count`` requests drawn from the scenario mix, in a reproducible order"""
+        scenarios = rng.choices(list(mix), weights=list(mix.values()), k=count)
+        workload = []
+        for scenario in scenarios:
+            user_id = rng.choice(dataset['user_ids'])
+            session = {'cookie': f"sessionid={dataset['cookies'][user_id]}"}
+            slug, answers = rng.choice(dataset['courses'])
+            if scenario == 'catalogue':
+                query = rng.choice(['', f'?category={rng.choice(CATEGORIES)}', f'?difficulty={rng.choice(DIFFICULTIES)}'])
+                workload.append(BenchRequest(scenario, 'GET', f'/api/courses/{query}'))
+            elif scenario == 'quiz':
+                workload.append(BenchRequest(scenario, 'GET', f'/api/courses/{slug}/quiz/', headers=session))
+            elif scenario == 'submit':
+                # Mostly passing attempts, so certificates get issued too
+                given = {qid: (answer if rng.random() < 0.8 else 'X') for qid, answer in answers.items()}
+                workload.append(BenchRequest(
+                    scenario, 'POST', f'/api/courses/{slug}/submit/',
+                    body=json.dumps({'answers': given}).encode(), headers=session,
+                ))
+            elif scenario == 'verify':
+                certificate_id = rng.choice(dataset['certificates']) if dataset['certificates'] else 'SP-MISSING'
+                workload.append(BenchRequest(scenario, 'GET', f'/api/certificates/verify/{certificate_id}/'))
+            else:
+                workload.append(BenchRequest(scenario, 'GET', '/api/dashboard/', headers=session))
+        return workload
+
+    def run_server(self, server, workload, options):
+        """Split the workload over --processes forked workers and summarise per scenario"""
+        processes = options['processes']
+        shares = [workload[i::processes] for i in range(processes)]
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(processes)
+        queue = context.Queue()
+
+        # Children must open their own connections
+        connections.close_all()
+        workers = [
+            context.Process(target=_worker, args=(index, server, share, options['concurrency'], barrier, queue))
+            for index, share in enumerate(shares)
+        ]
+        for worker in workers:
+            worker.start()
+        # Workers report in whatever order they finish
+        collected = dict(queue.get() for _ in workers)
+        for worker in workers:
+            worker.join()
+        if None in collected.values():
+            raise CommandError(f'A {server} worker process failed')
+
+        # Workers started together; the slowest one bounds the run
+        elapsed = max(elapsed for _, elapsed in collected.values())
+        by_scenario = {}
+        every = []
+        for index, share in enumerate(shares):
+            measured, _ = collected[index]
+            for request, result in zip(share, measured):
+                by_scenario.setdefault(request.name, []).append(result)
+                every.append(result)
+        report = {name: summarize(results, elapsed) for name, results in sorted(by_scenario.items())}
+        report['all'] = summarize(every, elapsed)
+        return report
+
+    def cleanup(self, dataset):
+        """Delete the seeded users (with their certificates, progress and attempts), courses and sessions"""
+        dataset['users'].delete()
+        Course.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+        Session.objects.filter(session_key__in=dataset['sessions']).delete()
+
+    def print_table(self, report):
+        config = report['config']
+        self.stdout.write(
+            f"{config['requests']} requests per server over {config['processes']} processes, "
+            f"concurrency {config['concurrency']} each\n"
+        )
+        self.stdout.write(
+            f"{'scenario':<10} {'server':<6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+            f"{'queries':>8} {'errors':>7}"
+        )
+        for server, scenarios in report['results'].items():
+            for scenario, row in scenarios.items():
+                self.stdout.write(
+                    f"{scenario:<10} {server:<6} {row['rps']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+                    f"{row['p99_ms']:>9} {row.get('queries_per_request', '-'):>8} {row['errors']:>7}"
+                )
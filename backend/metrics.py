@@ -0,0 +1,344 @@
+# backend/metrics.py
+
+"""
+Per-view request metrics in Prometheus text format.
+
+MetricsMiddleware records, for each resolved URL name, a latency
+histogram, request counts by status, response sizes and the number and
+duration of the database queries the request ran. Every thread writes to
+its own shard without locking; shards are only summed when /metrics is
+scraped. With METRICS_DIR set, each worker process also writes its totals
+to ``<METRICS_DIR>/<pid>.json`` every METRICS_FLUSH_INTERVAL seconds and
+the endpoint adds up the files of all workers, so any one of them can
+answer a scrape.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'skillproof_'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+
+# name -> (type, help, buckets); counters have no buckets
+METRICS = {
+    'http_requests_total': ('counter', 'Requests by view, method and status', None),
+    'http_request_duration_seconds': ('histogram', 'Time to produce the full response', LATENCY_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'Response body size', SIZE_BUCKETS),
+    'db_queries_per_request': ('histogram', 'Database queries run by one request', QUERY_BUCKETS),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in database queries', None),
+}
+
+_request = ContextVar('metrics_request', default=None)
+
+
+class RequestMetrics:
+    """What one request has used so far; filled in by the query observer"""
+    __slots__ = ('started', 'queries', 'query_seconds', 'size')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.size = 0
+
+
+def _observe_query(execute, sql, params, many, context):
+    current = _request.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        current.queries += 1
+        current.query_seconds += time.perf_counter() - started
+
+
+def _attach_observer(sender, connection, **kwargs):
+    if _observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_observe_query)
+
+
+def install_query_observer():
+    """
+    Put the query observer on every connection, including the ones each
+    thread opens later: the ORM calls of an async view run on another
+    thread than the middleware, so a ``with connection.execute_wrapper()``
+    around the request would miss them. Called from the backend app's
+    ready(), before any connection is opened. Queries outside a request
+    are not counted.
+    """
+    connection_created.connect(_attach_observer, dispatch_uid='metrics-query-observer')
+    for connection in connections.all(initialized_only=True):
+        _attach_observer(None, connection)
+
+
+class Registry:
+    """
+    Metric values of this process, sharded per thread.
+
+    A shard maps (metric name, labels) to a list: [value] for counters,
+    per-bucket counts followed by the overflow count and the sum for
+    histograms. Only the owning thread writes to a shard, so recording
+    takes no lock.
+    """
+
+    def __init__(self):
+        self._reset()
+        self._last_flush = time.monotonic()
+        if hasattr(os, 'register_at_fork'):
+            # A forked worker starts from zero rather than re-reporting its parent's totals
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels, amount=1):
+        shard = self._shard()
+        values = shard.get((name, labels))
+        if values is None:
+            values = shard[(name, labels)] = [0]
+        values[0] += amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        shard = self._shard()
+        values = shard.get((name, labels))
+        if values is None:
+            values = shard[(name, labels)] = [0] * (len(buckets) + 2)
+        values[bisect_left(buckets, value)] += 1
+        values[-1] += value
+
+    def snapshot(self):
+        """This process's totals, summed over every thread's shard"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            for key, values in list(shard.items()):
+                _add(totals, key, values)
+        return totals
+
+    def maybe_flush(self):
+        """Write this process's totals to METRICS_DIR once the flush interval has passed"""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if not directory or time.monotonic() - self._last_flush < interval:
+            return
+        # Whoever gets here first flushes; the others carry on
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = time.monotonic()
+            self.flush(directory)
+        finally:
+            self._flush_lock.release()
+
+    def flush(self, directory=None):
+        directory = directory or getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return
+        path = Path(directory) / f'{os.getpid()}.json'
+        temporary = path.with_suffix('.tmp')
+        rows = [[name, list(labels), values] for (name, labels), values in self.snapshot().items()]
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary.write_text(json.dumps(rows))
+            # Readers see the old file or the new one, never half of it
+            os.replace(temporary, path)
+        except OSError:
+            logger.warning('Could not write metrics to %s', path, exc_info=True)
+
+    def collect(self):
+        """Totals of every worker: the METRICS_DIR files plus this process, live"""
+        totals = self.snapshot()
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return totals
+        own = f'{os.getpid()}.json'
+        for path in sorted(Path(directory).glob('*.json')):
+            if path.name == own:
+                continue
+            try:
+                rows = json.loads(path.read_text())
+            except (OSError, ValueError):
+                logger.warning('Skipping unreadable metrics file %s', path, exc_info=True)
+                continue
+            for name, labels, values in rows:
+                if name in METRICS:
+                    _add(totals, (name, tuple(tuple(pair) for pair in labels)), values)
+        return totals
+
+
+def _add(totals, key, values):
+    current = totals.get(key)
+    if current is None:
+        totals[key] = list(values)
+    else:
+        for i, value in enumerate(values):
+            current[i] += value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_text(totals):
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, values) for (metric, labels), values in totals.items() if metric == name)
+        full = PREFIX + name
+        lines.append(f'# HELP {full} {help_text}')
+        lines.append(f'# TYPE {full} {kind}')
+        for labels, values in series:
+            if kind == 'counter':
+                lines.append(f'{full}{_labels(labels)} {_number(values[0])}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, values):
+                cumulative += count
+                lines.append(f'{full}_bucket{_labels(labels, [("le", _number(float(bound)))])} {cumulative}')
+            cumulative += values[len(buckets)]
+            lines.append(f'{full}_bucket{_labels(labels, [("le", "+Inf")])} {cumulative}')
+            lines.append(f'{full}_sum{_labels(labels)} {_number(values[-1])}')
+            lines.append(f'{full}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+def record(request, response, current):
+    """Add one finished request to the registry"""
+    view = ('view', view_name(request))
+    method = request.method if request.method in METHODS else 'other'
+    registry.inc('http_requests_total', (view, ('method', method), ('status', str(response.status_code))))
+    registry.observe('http_request_duration_seconds', (view, ('method', method)), time.perf_counter() - current.started)
+    registry.observe('http_response_size_bytes', (view,), current.size)
+    registry.observe('db_queries_per_request', (view,), current.queries)
+    registry.inc('db_query_duration_seconds_total', (view,), current.query_seconds)
+    registry.maybe_flush()
+
+
+def _measure_stream(request, response, current):
+    """
+    Streamed bodies are produced (and their queries run) after the view
+    returns; count them as the chunks are pulled and record at the end.
+    """
+    content = response.streaming_content
+    if response.is_async:
+        async def stream():
+            iterator = aiter(content)
+            try:
+                while True:
+                    token = _request.set(current)
+                    try:
+                        chunk = await anext(iterator)
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        _request.reset(token)
+                    current.size += len(chunk)
+                    yield chunk
+            finally:
+                record(request, response, current)
+    else:
+        def stream():
+            iterator = iter(content)
+            try:
+                while True:
+                    token = _request.set(current)
+                    try:
+                        chunk = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        _request.reset(token)
+                    current.size += len(chunk)
+                    yield chunk
+            finally:
+                record(request, response, current)
+    response.streaming_content = stream()
+    return response
+
+
+class MetricsMiddleware:
+    """Times each request and counts its queries and bytes; list it first in MIDDLEWARE"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        current = RequestMetrics()
+        token = _request.set(current)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self.finish(request, response, current)
+
+    async def __acall__(self, request):
+        current = RequestMetrics()
+        token = _request.set(current)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self.finish(request, response, current)
+
+    def finish(self, request, response, current):
+        if response.streaming:
+            return _measure_stream(request, response, current)
+        current.size = len(response.content)
+        record(request, response, current)
+        return response
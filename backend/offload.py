@@ -0,0 +1,45 @@
+# backend/offload.py
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+
+
+def get_executor():
+    """
+    The bounded pool for CPU-heavy work called from async views.
+
+    Sized by CPU_OFFLOAD_WORKERS. Keeping it small stops a burst of
+    password hashes from occupying every thread the server has.
+    """
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, 'CPU_OFFLOAD_WORKERS', None) or min(4, os.cpu_count() or 1)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cpu-offload')
+    return _executor
+
+
+def offload(func):
+    """
+    Wrap a sync callable to run on the CPU pool from async code.
+
+    Unlike plain sync_to_async, this does not funnel the work through the
+    single thread-sensitive thread. The work may still touch the database:
+    pool threads live outside the request cycle, so their connections are
+    checked before and after each call the way request_started and
+    request_finished would.
+    """
+    @wraps(func)
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False, executor=get_executor())
@@ -0,0 +1,182 @@
+# backend/routers.py
+
+"""
+Read replicas for public, read-only views.
+
+Only views wrapped in ``replica_reads`` read from DATABASE_REPLICAS; every
+other query, and every write, goes to ``default``. A client that has just
+made a write (any successful unsafe request) carries a short-lived cookie
+that keeps its reads on the primary for REPLICA_STICKY_SECONDS, so a
+learner sees the certificate they were just issued even before the
+replicas catch up.
+"""
+
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'TRACE'])
+
+_replica = ContextVar('replica_alias', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def reading_from_replica():
+    return _replica.get() is not None
+
+
+def cache_timeout(timeout):
+    """
+    Cap a cache timeout while reads come from a replica.
+
+    A replica may still hold rows the primary has since changed, and a
+    signal may already have cleared their cache entry; caching what the
+    replica returned for longer than REPLICA_MAX_LAG would make that stale
+    copy outlive the invalidation.
+    """
+    if not reading_from_replica():
+        return timeout
+    lag = getattr(settings, 'REPLICA_MAX_LAG', 30)
+    return lag if timeout is None else min(timeout, lag)
+
+
+def _wrap_stream(response, alias):
+    """Keep the replica in use while a streamed body is being produced"""
+    content = response.streaming_content
+    if response.is_async:
+        async def stream():
+            iterator = aiter(content)
+            while True:
+                token = _replica.set(alias)
+                try:
+                    chunk = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    _replica.reset(token)
+                yield chunk
+    else:
+        def stream():
+            iterator = iter(content)
+            while True:
+                token = _replica.set(alias)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    _replica.reset(token)
+                yield chunk
+    response.streaming_content = stream()
+    return response
+
+
+def _use_replica(request, unless, args, kwargs):
+    replicas = get_replicas()
+    if not replicas or getattr(request, 'pinned_to_primary', False):
+        return None
+    if unless is not None and unless(request, *args, **kwargs):
+        return None
+    return random.choice(replicas)
+
+
+def replica_reads(view=None, *, unless=None):
+    """
+    Send the view's reads to a replica unless the client is pinned to the
+    primary. ``unless(request, *args, **kwargs)`` can keep other requests on
+    the primary too, such as ones whose ETag already reflects a change the
+    replicas may not have yet.
+    """
+    if view is None:
+        return lambda view: replica_reads(view, unless=unless)
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            alias = _use_replica(request, unless, args, kwargs)
+            if alias is None:
+                return await view(request, *args, **kwargs)
+            token = _replica.set(alias)
+            try:
+                response = await view(request, *args, **kwargs)
+            finally:
+                _replica.reset(token)
+            if isinstance(response, StreamingHttpResponse):
+                response = _wrap_stream(response, alias)
+            return response
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = _use_replica(request, unless, args, kwargs)
+        if alias is None:
+            return view(request, *args, **kwargs)
+        token = _replica.set(alias)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _replica.reset(token)
+        if isinstance(response, StreamingHttpResponse):
+            response = _wrap_stream(response, alias)
+        return response
+    return wrapper
+
+
+class ReplicaRouter:
+    """Reads inside replica_reads go to the chosen replica; everything else to default"""
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of default, so rows may relate across them
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema with the data, from refresh_replicas
+        return False if db in get_replicas() else None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pins a client to the primary for REPLICA_STICKY_SECONDS after it writes.
+
+    Any unsafe request that succeeds counts as a write. The marker is a
+    cookie rather than a session key so pinning costs no session save and
+    also covers anonymous clients.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.pinned_to_primary = PIN_COOKIE in request.COOKIES
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        request.pinned_to_primary = PIN_COOKIE in request.COOKIES
+        return self.pin(request, await self.get_response(request))
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and get_replicas():
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -25,14 +25,17 @@ INSTALLED_APPS = [
     'corsheaders',
     
     # Our apps
+    'backend',
     'users',
     'courses',
     'certificates',
 ]
 
 MIDDLEWARE = [
+    'backend.metrics.MetricsMiddleware',  # First, so it times everything below
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Add CORS
+    'backend.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,6 +75,71 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile, switched on with SQLITE_PRODUCTION=1 in the
+# environment. WAL lets readers run alongside the writer, BEGIN IMMEDIATE
+# takes the write lock up front (a deferred transaction that reads and then
+# writes fails at once with "database is locked" instead of waiting), and
+# busy_timeout makes writers queue for the lock. Connections are kept for
+# SQLITE_CONN_MAX_AGE seconds instead of being reopened per request.
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_PRODUCTION_OPTIONS = {
+    'init_command': ';'.join([
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}',
+        'PRAGMA mmap_size=268435456',
+    ]),
+    'transaction_mode': 'IMMEDIATE',
+}
+SQLITE_PRODUCTION = os.environ.get('SQLITE_PRODUCTION') == '1'
+if SQLITE_PRODUCTION:
+    DATABASES['default'].update(
+        OPTIONS=SQLITE_PRODUCTION_OPTIONS,
+        CONN_MAX_AGE=int(os.environ.get('SQLITE_CONN_MAX_AGE', 600)),
+        CONN_HEALTH_CHECKS=True,
+    )
+
+# Read replicas for the public read-only views (backend.routers); aliases
+# in DATABASES. SQLITE_REPLICAS=N adds N local file copies of the database,
+# kept fresh with `manage.py refresh_replicas --interval ...`. Cache entries
+# built from replica reads live at most REPLICA_MAX_LAG seconds, and the
+# catalogue API reads from the primary for that long after a course change;
+# a client that writes reads from the primary for REPLICA_STICKY_SECONDS after.
+DATABASE_REPLICAS = []
+for number in range(1, int(os.environ.get('SQLITE_REPLICAS', 0)) + 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.replica{number}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['backend.routers.ReplicaRouter']
+REPLICA_MAX_LAG = int(os.environ.get('REPLICA_MAX_LAG', 30))
+REPLICA_STICKY_SECONDS = 10
+
+# Funnel quiz submissions and mint callbacks through one writer thread per
+# process that commits whatever has queued up in a single transaction
+# (at most SQLITE_WRITE_BATCH_SIZE writes); see backend.sqlite
+SQLITE_WRITE_SERIALIZER = os.environ.get('SQLITE_WRITE_SERIALIZER') == '1'
+SQLITE_WRITE_BATCH_SIZE = 64
+
+# Cache
+# LocMemCache is per process: with more than one worker, point this at a
+# shared backend (Redis/Memcached) so cache invalidations reach every worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'skillproof',
+    }
+}
+
+# Sessions and the per-request user lookup are served from the cache;
+# cached_db writes sessions through to the database, and cached users are
+# dropped on save, delete and logout (users.signals)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+USER_CACHE_TIMEOUT = 5 * 60
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -109,6 +177,77 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom user model
 AUTH_USER_MODEL = 'users.CustomUser'
 
+# Course catalogue pagination
+COURSE_LIST_PAGE_SIZE = 20
+COURSE_LIST_MAX_PAGE_SIZE = 100
+
+# Serialized catalogue payloads live until the next course change
+COURSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Compiled quiz answer keys; invalidated on Quiz/Question changes
+QUIZ_CACHE_TIMEOUT = 60 * 60 * 24
+# Question-bank attempt tokens stay valid for the quiz time limit plus this
+QUIZ_ATTEMPT_GRACE = 5 * 60
+# Raw QuizAttempt rows older than this are folded into rollups and pruned
+QUIZ_ATTEMPT_RETENTION_DAYS = 90
+
+# Public certificate verification; unknown ids are cached briefly
+CERTIFICATE_VERIFY_CACHE_TIMEOUT = 60 * 60
+CERTIFICATE_VERIFY_NOT_FOUND_TIMEOUT = 60
+CERTIFICATE_BULK_VERIFY_MAX = 500
+
+# Certificate ids are reserved from the database this many at a time
+CERTIFICATE_ID_BLOCK_SIZE = 100
+
+# Server-side NFT mint queue (see run_mint_worker)
+CERTIFICATE_CHAIN_CLIENT = 'certificates.chain.LocalChainClient'
+CERTIFICATE_MINT_BATCH_SIZE = 50
+CERTIFICATE_MINT_MAX_ATTEMPTS = 5
+CERTIFICATE_MINT_CLAIM_TIMEOUT = 600
+
+# Chain reader for reconcile_mints; None reuses CERTIFICATE_CHAIN_CLIENT. The command
+# refuses in-process stand-ins such as LocalChainClient, whose ledger starts empty.
+# certificates.chain.FileChainClient reads CERTIFICATE_CHAIN_LEDGER (JSON lines).
+CERTIFICATE_CHAIN_READER = None
+CERTIFICATE_CHAIN_LEDGER = BASE_DIR / 'chain_ledger.jsonl'
+
+# Token-bucket throttles per view scope: {'ip': rate, 'user': rate,
+# 'username': rate}, rates like '10/min'. 'username' counts attempts naming
+# the same account from any address, against credential stuffing. Buckets
+# live in THROTTLE_CACHE (None: per process) and fall back to per-process
+# buckets if that cache is down. Set THROTTLE_PROXY_COUNT to the number of
+# trusted proxies adding X-Forwarded-For.
+THROTTLE_CACHE = 'default'
+THROTTLE_PROXY_COUNT = 0
+THROTTLES = {
+    'login': {'ip': '10/min', 'username': '20/hour'},
+    'register': {'ip': '5/min'},
+    'submit': {'user': '20/min', 'ip': '60/min'},
+}
+
+# In-flight requests allowed before answering 503, counted across every
+# worker sharing THROTTLE_CACHE (per process when it is None, or when it is
+# a per-process LocMemCache). A slot held by a worker that died is freed
+# after CONCURRENCY_LEASE seconds; keep it above the slowest request.
+CONCURRENCY_LIMITS = {
+    'auth': 4,
+    'submit': 8,
+}
+CONCURRENCY_RETRY_AFTER = 1
+CONCURRENCY_LEASE = 60
+
+# Threads for CPU-heavy work (password hashing, rendering) offloaded from
+# async views; None uses min(4, CPU count)
+CPU_OFFLOAD_WORKERS = None
+
+# Per-view request metrics, served at /metrics in Prometheus text format
+# to METRICS_ALLOWED_IPS (None: to anyone). With several worker processes,
+# point METRICS_DIR at a directory they share, emptied on each deploy;
+# every process writes its totals there each METRICS_FLUSH_INTERVAL seconds.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -0,0 +1,145 @@
+# backend/sqlite.py
+
+"""
+An in-process write serializer for SQLite.
+
+SQLite allows one writer at a time. Rather than have every request thread
+contend for the lock (and pay for its own commit), short write
+transactions are handed to a single thread that runs everything queued
+since its last commit inside one transaction. Each write gets its own
+savepoint, so one failing write does not undo the others in its batch.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteSerializer:
+    """Runs submitted write functions on one thread, group-committing them"""
+
+    def __init__(self, using='default', batch_size=64):
+        self.using = using
+        self.batch_size = batch_size
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)``; returns a Future for its result"""
+        future = Future()
+        self.queue.put((future, func, args, kwargs))
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(
+                        target=self._run, name=f'sqlite-writer-{self.using}', daemon=True,
+                    )
+                    self.thread.start()
+        return future
+
+    def stop(self):
+        """Finish the queued writes, then end the writer thread"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(_STOP)
+            thread.join()
+
+    def _run(self):
+        connection = connections[self.using]
+        try:
+            while True:
+                batch = [self.queue.get()]
+                # Everything that queued while the last batch was committing
+                # joins this one; nobody waits for a batch to fill up
+                while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopping = batch[-1] is _STOP
+                if stopping:
+                    batch.pop()
+                if batch:
+                    connection.close_if_unusable_or_obsolete()
+                    self._commit(batch)
+                if stopping:
+                    return
+        finally:
+            connection.close()
+
+    def _commit(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic(using=self.using):
+                for future, func, args, kwargs in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            outcomes.append((future, func(*args, **kwargs), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            # The commit itself failed, so none of the batch was written
+            logger.warning('Write batch of %d failed to commit', len(batch), exc_info=True)
+            for future, *_ in batch:
+                future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_serializers = {}
+_serializers_lock = threading.Lock()
+
+
+def get_serializer(using='default'):
+    with _serializers_lock:
+        if using not in _serializers:
+            _serializers[using] = WriteSerializer(using, getattr(settings, 'SQLITE_WRITE_BATCH_SIZE', 64))
+        return _serializers[using]
+
+
+def _use_serializer(using):
+    """
+    Only when SQLITE_WRITE_SERIALIZER is on, the database is SQLite and the
+    caller is not already in a transaction (its writes would then be on a
+    different connection and could wait on the caller's own lock).
+    """
+    connection = connections[using]
+    return (
+        getattr(settings, 'SQLITE_WRITE_SERIALIZER', False)
+        and connection.vendor == 'sqlite'
+        and not connection.in_atomic_block
+    )
+
+
+def serialized_write(func, *args, using='default', **kwargs):
+    """Run ``func`` in a write transaction, through the serializer when enabled"""
+    if _use_serializer(using):
+        return get_serializer(using).submit(func, *args, **kwargs).result()
+    with transaction.atomic(using=using):
+        return func(*args, **kwargs)
+
+
+async def aserialized_write(func, *args, using='default', **kwargs):
+    """
+    serialized_write for async views. With the serializer on, the view
+    awaits the writer thread directly instead of occupying a worker thread.
+    """
+    if _use_serializer(using):
+        return await asyncio.wrap_future(get_serializer(using).submit(func, *args, **kwargs))
+    return await sync_to_async(serialized_write)(func, *args, using=using, **kwargs)
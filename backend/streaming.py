@@ -0,0 +1,106 @@
+# backend/streaming.py
+
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+# Encoded elements are buffered up to roughly this many bytes per chunk
+CHUNK_BYTES = 16 * 1024
+
+
+class _JsonArrayWriter:
+    """Buffers encoded array elements into chunks of about CHUNK_BYTES"""
+
+    def __init__(self, key, encoder):
+        self.dumps = encoder().encode
+        self.buffer = [f'{{{json.dumps(key)}: [']
+        self.size = len(self.buffer[0])
+        self.first = True
+
+    def add(self, item):
+        """Append one element; returns a chunk when the buffer is full"""
+        piece = self.dumps(item)
+        if not self.first:
+            piece = ', ' + piece
+        self.first = False
+        self.buffer.append(piece)
+        self.size += len(piece)
+        if self.size >= CHUNK_BYTES:
+            chunk = ''.join(self.buffer).encode()
+            self.buffer, self.size = [], 0
+            return chunk
+        return None
+
+    def close(self, tail):
+        self.buffer.append(']')
+        for name, value in (tail() if tail else {}).items():
+            self.buffer.append(f', {json.dumps(name)}: {self.dumps(value)}')
+        self.buffer.append('}')
+        return ''.join(self.buffer).encode()
+
+
+def stream_json(key, items, tail=None, encoder=DjangoJSONEncoder):
+    """
+    Yield ``{"<key>": [item, ...], **tail()}`` as UTF-8 byte chunks.
+
+    Items are encoded one at a time, so only the current chunk is held in
+    memory. ``tail`` is called after the last item, which lets callers add
+    fields that are only known once the items have been consumed (a next
+    page cursor, say).
+    """
+    writer = _JsonArrayWriter(key, encoder)
+    for item in items:
+        chunk = writer.add(item)
+        if chunk:
+            yield chunk
+    yield writer.close(tail)
+
+
+async def astream_json(key, items, tail=None, encoder=DjangoJSONEncoder):
+    """stream_json over an async iterable, e.g. ``queryset.aiterator()``"""
+    writer = _JsonArrayWriter(key, encoder)
+    async for item in items:
+        chunk = writer.add(item)
+        if chunk:
+            yield chunk
+    yield writer.close(tail)
+
+
+def stream_items(request, rows, transform=None, chunk_size=500):
+    """
+    Items for a StreamingJsonResponse returned by an async view.
+
+    ``rows`` is a queryset or anything iterable both ways (a KeysetPage,
+    say). Under ASGI the items come from an async iterator, so the body is
+    sent as it is produced; under WSGI they come from a plain iterator,
+    because Django buffers an async body in full before sending it there.
+    """
+    is_queryset = isinstance(rows, QuerySet)
+    if isinstance(request, ASGIRequest):
+        async def items():
+            async for row in (rows.aiterator(chunk_size=chunk_size) if is_queryset else rows):
+                yield transform(row) if transform else row
+        return items()
+
+    def items():
+        for row in (rows.iterator(chunk_size=chunk_size) if is_queryset else rows):
+            yield transform(row) if transform else row
+    return items()
+
+
+class StreamingJsonResponse(StreamingHttpResponse):
+    """
+    JSON object with one array member, streamed element by element.
+
+    Pair it with ``queryset.iterator()`` (or ``stream_items()`` in async
+    views, which picks the iterator the server can stream) so neither the
+    rows nor the encoded document are ever fully in memory.
+    """
+
+    def __init__(self, key, items, tail=None, encoder=DjangoJSONEncoder, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        stream = astream_json if hasattr(items, '__aiter__') else stream_json
+        super().__init__(stream(key, items, tail, encoder), **kwargs)
@@ -0,0 +1,371 @@
+# backend/tests.py
+
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+
+from courses.models import Course, Quiz
+from users.models import CustomUser
+from .metrics import MetricsMiddleware, Registry, registry, render_text
+from .routers import (
+    PIN_COOKIE, ReplicaPinningMiddleware, ReplicaRouter, _replica, cache_timeout, replica_reads,
+)
+from .throttling import (
+    CacheConcurrencyLimiter, MemoryBucketStore, concurrency_limit, get_limiter, parse_rate, throttle,
+)
+
+
+def ok(request):
+    return JsonResponse({})
+
+
+class RateTests(TestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/min'), (10, 10 / 60))
+        self.assertEqual(parse_rate('5/2h'), (5, 5 / 7200))
+        with self.assertRaises(ValueError):
+            parse_rate('lots')
+
+
+class MemoryBucketStoreTests(TestCase):
+    def test_idle_buckets_are_pruned_only_when_the_store_doubles(self):
+        store = MemoryBucketStore()
+        store.MIN_PRUNE_SIZE = store.prune_at = 4
+        with mock.patch('backend.throttling.time.monotonic', return_value=0):
+            for i in range(5):
+                store.take(f'old{i}', 1, 1)
+        # Nothing was idle: the next sweep waits until the store doubles
+        self.assertEqual((len(store.buckets), store.prune_at), (5, 10))
+        with mock.patch('backend.throttling.time.monotonic', return_value=store.IDLE_SECONDS + 1):
+            for i in range(5):
+                store.take(f'new{i}', 1, 1)
+            self.assertEqual(len(store.buckets), 10)
+            store.take('new5', 1, 1)
+        self.assertEqual(sorted(store.buckets), [f'new{i}' for i in range(6)])
+        self.assertEqual(store.prune_at, 12)
+
+    def test_bucket_refills_at_the_steady_rate(self):
+        store = MemoryBucketStore()
+        with mock.patch('backend.throttling.time.monotonic', return_value=0):
+            self.assertEqual([store.take('k', 2, 1) for _ in range(3)], [0, 0, 1])
+        with mock.patch('backend.throttling.time.monotonic', return_value=1):
+            self.assertEqual(store.take('k', 2, 1), 0)
+
+
+# Login hashes passwords on the offload pool, whose connections cannot see
+# a TestCase transaction
+class ThrottleTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('learner', 'learner@example.com', 'password-1')
+
+    def login(self, username='learner', ip='127.0.0.1'):
+        return self.client.post(
+            '/api/users/login/', json.dumps({'username': username, 'password': 'wrong'}),
+            content_type='application/json', REMOTE_ADDR=ip,
+        )
+
+    @override_settings(THROTTLES={'login': {'ip': '3/min'}})
+    def test_login_is_limited_per_address(self):
+        self.assertEqual([self.login().status_code for _ in range(4)], [401, 401, 401, 429])
+        self.assertGreaterEqual(int(self.login()['Retry-After']), 1)
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, 401)
+
+    @override_settings(THROTTLES={'login': {'ip': '100/min', 'username': '2/hour'}})
+    def test_login_is_limited_per_username_from_any_address(self):
+        codes = [self.login('learner', '10.0.0.1'), self.login(' Learner', '10.0.0.2'), self.login('learner', '10.0.0.3')]
+        self.assertEqual([r.status_code for r in codes], [401, 401, 429])
+        self.assertEqual(self.login('someone-else', '10.0.0.3').status_code, 401)
+
+    @override_settings(THROTTLES={'login': {'ip': '1/min'}})
+    def test_wrong_methods_cost_no_tokens(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/users/login/').status_code, 405)
+        self.assertEqual([self.login().status_code for _ in range(2)], [401, 429])
+
+    @override_settings(THROTTLES={'submit': {'user': '2/min'}})
+    def test_submit_is_limited_per_user(self):
+        course = Course.objects.create(
+            title='Course', slug='course', description='Test course', category='ai', difficulty='beginner',
+            duration=10, content='# Test',
+        )
+        Quiz.objects.create(course=course, passing_score=50)
+
+        def submit():
+            return self.client.post('/api/courses/course/submit/', '{"answers": {}}',
+                                    content_type='application/json').status_code
+
+        self.client.force_login(self.user)
+        self.assertEqual([submit() for _ in range(3)], [200, 200, 429])
+        self.client.force_login(CustomUser.objects.create_user('other', 'other@example.com', 'password-1'))
+        self.assertEqual(submit(), 200)
+
+    @override_settings(THROTTLES={'scope': {'ip': '1/min'}})
+    def test_falls_back_to_process_buckets_when_the_cache_is_down(self):
+        view = throttle('scope')(ok)
+        request = RequestFactory().get('/', REMOTE_ADDR='192.0.2.1')
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError('down')), \
+                self.assertLogs('backend.throttling', 'WARNING'):
+            self.assertEqual([view(request).status_code for _ in range(2)], [200, 429])
+
+    @override_settings(THROTTLES={'scope': {'ip': '1/min'}})
+    def test_async_views(self):
+        async def aview(request):
+            return JsonResponse({})
+
+        view = throttle('scope')(aview)
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        request = RequestFactory().get('/', REMOTE_ADDR='192.0.2.2')
+
+        async def run():
+            return [(await view(request)).status_code for _ in range(2)]
+        self.assertEqual(asyncio.run(run()), [200, 429])
+
+
+@override_settings(CONCURRENCY_LIMITS={'scope': 1})
+class ConcurrencyLimitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_request_over_the_limit_is_refused_at_once(self):
+        entered, finish = threading.Event(), threading.Event()
+
+        def slow(request):
+            entered.set()
+            finish.wait(5)
+            return JsonResponse({})
+
+        view = concurrency_limit('scope')(slow)
+        statuses = []
+        worker = threading.Thread(target=lambda: statuses.append(view(RequestFactory().get('/')).status_code))
+        worker.start()
+        entered.wait(5)
+        refused = view(RequestFactory().get('/'))
+        finish.set()
+        worker.join()
+        self.assertEqual(refused.status_code, 503)
+        self.assertEqual(refused['Retry-After'], '1')
+        self.assertEqual(statuses, [200])
+        self.assertEqual(view(RequestFactory().get('/')).status_code, 200)
+
+    def test_slots_are_shared_through_the_cache(self):
+        # Two limiters stand in for two worker processes
+        first, second = get_limiter('scope'), get_limiter('scope')
+        self.assertIsInstance(first, CacheConcurrencyLimiter)
+        self.assertIsNot(first, second)
+        release = first.acquire(2)
+        self.assertIsNotNone(second.acquire(2))
+        self.assertIsNone(second.acquire(2))
+        release()
+        self.assertIsNotNone(second.acquire(2))
+
+    @override_settings(CONCURRENCY_LEASE=60)
+    def test_a_lost_slot_expires_with_its_lease(self):
+        limiter = get_limiter('scope')
+        self.assertIsNotNone(limiter.acquire(1))
+        self.assertIsNone(limiter.acquire(1))
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=10 ** 10):
+            self.assertIsNotNone(limiter.acquire(1))
+
+    @override_settings(THROTTLE_CACHE=None)
+    def test_per_process_without_a_throttle_cache(self):
+        limiter = get_limiter('scope')
+        self.assertIs(limiter, get_limiter('scope'))
+        release = limiter.acquire(1)
+        self.assertIsNone(limiter.acquire(1))
+        release()
+        release = limiter.acquire(1)
+        self.assertIsNotNone(release)
+        release()
+
+    def test_async_views(self):
+        async def aview(request):
+            await asyncio.sleep(0.05)
+            return JsonResponse({})
+
+        view = concurrency_limit('scope')(aview)
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+
+        async def run():
+            responses = await asyncio.gather(view(RequestFactory().get('/')), view(RequestFactory().get('/')))
+            return sorted(r.status_code for r in responses) + [(await view(RequestFactory().get('/'))).status_code]
+        self.assertEqual(asyncio.run(run()), [200, 503, 200])
+
+
+def read_alias(request):
+    """Where a read made by this request would go"""
+    return JsonResponse({'db': ReplicaRouter().db_for_read(Course)})
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_MAX_LAG=30)
+class ReplicaRouterTests(TestCase):
+    def read(self, view, request=None):
+        return json.loads(view(request or RequestFactory().get('/')).content)['db']
+
+    def test_only_wrapped_views_read_from_a_replica(self):
+        self.assertIn(self.read(replica_reads(read_alias)), ['replica1', 'replica2'])
+        self.assertIsNone(self.read(read_alias))
+        self.assertEqual(ReplicaRouter().db_for_write(Course), 'default')
+        self.assertFalse(ReplicaRouter().allow_migrate('replica1', 'courses'))
+        self.assertIsNone(ReplicaRouter().allow_migrate('default', 'courses'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_primary_without_replicas(self):
+        self.assertIsNone(self.read(replica_reads(read_alias)))
+
+    def test_pinned_clients_and_unless_stay_on_the_primary(self):
+        request = RequestFactory().get('/')
+        request.pinned_to_primary = True
+        self.assertIsNone(self.read(replica_reads(read_alias), request))
+
+        calls = []
+
+        def unless(request, *args, **kwargs):
+            calls.append(kwargs)
+            return kwargs['slug'] == 'fresh'
+
+        view = replica_reads(unless=unless)(lambda request, slug: read_alias(request))
+        self.assertIsNone(json.loads(view(RequestFactory().get('/'), slug='fresh').content)['db'])
+        self.assertIsNotNone(json.loads(view(RequestFactory().get('/'), slug='stale').content)['db'])
+        self.assertEqual(calls, [{'slug': 'fresh'}, {'slug': 'stale'}])
+
+    def test_streamed_bodies_keep_reading_from_the_replica(self):
+        def stream(request):
+            return StreamingHttpResponse(str(_replica.get()) for _ in range(2))
+
+        async def astream(request):
+            async def chunks():
+                for _ in range(2):
+                    yield str(_replica.get())
+            return StreamingHttpResponse(chunks())
+
+        body = b''.join(replica_reads(stream)(RequestFactory().get('/')).streaming_content).decode()
+        self.assertIn(body, ['replica1replica1', 'replica2replica2'])
+
+        async def run():
+            response = await replica_reads(astream)(RequestFactory().get('/'))
+            return ''.join([chunk.decode() async for chunk in response.streaming_content])
+        self.assertIn(asyncio.run(run()), ['replica1replica1', 'replica2replica2'])
+
+    def test_cache_timeouts_are_capped_inside_replica_reads(self):
+        def timeouts(request):
+            return JsonResponse({'long': cache_timeout(3600), 'forever': cache_timeout(None)})
+
+        self.assertEqual(json.loads(replica_reads(timeouts)(RequestFactory().get('/')).content),
+                         {'long': 30, 'forever': 30})
+        self.assertEqual(cache_timeout(3600), 3600)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=10)
+class ReplicaPinningTests(TestCase):
+    def respond(self, request, status=200):
+        middleware = ReplicaPinningMiddleware(lambda request: HttpResponse(status=status))
+        return middleware(request)
+
+    def test_successful_writes_pin_the_client(self):
+        response = self.respond(RequestFactory().post('/'))
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+        self.assertNotIn(PIN_COOKIE, self.respond(RequestFactory().get('/')).cookies)
+        self.assertNotIn(PIN_COOKIE, self.respond(RequestFactory().post('/'), status=400).cookies)
+
+    def test_pinned_requests_are_marked(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.respond(request)
+        self.assertTrue(request.pinned_to_primary)
+        request = RequestFactory().get('/')
+        self.respond(request)
+        self.assertFalse(request.pinned_to_primary)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_cookie_without_replicas(self):
+        self.assertNotIn(PIN_COOKIE, self.respond(RequestFactory().post('/')).cookies)
+
+
+def sample(text, series):
+    """Value of one series in a Prometheus text page, or None"""
+    match = re.search(r'^' + re.escape(series) + r' (\S+)$', text, re.M)
+    return float(match.group(1)) if match else None
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry._reset()
+        course = Course.objects.create(
+            title='Course', slug='course', description='Test course', category='ai', difficulty='beginner',
+            duration=10, content='# Test',
+        )
+        Quiz.objects.create(course=course, passing_score=50)
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return response.content.decode()
+
+    def test_requests_are_counted_per_view_and_status(self):
+        b''.join(self.client.get('/api/courses/'))
+        self.client.get('/api/courses/course/')
+        self.client.get('/api/courses/missing/')
+        self.client.get('/does-not-exist/')
+        text = self.scrape()
+        self.assertEqual(sample(text, 'skillproof_http_requests_total{view="courses:list",method="GET",status="200"}'), 1)
+        self.assertEqual(sample(text, 'skillproof_http_requests_total{view="courses:detail",method="GET",status="404"}'), 1)
+        self.assertEqual(sample(text, 'skillproof_http_requests_total{view="unresolved",method="GET",status="404"}'), 1)
+        self.assertEqual(sample(
+            text, 'skillproof_http_request_duration_seconds_bucket{view="courses:list",method="GET",le="+Inf"}'), 1)
+        self.assertEqual(sample(text, 'skillproof_db_queries_per_request_count{view="courses:detail"}'), 2)
+        self.assertGreater(sample(text, 'skillproof_db_queries_per_request_sum{view="courses:list"}'), 0)
+        self.assertGreater(sample(text, 'skillproof_http_response_size_bytes_sum{view="courses:list"}'), 0)
+
+    def test_only_allowed_addresses_can_scrape(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='192.0.2.1').status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=None):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='192.0.2.1').status_code, 200)
+
+    def test_streamed_bodies_are_measured_as_they_are_sent(self):
+        def stream(request):
+            return StreamingHttpResponse(str(Course.objects.count()) for _ in range(3))
+
+        request = RequestFactory().get('/')
+        response = MetricsMiddleware(stream)(request)
+        self.assertEqual(registry.snapshot(), {})
+        self.assertEqual(b''.join(response.streaming_content), b'111')
+        totals = registry.snapshot()
+        # One bucket per bound, then the overflow count and the sum
+        self.assertEqual(totals[('db_queries_per_request', (('view', 'unresolved'),))][-1], 3)
+        self.assertEqual(totals[('http_response_size_bytes', (('view', 'unresolved'),))][-1], 3)
+
+    def test_render_text(self):
+        metrics = Registry()
+        metrics.inc('http_requests_total', (('view', 'a"b'), ('method', 'GET'), ('status', '200')), 2)
+        metrics.observe('db_queries_per_request', (('view', 'a'),), 3)
+        text = render_text(metrics.snapshot())
+        self.assertIn('# TYPE skillproof_http_requests_total counter\n', text)
+        self.assertIn('skillproof_http_requests_total{view="a\\"b",method="GET",status="200"} 2\n', text)
+        self.assertIn('skillproof_db_queries_per_request_bucket{view="a",le="2.0"} 0\n', text)
+        self.assertIn('skillproof_db_queries_per_request_bucket{view="a",le="5.0"} 1\n', text)
+        self.assertIn('skillproof_db_queries_per_request_bucket{view="a",le="+Inf"} 1\n', text)
+        self.assertIn('skillproof_db_queries_per_request_sum{view="a"} 3\n', text)
+
+    def test_workers_share_totals_through_the_metrics_directory(self):
+        labels = [['view', 'courses:list'], ['method', 'GET'], ['status', '200']]
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=0):
+            with open(os.path.join(directory, '99999.json'), 'w') as f:
+                json.dump([['http_requests_total', labels, [5]], ['unknown_metric', [], [1]]], f)
+            with open(os.path.join(directory, '99998.json'), 'w') as f:
+                f.write('{half written')
+            b''.join(self.client.get('/api/courses/'))
+            self.assertTrue(os.path.exists(os.path.join(directory, f'{os.getpid()}.json')))
+            with self.assertLogs('backend.metrics', 'WARNING'):
+                text = self.scrape()
+        self.assertEqual(sample(text, 'skillproof_http_requests_total{view="courses:list",method="GET",status="200"}'), 6)
@@ -0,0 +1,418 @@
+# backend/throttling.py
+
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*(s|sec|m|min|h|hour|d|day)\s*$')
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """
+    ``'10/min'`` -> (capacity, tokens per second).
+
+    The bucket holds ``capacity`` tokens, so a client may burst that many
+    requests and then continues at the steady rate. ``'10/5m'`` also works.
+    """
+    match = RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f'Invalid throttle rate {rate!r}')
+    count, multiplier, unit = match.groups()
+    seconds = PERIODS[unit] * int(multiplier or 1)
+    return int(count), int(count) / seconds
+
+
+def refill(state, capacity, per_second, now):
+    """Bucket (tokens, updated) after topping it up to ``now``"""
+    if state is None:
+        return float(capacity), now
+    tokens, updated = state
+    return min(float(capacity), tokens + (now - updated) * per_second), now
+
+
+def take_token(state, capacity, per_second, now):
+    """
+    Try to spend one token. Returns (new state, seconds to wait); a wait of
+    0 means the request is allowed.
+    """
+    tokens, now = refill(state, capacity, per_second, now)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / per_second
+
+
+class MemoryBucketStore:
+    """Per-process buckets; used on its own or when the shared cache fails"""
+
+    # Idle buckets are forgotten once the store reaches this size, and
+    # again whenever it has doubled since the last sweep, so the sweep's
+    # cost is spread over the inserts that made it necessary
+    MIN_PRUNE_SIZE = 10000
+    IDLE_SECONDS = 3600
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.prune_at = self.MIN_PRUNE_SIZE
+
+    def take(self, key, capacity, per_second):
+        with self.lock:
+            now = time.monotonic()
+            state, wait = take_token(self.buckets.get(key), capacity, per_second, now)
+            self.buckets[key] = state
+            if len(self.buckets) > self.prune_at:
+                self.buckets = {k: v for k, v in self.buckets.items() if now - v[1] < self.IDLE_SECONDS}
+                self.prune_at = max(self.MIN_PRUNE_SIZE, 2 * len(self.buckets))
+            return wait
+
+
+class CacheBucketStore:
+    """
+    Buckets in a Django cache, shared by every worker using it.
+
+    The read-modify-write is not atomic across workers, so under a tight
+    race a client may get a request or two beyond its rate; that is the
+    price of working with any cache backend. If the cache is unreachable
+    the per-process fallback keeps throttling rather than failing open.
+    """
+
+    def __init__(self, alias, fallback):
+        self.alias = alias
+        self.fallback = fallback
+
+    def _key(self, key):
+        return f'throttle:{key}'
+
+    def _timeout(self, capacity, per_second):
+        # Long enough for an empty bucket to fill back up
+        return math.ceil(capacity / per_second) + 1
+
+    def take(self, key, capacity, per_second):
+        cache = caches[self.alias]
+        try:
+            state, wait = take_token(cache.get(self._key(key)), capacity, per_second, time.time())
+            cache.set(self._key(key), state, self._timeout(capacity, per_second))
+        except Exception:
+            logger.warning('Throttle cache %r unavailable, using in-process buckets', self.alias, exc_info=True)
+            return self.fallback.take(key, capacity, per_second)
+        return wait
+
+    async def atake(self, key, capacity, per_second):
+        cache = caches[self.alias]
+        try:
+            state, wait = take_token(await cache.aget(self._key(key)), capacity, per_second, time.time())
+            await cache.aset(self._key(key), state, self._timeout(capacity, per_second))
+        except Exception:
+            logger.warning('Throttle cache %r unavailable, using in-process buckets', self.alias, exc_info=True)
+            return self.fallback.take(key, capacity, per_second)
+        return wait
+
+
+_memory_store = MemoryBucketStore()
+
+
+def get_bucket_store():
+    """THROTTLE_CACHE names a cache alias; None keeps buckets in each process"""
+    alias = getattr(settings, 'THROTTLE_CACHE', 'default')
+    if alias is None:
+        return _memory_store
+    return CacheBucketStore(alias, _memory_store)
+
+
+def client_ip(request):
+    """
+    The client address. Behind THROTTLE_PROXY_COUNT trusted proxies the
+    address they appended to X-Forwarded-For is used instead of REMOTE_ADDR.
+    """
+    proxies = getattr(settings, 'THROTTLE_PROXY_COUNT', 0)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if hops:
+            return hops[-min(proxies, len(hops))]
+    return request.META.get('REMOTE_ADDR', 'unknown')
+
+
+def submitted_username(request):
+    """
+    The username a login form or JSON body names, normalised, or None.
+    Hashed so arbitrary input makes a safe cache key.
+    """
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return None
+        username = data.get('username') if isinstance(data, dict) else None
+    else:
+        username = request.POST.get('username')
+    if not isinstance(username, str) or not username.strip():
+        return None
+    return hashlib.sha256(username.strip().lower().encode()).hexdigest()[:32]
+
+
+def scope_rules(scope):
+    return getattr(settings, 'THROTTLES', {}).get(scope, {})
+
+
+def bucket_keys(scope, request, user=None):
+    """
+    (bucket key, rate) pairs that apply to this request under THROTTLES[scope].
+    Async callers pass the user from ``await request.auser()``.
+    """
+    keys = []
+    for kind, rate in scope_rules(scope).items():
+        if kind == 'ip':
+            ident = client_ip(request)
+        elif kind == 'username':
+            ident = submitted_username(request)
+            if ident is None:
+                continue
+        elif kind == 'user':
+            if user is None:
+                user = getattr(request, 'user', None)
+            if user is None or not user.is_authenticated:
+                continue
+            ident = user.pk
+        else:
+            raise ValueError(f'Unknown throttle key {kind!r} in THROTTLES[{scope!r}]')
+        keys.append((f'{scope}:{kind}:{ident}', rate))
+    return keys
+
+
+def too_many_requests(wait):
+    retry_after = max(1, math.ceil(wait))
+    response = JsonResponse({
+        'success': False,
+        'message': f'Too many requests, please retry in {retry_after} seconds',
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def throttle(scope, methods=None):
+    """
+    Token-bucket rate limit for a view, configured by THROTTLES[scope].
+
+    THROTTLES maps a scope to {'ip': rate, 'user': rate, 'username': rate};
+    every listed bucket must have a token for the request to proceed,
+    otherwise it gets a 429 with Retry-After. 'user' buckets only apply to
+    logged-in users, 'username' buckets to requests naming an account (a
+    login attempt, whichever address it comes from). With ``methods``, only
+    requests using one of them are counted, so a request the view turns
+    away with a 405 costs no tokens. Works on sync and async views.
+    """
+    def counted(request):
+        return methods is None or request.method in methods
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not counted(request):
+                    return await view(request, *args, **kwargs)
+                store = get_bucket_store()
+                # Resolving the user costs a session and user lookup; only
+                # pay for it when the scope has a per-user bucket
+                user = None
+                if 'user' in scope_rules(scope) and hasattr(request, 'auser'):
+                    user = await request.auser()
+                wait = 0
+                for key, rate in bucket_keys(scope, request, user):
+                    capacity, per_second = parse_rate(rate)
+                    if isinstance(store, CacheBucketStore):
+                        wait = max(wait, await store.atake(key, capacity, per_second))
+                    else:
+                        wait = max(wait, store.take(key, capacity, per_second))
+                if wait:
+                    return too_many_requests(wait)
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not counted(request):
+                return view(request, *args, **kwargs)
+            store = get_bucket_store()
+            wait = 0
+            for key, rate in bucket_keys(scope, request):
+                wait = max(wait, store.take(key, *parse_rate(rate)))
+            if wait:
+                return too_many_requests(wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class ConcurrencyLimiter:
+    """Counts in-flight requests for one scope in this process"""
+
+    def __init__(self):
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, limit):
+        """Take a slot; returns the function that frees it, or None when all are taken"""
+        with self.lock:
+            if self.active >= limit:
+                return None
+            self.active += 1
+            return self.release
+
+    async def aacquire(self, limit):
+        release = self.acquire(limit)
+        if release is None:
+            return None
+
+        async def arelease():
+            release()
+        return arelease
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+
+
+class CacheConcurrencyLimiter:
+    """
+    In-flight slots for one scope in a Django cache, shared by every worker
+    using it, so the limit holds across processes.
+
+    A request claims one of ``limit`` slot keys with cache.add, which is
+    atomic on every backend, and deletes it when it finishes. Slots expire
+    after CONCURRENCY_LEASE seconds so a worker killed mid-request cannot
+    hold one for good. If the cache is unreachable the per-process limiter
+    takes over.
+    """
+
+    def __init__(self, alias, scope, fallback):
+        self.alias = alias
+        self.scope = scope
+        self.fallback = fallback
+
+    def _slots(self, limit):
+        # Start at a random slot so concurrent requests rarely race for the same key
+        first = random.randrange(limit)
+        return [f'concurrency:{self.scope}:{(first + i) % limit}' for i in range(limit)]
+
+    def _lease(self):
+        return getattr(settings, 'CONCURRENCY_LEASE', 60)
+
+    def acquire(self, limit):
+        """Take a slot; returns the function that frees it, or None when all are taken"""
+        cache = caches[self.alias]
+        token = uuid.uuid4().hex
+        try:
+            for key in self._slots(limit):
+                if cache.add(key, token, self._lease()):
+                    return lambda: self._free(cache, key, token)
+        except Exception:
+            logger.warning('Concurrency cache %r unavailable, limiting per process', self.alias, exc_info=True)
+            return self.fallback.acquire(limit)
+        return None
+
+    async def aacquire(self, limit):
+        cache = caches[self.alias]
+        token = uuid.uuid4().hex
+        try:
+            for key in self._slots(limit):
+                if await cache.aadd(key, token, self._lease()):
+                    return lambda: self._afree(cache, key, token)
+        except Exception:
+            logger.warning('Concurrency cache %r unavailable, limiting per process', self.alias, exc_info=True)
+            return await self.fallback.aacquire(limit)
+        return None
+
+    def _free(self, cache, key, token):
+        # Once the lease has run out the slot may belong to another request
+        try:
+            if cache.get(key) == token:
+                cache.delete(key)
+        except Exception:
+            logger.warning('Could not free concurrency slot %s', key, exc_info=True)
+
+    async def _afree(self, cache, key, token):
+        try:
+            if await cache.aget(key) == token:
+                await cache.adelete(key)
+        except Exception:
+            logger.warning('Could not free concurrency slot %s', key, exc_info=True)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(scope):
+    """Limiter for a scope: shared through THROTTLE_CACHE, or per process when it is None"""
+    with _limiters_lock:
+        local = _limiters.setdefault(scope, ConcurrencyLimiter())
+    alias = getattr(settings, 'THROTTLE_CACHE', 'default')
+    if alias is None:
+        return local
+    return CacheConcurrencyLimiter(alias, scope, local)
+
+
+def overloaded():
+    response = JsonResponse({
+        'success': False,
+        'message': 'Server is busy, please retry shortly',
+    }, status=503)
+    response['Retry-After'] = str(getattr(settings, 'CONCURRENCY_RETRY_AFTER', 1))
+    return response
+
+
+def concurrency_limit(scope):
+    """
+    Cap in-flight requests for a scope at CONCURRENCY_LIMITS[scope], counted
+    across every worker sharing THROTTLE_CACHE.
+
+    Requests over the cap are refused at once with a 503 and Retry-After,
+    rather than queueing behind slow ones until the client times out. A
+    scope without a configured limit is not capped.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                limit = getattr(settings, 'CONCURRENCY_LIMITS', {}).get(scope)
+                if limit is None:
+                    return await view(request, *args, **kwargs)
+                release = await get_limiter(scope).aacquire(limit)
+                if release is None:
+                    return overloaded()
+                try:
+                    return await view(request, *args, **kwargs)
+                finally:
+                    await release()
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limit = getattr(settings, 'CONCURRENCY_LIMITS', {}).get(scope)
+            if limit is None:
+                return view(request, *args, **kwargs)
+            release = get_limiter(scope).acquire(limit)
+            if release is None:
+                return overloaded()
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                release()
+        return wrapper
+    return decorator
@@ -20,10 +20,14 @@ urlpatterns = [
     path('certificates/', views.certificates_page, name='certificates_page'),
     path('verify/', views.verify_certificate, name='verify'),
     
+    # Prometheus scrape target
+    path('metrics', views.metrics, name='metrics'),
+    
     # Admin
     path('admin/', admin.site.urls),
     
     # API endpoints
+    path('api/dashboard/', views.dashboard_summary, name='dashboard_summary'),
     path('api/users/', include('users.urls')),
     path('api/courses/', include('courses.urls')),
     path('api/certificates/', include('certificates.urls')),
@@ -2,8 +2,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
-from courses.models import Course
+from django.db.models import Avg, Count, Q
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from courses.models import Course, UserProgress
+from courses.rendering import get_rendered_content
+from courses.views import progress_item, progress_values
 from certificates.models import Certificate
+from certificates.views import certificate_item, certificate_values
+from .metrics import registry, render_text
+from .routers import replica_reads
+from .throttling import client_ip
 
 def home(request):
     """Landing page"""
@@ -13,16 +22,53 @@ def courses_page(request):
     """Courses listing page"""
     return render(request, 'courses.html')
 
+@replica_reads
 def course_detail(request, slug):
     """Single course detail page"""
     course = get_object_or_404(Course, slug=slug, is_active=True)
-    return render(request, 'course_detail.html', {'course': course})
+    return render(request, 'course_detail.html', {
+        'course': course,
+        'content_html': get_rendered_content(course)['html'],
+    })
 
 @login_required
 def dashboard(request):
     """User dashboard - requires login"""
     return render(request, 'dashboard.html')
 
+@login_required
+async def dashboard_summary(request):
+    """
+    Everything the dashboard shows, in one round trip.
+
+    Four queries regardless of how many certificates or courses the user
+    has: the two lists and one aggregate over each table.
+    """
+    user = await request.auser()
+    certificates = [certificate_item(cert) async for cert in certificate_values(user)]
+    progress = [progress_item(p) async for p in progress_values(user)]
+    
+    cert_stats = await Certificate.objects.filter(user=user).aaggregate(
+        total=Count('id'),
+        average_score=Avg('score'),
+        minted=Count('id', filter=Q(blockchain_minted=True)),
+    )
+    progress_stats = await UserProgress.objects.filter(user=user).aaggregate(
+        completed=Count('id', filter=Q(completed=True)),
+    )
+    average = cert_stats['average_score']
+    
+    return JsonResponse({
+        'certificates': certificates,
+        'progress': progress,
+        'stats': {
+            'total_certificates': cert_stats['total'],
+            'completed_courses': progress_stats['completed'],
+            'average_score': round(average) if average is not None else 0,
+            'minted_certificates': cert_stats['minted'],
+        },
+    })
+
 def login_page(request):
     """Login page"""
     if request.user.is_authenticated:
@@ -45,6 +91,7 @@ def certificates_page(request):
     """User certificates page - redirect to dashboard for now"""
     return redirect('/dashboard')
 
+@replica_reads
 def verify_certificate(request):
     """Public certificate verification page"""
     certificate = None
@@ -65,4 +112,11 @@ def verify_certificate(request):
         'certificate_id': certificate_id,
     }
     
-    return render(request, 'verify.html', context)
\ No newline at end of file
+    return render(request, 'verify.html', context)
+
+def metrics(request):
+    """Request metrics of every worker process, in Prometheus text format"""
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', None)
+    if allowed is not None and client_ip(request) not in allowed:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(render_text(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,8 +1,12 @@
 # certificates/admin.py
 
 from django.contrib import admin
+import re
+from .identifiers import is_valid_certificate_id
 from .models import Certificate
 
+TX_HASH_RE = re.compile(r'^0x[0-9a-fA-F]{64}$')
+
 @admin.register(Certificate)
 class CertificateAdmin(admin.ModelAdmin):
     list_display = [
@@ -11,13 +15,26 @@ class CertificateAdmin(admin.ModelAdmin):
         'course', 
         'score', 
         'blockchain_minted',
+        'mint_status',
         'issued_at'
     ]
-    list_filter = ['blockchain_minted', 'issued_at', 'course']
+    list_filter = ['blockchain_minted', 'mint_status', 'issued_at', 'course']
     search_fields = [
         'user__username', 
         'course__title', 
         'certificate_id',
         'transaction_hash'
     ]
-    readonly_fields = ['certificate_id', 'issued_at']
\ No newline at end of file
+    readonly_fields = ['certificate_id', 'issued_at', 'mint_attempts', 'mint_batch', 'mint_claimed_at']
+    
+    def get_search_results(self, request, queryset, search_term):
+        """
+        A pasted transaction hash or certificate id is matched exactly, so
+        the lookup uses its index instead of LIKE '%...%' over every field.
+        """
+        term = search_term.strip()
+        if TX_HASH_RE.match(term):
+            return queryset.filter(transaction_hash=term), False
+        if is_valid_certificate_id(term):
+            return queryset.filter(certificate_id=term), False
+        return super().get_search_results(request, queryset, search_term)
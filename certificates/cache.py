@@ -0,0 +1,124 @@
+# certificates/cache.py
+
+from django.conf import settings
+from django.core.cache import cache
+
+from backend.routers import cache_timeout
+
+from .identifiers import is_valid_certificate_id
+from .models import Certificate
+
+# Stored in place of a payload for ids that do not exist
+NOT_FOUND = 'not-found'
+
+
+def _cache_key(certificate_id):
+    return f'certificates:verify:{certificate_id}'
+
+
+def verification_payload(certificate):
+    """Public verification data for a certificate (user and course must be loaded)"""
+    return {
+        'valid': True,
+        'certificate_id': certificate.certificate_id,
+        'user': certificate.user.username,
+        'course': certificate.course.title,
+        'issued_at': certificate.issued_at.isoformat(),
+        'blockchain_minted': certificate.blockchain_minted,
+        'nft_token_id': certificate.nft_token_id,
+    }
+
+
+def _remember(key, certificate):
+    """Cache the lookup result for one id and return its payload (None if missing)"""
+    if certificate is None:
+        cache.set(key, NOT_FOUND, cache_timeout(getattr(settings, 'CERTIFICATE_VERIFY_NOT_FOUND_TIMEOUT', 60)))
+        return None
+    payload = verification_payload(certificate)
+    cache.set(key, payload, cache_timeout(getattr(settings, 'CERTIFICATE_VERIFY_CACHE_TIMEOUT', 60 * 60)))
+    return payload
+
+
+def _remember_many(missing, certificates):
+    found = {c.certificate_id: verification_payload(c) for c in certificates}
+    cache.set_many(
+        {_cache_key(certificate_id): payload for certificate_id, payload in found.items()},
+        cache_timeout(getattr(settings, 'CERTIFICATE_VERIFY_CACHE_TIMEOUT', 60 * 60)),
+    )
+    cache.set_many(
+        {_cache_key(certificate_id): NOT_FOUND for certificate_id in missing if certificate_id not in found},
+        cache_timeout(getattr(settings, 'CERTIFICATE_VERIFY_NOT_FOUND_TIMEOUT', 60)),
+    )
+    return {certificate_id: found.get(certificate_id) for certificate_id in missing}
+
+
+def _lookup():
+    return Certificate.objects.select_related('user', 'course')
+
+
+def get_verification(certificate_id):
+    """
+    Return the verification payload for a certificate id, or None.
+
+    Hits are cached for CERTIFICATE_VERIFY_CACHE_TIMEOUT; misses are cached
+    for the much shorter CERTIFICATE_VERIFY_NOT_FOUND_TIMEOUT so bots
+    probing random ids do not reach the database on every scan. Ids that
+    fail the format/check-character test never reach the cache at all.
+    """
+    if not is_valid_certificate_id(certificate_id):
+        return None
+    key = _cache_key(certificate_id)
+    payload = cache.get(key)
+    if payload is None:
+        return _remember(key, _lookup().filter(certificate_id=certificate_id).first())
+    return None if payload == NOT_FOUND else payload
+
+
+async def aget_verification(certificate_id):
+    """get_verification for async views"""
+    if not is_valid_certificate_id(certificate_id):
+        return None
+    key = _cache_key(certificate_id)
+    payload = cache.get(key)
+    if payload is None:
+        return _remember(key, await _lookup().filter(certificate_id=certificate_id).afirst())
+    return None if payload == NOT_FOUND else payload
+
+
+def _from_cache(certificate_ids):
+    """Split ids into ({id: payload or None} already known, [ids to load])"""
+    results = {certificate_id: None for certificate_id in certificate_ids if not is_valid_certificate_id(certificate_id)}
+    keys = {
+        _cache_key(certificate_id): certificate_id
+        for certificate_id in certificate_ids if certificate_id not in results
+    }
+    cached = cache.get_many(keys)
+    results.update({keys[key]: (None if payload == NOT_FOUND else payload) for key, payload in cached.items()})
+    missing = [certificate_id for key, certificate_id in keys.items() if key not in cached]
+    return results, missing
+
+
+def get_verifications(certificate_ids):
+    """
+    Resolve many certificate ids at once: {certificate_id: payload or None}.
+
+    Cached entries are read with one get_many; the rest are loaded with a
+    single IN query and written back, misses included.
+    """
+    results, missing = _from_cache(certificate_ids)
+    if missing:
+        results.update(_remember_many(missing, _lookup().filter(certificate_id__in=missing).order_by()))
+    return results
+
+
+async def aget_verifications(certificate_ids):
+    """get_verifications for async views"""
+    results, missing = _from_cache(certificate_ids)
+    if missing:
+        certificates = [c async for c in _lookup().filter(certificate_id__in=missing).order_by()]
+        results.update(_remember_many(missing, certificates))
+    return results
+
+
+def invalidate_verification(*certificate_ids):
+    cache.delete_many([_cache_key(certificate_id) for certificate_id in certificate_ids])
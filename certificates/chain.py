@@ -0,0 +1,140 @@
+# certificates/chain.py
+
+import hashlib
+import itertools
+import json
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class MintResult:
+    """Outcome of minting one certificate"""
+    __slots__ = ('certificate_id', 'transaction_hash', 'nft_token_id', 'error')
+
+    def __init__(self, certificate_id, transaction_hash=None, nft_token_id=None, error=None):
+        self.certificate_id = certificate_id
+        self.transaction_hash = transaction_hash
+        self.nft_token_id = nft_token_id
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BaseChainClient:
+    """
+    Interface for submitting certificate mints to a chain.
+
+    ``mint_batch`` receives a list of dicts with certificate_id,
+    wallet_address, course and score, and returns one MintResult per
+    certificate. Raising marks the whole batch for retry.
+
+    ``lookup`` is the read side used by reconciliation: given certificate
+    ids it returns {certificate_id: {'transaction_hash', 'nft_token_id'}}
+    for those the chain knows about and omits the rest.
+
+    ``in_process`` marks stand-ins whose ledger only lives in this
+    process; reconciliation refuses to treat them as the chain.
+    """
+    in_process = False
+
+    def mint_batch(self, certificates):
+        raise NotImplementedError
+
+    def lookup(self, certificate_ids):
+        raise NotImplementedError
+
+
+class LocalChainClient(BaseChainClient):
+    """
+    In-process stand-in for the chain, for development and tests.
+
+    Mints succeed immediately with a deterministic transaction hash; the
+    ledger is shared by every instance in the process.
+    """
+    in_process = True
+    _lock = threading.Lock()
+    _token_ids = itertools.count(1)
+    ledger = {}
+
+    def mint_batch(self, certificates):
+        results = []
+        with self._lock:
+            for cert in certificates:
+                certificate_id = cert['certificate_id']
+                if certificate_id not in self.ledger:
+                    tx_hash = '0x' + hashlib.sha256(f"{certificate_id}:{cert['wallet_address']}".encode()).hexdigest()
+                    self.ledger[certificate_id] = {
+                        'transaction_hash': tx_hash,
+                        'nft_token_id': str(next(self._token_ids)),
+                        'wallet_address': cert['wallet_address'],
+                    }
+                entry = self.ledger[certificate_id]
+                results.append(MintResult(certificate_id, entry['transaction_hash'], entry['nft_token_id']))
+        return results
+
+    def lookup(self, certificate_ids):
+        with self._lock:
+            return {
+                certificate_id: self.ledger[certificate_id]
+                for certificate_id in certificate_ids
+                if certificate_id in self.ledger
+            }
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.ledger.clear()
+            cls._token_ids = itertools.count(1)
+
+
+class FileChainClient(LocalChainClient):
+    """
+    Chain stand-in backed by a JSON-lines ledger file.
+
+    Each line is {"certificate_id", "transaction_hash", "nft_token_id",
+    "wallet_address"}. Useful for reconciling against an export of the
+    contract's mint events, or for sharing a fake chain across processes.
+    """
+    in_process = False
+
+    def __init__(self, path=None):
+        self.path = path or getattr(settings, 'CERTIFICATE_CHAIN_LEDGER', None)
+        if not self.path:
+            raise ValueError('FileChainClient needs CERTIFICATE_CHAIN_LEDGER or a path')
+        self.ledger = {}
+        try:
+            with open(self.path, encoding='utf-8') as fh:
+                for line in fh:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.ledger[entry.pop('certificate_id')] = entry
+        except FileNotFoundError:
+            pass
+        self._token_ids = itertools.count(len(self.ledger) + 1)
+
+    def mint_batch(self, certificates):
+        known = set(self.ledger)
+        results = super().mint_batch(certificates)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as fh:
+            for result in results:
+                if result.certificate_id not in known:
+                    fh.write(json.dumps({'certificate_id': result.certificate_id, **self.ledger[result.certificate_id]}) + '\n')
+        return results
+
+
+def get_chain_client():
+    """Instantiate the client named by CERTIFICATE_CHAIN_CLIENT"""
+    path = getattr(settings, 'CERTIFICATE_CHAIN_CLIENT', 'certificates.chain.LocalChainClient')
+    return import_string(path)()
+
+
+def get_chain_reader():
+    """Instantiate the reader named by CERTIFICATE_CHAIN_READER (defaults to the client)"""
+    path = getattr(settings, 'CERTIFICATE_CHAIN_READER', None)
+    if path is None:
+        return get_chain_client()
+    return import_string(path)()
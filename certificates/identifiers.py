@@ -0,0 +1,150 @@
+# certificates/identifiers.py
+
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+# Crockford base32: no I, L, O or U, so ids survive being read aloud or retyped
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+# First character of every allocated id. None of these are hex digits, so an
+# allocated id can never equal a legacy SP-<8 hex> id drawn from uuid4.
+LEAD = 'GHJKMNPQRSTVWXYZ'
+BODY_LENGTH = 6
+CAPACITY = len(LEAD) * len(ALPHABET) ** BODY_LENGTH  # 2**34
+# Sequence numbers are spread over the id space with an affine map; CAPACITY
+# is a power of two and the multiplier is odd, so the map is a bijection and
+# uniqueness is preserved while neighbouring ids stop looking sequential.
+_MULTIPLIER = 0x2C9277B5
+_OFFSET = 0x1F3A5C7
+
+PREFIX = 'SP-'
+SEQUENCE_NAME = 'certificate_id'
+
+_LEGACY_RE = re.compile(r'^SP-[0-9A-F]{8}$')
+_INDEX = {char: i for i, char in enumerate(ALPHABET)}
+
+
+def check_character(body):
+    """
+    Luhn mod 32 check character: catches every single-character typo and
+    every adjacent swap except 0 <-> Z, as decimal Luhn misses 0 <-> 9.
+    """
+    factor = 2
+    total = 0
+    base = len(ALPHABET)
+    for char in reversed(body):
+        addend = factor * _INDEX[char]
+        total += addend // base + addend % base
+        factor = 1 if factor == 2 else 2
+    return ALPHABET[(base - total % base) % base]
+
+
+def encode_certificate_id(number):
+    """Turn a sequence number into SP-<lead><6 base32 chars><check>"""
+    if not 0 <= number < CAPACITY:
+        raise ValueError(f'Certificate sequence exhausted ({number})')
+    number = (number * _MULTIPLIER + _OFFSET) % CAPACITY
+    lead, rest = divmod(number, len(ALPHABET) ** BODY_LENGTH)
+    chars = []
+    for _ in range(BODY_LENGTH):
+        rest, digit = divmod(rest, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    body = LEAD[lead] + ''.join(reversed(chars))
+    return PREFIX + body + check_character(body)
+
+
+def is_valid_certificate_id(value):
+    """True for well-formed ids: allocated ones with a good check character, or legacy hex ids"""
+    if not isinstance(value, str) or len(value) != len(PREFIX) + BODY_LENGTH + 2:
+        return False
+    if _LEGACY_RE.match(value):
+        return True
+    if not value.startswith(PREFIX):
+        return False
+    body, check = value[len(PREFIX):-1], value[-1]
+    if body[0] not in LEAD or any(char not in _INDEX for char in value[len(PREFIX):]):
+        return False
+    return check_character(body) == check
+
+
+def reserve_block(size):
+    """
+    Reserve ``size`` sequence numbers in the database and return them as a range.
+
+    The increment is a single UPDATE, so concurrent workers and processes
+    always receive disjoint ranges.
+    """
+    from .models import CertificateIdSequence
+
+    sequence = CertificateIdSequence.objects.filter(name=SEQUENCE_NAME)
+    with transaction.atomic():
+        if not sequence.update(next_value=F('next_value') + size):
+            try:
+                with transaction.atomic():
+                    CertificateIdSequence.objects.create(name=SEQUENCE_NAME, next_value=size)
+            except IntegrityError:
+                sequence.update(next_value=F('next_value') + size)
+        end = sequence.values_list('next_value', flat=True).get()
+    return range(end - size, end)
+
+
+class CertificateIdAllocator:
+    """
+    Hands out certificate ids from blocks reserved in the database.
+
+    Unused numbers of a block stay in memory for later calls. A block
+    reserved inside an outer transaction is only kept once that transaction
+    commits: if it rolls back, the reservation is undone in the database,
+    and so are the certificates that used it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._numbers = []
+        # A forked worker would otherwise hand out the same numbers as its
+        # parent and siblings
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._forget)
+
+    def allocate(self, count):
+        with self._lock:
+            taken = self._numbers[:count]
+            del self._numbers[:count]
+
+        needed = count - len(taken)
+        if needed > 0:
+            block_size = max(needed, getattr(settings, 'CERTIFICATE_ID_BLOCK_SIZE', 100))
+            block = list(reserve_block(block_size))
+            taken.extend(block[:needed])
+            leftovers = block[needed:]
+            if leftovers:
+                transaction.on_commit(lambda: self._release(leftovers))
+
+        return [encode_certificate_id(number) for number in taken]
+
+    def _release(self, numbers):
+        with self._lock:
+            self._numbers.extend(numbers)
+
+    def _forget(self):
+        self._lock = threading.Lock()
+        self._numbers = []
+
+
+allocator = CertificateIdAllocator()
+
+
+def allocate_certificate_ids(count):
+    return allocator.allocate(count)
+
+
+def assign_certificate_ids(certificates):
+    """Pre-assign ids to unsaved certificates, e.g. before bulk_create"""
+    pending = [cert for cert in certificates if not cert.certificate_id]
+    for cert, certificate_id in zip(pending, allocate_certificate_ids(len(pending))):
+        cert.certificate_id = certificate_id
+    return certificates
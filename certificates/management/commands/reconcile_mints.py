@@ -0,0 +1,154 @@
+# certificates/management/commands/reconcile_mints.py
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from certificates.cache import invalidate_verification
+from certificates.chain import get_chain_reader
+from certificates.models import Certificate
+
+FIELDS = ['transaction_hash', 'nft_token_id', 'blockchain_minted', 'mint_status']
+REVIEW_NOTE = 'Not found on chain by reconcile_mints; needs manual review'
+
+
+def reconcile(certificate, entry):
+    """
+    Align one certificate with the chain entry found for it; return True
+    when it changed. Certificates the chain has no entry for are left as
+    they are (see missing_on_chain).
+    """
+    if entry is None:
+        return False
+
+    token_id = entry.get('nft_token_id')
+    expected = (
+        entry.get('transaction_hash'),
+        None if token_id is None else str(token_id),
+        True,
+        Certificate.MINT_MINTED,
+    )
+    actual = tuple(getattr(certificate, field) for field in FIELDS)
+    if actual == expected:
+        return False
+    (certificate.transaction_hash, certificate.nft_token_id,
+     certificate.blockchain_minted, certificate.mint_status) = expected
+    return True
+
+
+def missing_on_chain(certificate, entry):
+    """
+    Minted here but absent from the chain's answer. That may be an
+    incomplete ledger or a lagging reader as much as a lost mint, so the
+    on-chain fields are kept and the row is flagged instead of re-queued.
+    """
+    return entry is None and certificate.blockchain_minted
+
+
+class Command(BaseCommand):
+    help = 'Compare certificate mint fields with the chain and fix mismatches, in resumable chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Certificates read and updated per chunk')
+        parser.add_argument('--lookup-size', type=int, default=100,
+                            help='Certificate ids per chain lookup call')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Concurrent chain lookups')
+        parser.add_argument('--reader', help='Dotted path to a chain reader class (default: CERTIFICATE_CHAIN_READER)')
+        parser.add_argument('--checkpoint', help='File recording the last reconciled primary key')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+        parser.add_argument('--dry-run', action='store_true', help='Report mismatches without writing them')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        lookup_size = options['lookup_size']
+        if chunk_size < 1 or lookup_size < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size, --lookup-size and --workers must be positive')
+
+        reader = import_string(options['reader'])() if options['reader'] else get_chain_reader()
+        if getattr(reader, 'in_process', False):
+            raise CommandError(
+                f'{reader.__class__.__name__} only knows mints made by this process; '
+                'set CERTIFICATE_CHAIN_READER or pass --reader with a reader for the real chain'
+            )
+        checkpoint = options['checkpoint']
+        last_pk = 0 if options['restart'] else self.load_checkpoint(checkpoint)
+        if last_pk:
+            self.stdout.write(f'Resuming after certificate #{last_pk}')
+
+        checked = mismatched = flagged = 0
+        started = time.perf_counter()
+        queryset = Certificate.objects.order_by('pk').only('id', 'certificate_id', *FIELDS)
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size].iterator())
+                if not chunk:
+                    break
+
+                ids = [cert.certificate_id for cert in chunk]
+                on_chain = {}
+                for found in pool.map(reader.lookup, (ids[i:i + lookup_size] for i in range(0, len(ids), lookup_size))):
+                    on_chain.update(found)
+
+                changed = [cert for cert in chunk if reconcile(cert, on_chain.get(cert.certificate_id))]
+                missing = [cert for cert in chunk if missing_on_chain(cert, on_chain.get(cert.certificate_id))]
+                if not options['dry_run']:
+                    with transaction.atomic():
+                        if changed:
+                            Certificate.objects.bulk_update(changed, FIELDS)
+                        if missing:
+                            Certificate.objects.filter(pk__in=[cert.pk for cert in missing]).update(mint_error=REVIEW_NOTE)
+                    if changed:
+                        invalidate_verification(*(cert.certificate_id for cert in changed))
+                if options['verbosity'] > 1:
+                    for cert in changed:
+                        self.stdout.write(f'Mismatch: {cert.certificate_id}')
+                if options['verbosity'] > 0:
+                    for cert in missing:
+                        self.stdout.write(self.style.WARNING(f'Not on chain: {cert.certificate_id}'))
+
+                checked += len(chunk)
+                mismatched += len(changed)
+                flagged += len(missing)
+                last_pk = chunk[-1].pk
+                if not options['dry_run']:
+                    self.save_checkpoint(checkpoint, last_pk)
+
+        elapsed = time.perf_counter() - started
+        if checkpoint and not options['dry_run'] and os.path.exists(checkpoint):
+            # Finished: the next run starts from the beginning again
+            os.remove(checkpoint)
+        action = 'found' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} certificates in {elapsed:.2f}s; {mismatched} mismatches {action}'
+        ))
+        if flagged:
+            flag = 'found' if options['dry_run'] else 'flagged for manual review'
+            self.stdout.write(self.style.WARNING(
+                f'{flagged} minted certificates are missing from the chain and were {flag}; '
+                'their on-chain fields were left unchanged'
+            ))
+
+    def load_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with open(path, encoding='utf-8') as fh:
+                return int(json.load(fh)['last_pk'])
+        except (ValueError, KeyError, TypeError):
+            raise CommandError(f'Unreadable checkpoint file {path}; use --restart to ignore it')
+
+    def save_checkpoint(self, path, last_pk):
+        if not path:
+            return
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump({'last_pk': last_pk}, fh)
+        os.replace(tmp, path)
@@ -0,0 +1,46 @@
+# certificates/management/commands/run_mint_worker.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from certificates.chain import get_chain_client
+from certificates.minting import claim_batch, process_batch, release_stale_claims
+
+
+class Command(BaseCommand):
+    help = 'Claim pending certificates in batches and mint them through the chain client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=getattr(settings, 'CERTIFICATE_MINT_BATCH_SIZE', 50))
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue once and exit instead of polling')
+
+    def handle(self, *args, **options):
+        client = get_chain_client()
+        batch_size = options['batch_size']
+        total = minted = 0
+
+        while True:
+            released = release_stale_claims()
+            if released:
+                self.stdout.write(f'Released {released} stale claims')
+
+            batch = claim_batch(batch_size)
+            if batch:
+                done = process_batch(client, batch)
+                total += len(batch)
+                minted += done
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Batch of {len(batch)}: {done} minted')
+                continue
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} certificates, {minted} minted'))
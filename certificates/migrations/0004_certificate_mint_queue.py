@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_minted(apps, schema_editor):
+    Certificate = apps.get_model('certificates', 'Certificate')
+    Certificate.objects.filter(blockchain_minted=True).update(mint_status='minted')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0003_initial'),
+        ('courses', '0004_course_catalogue_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='mint_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='mint_batch',
+            field=models.CharField(blank=True, default='', help_text='Claim token of the worker batch', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='mint_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='mint_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='mint_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('minted', 'Minted'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['mint_status', 'id'], name='certificate_mint_queue_idx'),
+        ),
+        migrations.RunPython(mark_minted, migrations.RunPython.noop),
+    ]
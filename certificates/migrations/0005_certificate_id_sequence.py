@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0004_certificate_mint_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateIdSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0005_certificate_id_sequence'),
+        ('courses', '0005_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['user', '-issued_at'], name='certificate_user_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['transaction_hash'], name='certificate_tx_hash_idx'),
+        ),
+    ]
@@ -0,0 +1,155 @@
+# certificates/minting.py
+
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate_verification
+from .models import Certificate
+
+logger = logging.getLogger(__name__)
+
+RESULT_FIELDS = [
+    'transaction_hash', 'nft_token_id', 'blockchain_minted',
+    'mint_status', 'mint_error', 'mint_batch', 'mint_claimed_at',
+]
+
+
+def mintable():
+    """Pending certificates whose owner has a wallet to receive the NFT"""
+    return (
+        Certificate.objects.filter(mint_status=Certificate.MINT_PENDING)
+        .exclude(user__wallet_address__isnull=True)
+        .exclude(user__wallet_address='')
+    )
+
+
+def release_stale_claims(timeout=None):
+    """Put batches abandoned by a crashed worker back in the queue"""
+    if timeout is None:
+        timeout = getattr(settings, 'CERTIFICATE_MINT_CLAIM_TIMEOUT', 600)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Certificate.objects.filter(
+        mint_status=Certificate.MINT_PROCESSING,
+        mint_claimed_at__lt=cutoff,
+    ).update(mint_status=Certificate.MINT_PENDING, mint_batch='', mint_claimed_at=None)
+
+
+def claim_batch(size):
+    """
+    Claim up to ``size`` pending certificates for this worker.
+
+    The UPDATE re-checks mint_status, so when two workers pick the same
+    ids only one of them wins each row; rows are then read back by id and
+    claim token, which keeps the read a primary-key lookup.
+    """
+    token = uuid.uuid4().hex
+    ids = list(mintable().order_by('id').values_list('id', flat=True)[:size])
+    if not ids:
+        return []
+    Certificate.objects.filter(id__in=ids, mint_status=Certificate.MINT_PENDING).update(
+        mint_status=Certificate.MINT_PROCESSING,
+        mint_batch=token,
+        mint_claimed_at=timezone.now(),
+        mint_attempts=F('mint_attempts') + 1,
+    )
+    return list(Certificate.objects.select_related('user', 'course').filter(id__in=ids, mint_batch=token).order_by('id'))
+
+
+def still_claimed(certificates, token):
+    """The certificates of a batch whose claim has not been released or taken over"""
+    held = set(
+        Certificate.objects.filter(pk__in=[cert.pk for cert in certificates], mint_batch=token)
+        .values_list('pk', flat=True)
+    )
+    return [cert for cert in certificates if cert.pk in held]
+
+
+def process_batch(client, certificates):
+    """
+    Submit a claimed batch through ``client`` and write the results back.
+
+    Only rows this batch still holds are submitted, and each result is
+    written with an UPDATE conditioned on the claim token: a claim that
+    release_stale_claims handed to another worker, or a mint the learner's
+    browser recorded meanwhile, is left alone rather than overwritten.
+    """
+    if not certificates:
+        return 0
+    token = certificates[0].mint_batch
+    certificates = still_claimed(certificates, token)
+    if not certificates:
+        return 0
+    max_attempts = getattr(settings, 'CERTIFICATE_MINT_MAX_ATTEMPTS', 5)
+
+    try:
+        results = {
+            result.certificate_id: result
+            for result in client.mint_batch([{
+                'certificate_id': cert.certificate_id,
+                'wallet_address': cert.user.wallet_address,
+                'course': cert.course.title,
+                'score': cert.score,
+            } for cert in certificates])
+        }
+        batch_error = None
+    except Exception as e:
+        results = {}
+        batch_error = str(e) or e.__class__.__name__
+
+    for cert in certificates:
+        result = results.get(cert.certificate_id)
+        cert.mint_batch = ''
+        cert.mint_claimed_at = None
+        if result is not None and result.ok:
+            cert.transaction_hash = result.transaction_hash
+            cert.nft_token_id = result.nft_token_id
+            cert.blockchain_minted = True
+            cert.mint_status = Certificate.MINT_MINTED
+            cert.mint_error = ''
+            continue
+        cert.mint_error = batch_error or (result.error if result else 'No result returned by chain client')
+        cert.mint_status = Certificate.MINT_FAILED if cert.mint_attempts >= max_attempts else Certificate.MINT_PENDING
+
+    minted = 0
+    written = []
+    with transaction.atomic():
+        for cert in certificates:
+            updated = Certificate.objects.filter(pk=cert.pk, mint_batch=token).update(
+                **{field: getattr(cert, field) for field in RESULT_FIELDS}
+            )
+            if not updated:
+                logger.warning('Claim on certificate %s was lost; result not written', cert.certificate_id)
+                continue
+            written.append(cert.certificate_id)
+            minted += cert.blockchain_minted
+    # update() skips post_save
+    transaction.on_commit(lambda: invalidate_verification(*written))
+    return minted
+
+
+def record_client_mint(certificate, transaction_hash, nft_token_id):
+    """
+    Record a mint made from the learner's browser; returns False without
+    writing when the queue has claimed the certificate or it is already
+    minted, so the two paths never both mint it or overwrite each other.
+    """
+    updated = (
+        Certificate.objects.filter(pk=certificate.pk, blockchain_minted=False)
+        .exclude(mint_status__in=[Certificate.MINT_PROCESSING, Certificate.MINT_MINTED])
+        .update(
+            transaction_hash=transaction_hash,
+            nft_token_id=nft_token_id,
+            blockchain_minted=True,
+            mint_status=Certificate.MINT_MINTED,
+            mint_error='',
+        )
+    )
+    if updated:
+        transaction.on_commit(lambda: invalidate_verification(certificate.certificate_id))
+    return bool(updated)
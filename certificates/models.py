@@ -3,12 +3,42 @@
 from django.db import models
 from django.conf import settings
 from courses.models import Course
+from .identifiers import allocate_certificate_ids
+
+
+def generate_certificate_id():
+    """Public certificate identifier, e.g. SP-G00001AK"""
+    return allocate_certificate_ids(1)[0]
+
+
+class CertificateIdSequence(models.Model):
+    """
+    Counter behind certificate ids; allocators reserve blocks from it
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
 
 class Certificate(models.Model):
     """
     Represents a certificate issued to a user
     Will be linked to blockchain NFT
     """
+    MINT_PENDING = 'pending'
+    MINT_PROCESSING = 'processing'
+    MINT_MINTED = 'minted'
+    MINT_FAILED = 'failed'
+    
+    MINT_STATUS_CHOICES = [
+        (MINT_PENDING, 'Pending'),
+        (MINT_PROCESSING, 'Processing'),
+        (MINT_MINTED, 'Minted'),
+        (MINT_FAILED, 'Failed'),
+    ]
+    
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     score = models.IntegerField()
@@ -19,6 +49,13 @@ class Certificate(models.Model):
     transaction_hash = models.CharField(max_length=100, blank=True, null=True)
     blockchain_minted = models.BooleanField(default=False)
     
+    # Server-side mint queue
+    mint_status = models.CharField(max_length=20, choices=MINT_STATUS_CHOICES, default=MINT_PENDING)
+    mint_attempts = models.IntegerField(default=0)
+    mint_error = models.TextField(blank=True, default='')
+    mint_batch = models.CharField(max_length=32, blank=True, default='', help_text="Claim token of the worker batch")
+    mint_claimed_at = models.DateTimeField(blank=True, null=True)
+    
     # Certificate details
     certificate_id = models.CharField(max_length=50, unique=True)
     
@@ -27,6 +64,13 @@ class Certificate(models.Model):
         ordering = ['-issued_at']
         verbose_name = 'Certificate'
         verbose_name_plural = 'Certificates'
+        indexes = [
+            models.Index(fields=['mint_status', 'id'], name='certificate_mint_queue_idx'),
+            # Dashboard / user_certificates
+            models.Index(fields=['user', '-issued_at'], name='certificate_user_issued_idx'),
+            # Admin and support lookups by transaction
+            models.Index(fields=['transaction_hash'], name='certificate_tx_hash_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.course.title}"
@@ -34,6 +78,5 @@ class Certificate(models.Model):
     def save(self, *args, **kwargs):
         if not self.certificate_id:
             # Generate unique certificate ID
-            import uuid
-            self.certificate_id = f"SP-{uuid.uuid4().hex[:8].upper()}"
+            self.certificate_id = generate_certificate_id()
         super().save(*args, **kwargs)
\ No newline at end of file
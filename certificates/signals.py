@@ -0,0 +1,20 @@
+# certificates/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_verification
+from .models import Certificate
+
+
+@receiver(post_save, sender=Certificate)
+@receiver(post_delete, sender=Certificate)
+def invalidate_certificate_verification(sender, instance, **kwargs):
+    """
+    Covers issuance (clears a cached miss) as well as blockchain updates.
+    Deferred to commit: cleared any earlier, a concurrent verify could
+    cache the old row again before the change is visible.
+    """
+    certificate_id = instance.certificate_id
+    transaction.on_commit(lambda: invalidate_verification(certificate_id), using=kwargs.get('using'))
@@ -1,3 +1,378 @@
-from django.test import TestCase
+# certificates/tests.py
 
-# Create your tests here.
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from courses.models import Course
+from users.models import CustomUser
+from .cache import _cache_key as verification_key, get_verification
+from .chain import BaseChainClient, LocalChainClient, MintResult
+from .identifiers import (
+    ALPHABET, PREFIX, SEQUENCE_NAME, CertificateIdAllocator, check_character,
+    encode_certificate_id, is_valid_certificate_id, reserve_block,
+)
+from .minting import claim_batch, process_batch, record_client_mint, release_stale_claims
+from .models import Certificate, CertificateIdSequence
+
+
+def make_course(slug='course'):
+    return Course.objects.create(
+        title=slug.title(), slug=slug, description='Test course', category='programming',
+        difficulty='beginner', duration=10, content='# Test',
+    )
+
+
+def issue(course, username, wallet=None):
+    user = CustomUser.objects.create_user(username, f'{username}@example.com', 'password-1', wallet_address=wallet)
+    return Certificate.objects.create(user=user, course=course, score=90)
+
+
+class CheckCharacterTests(TestCase):
+    ids = [encode_certificate_id(n) for n in (0, 1, 2, 41, 1000, 2 ** 20, 2 ** 34 - 1)]
+
+    def test_allocated_and_legacy_ids_are_valid(self):
+        for certificate_id in self.ids:
+            self.assertTrue(is_valid_certificate_id(certificate_id), certificate_id)
+        self.assertTrue(is_valid_certificate_id('SP-1A2B3C4D'))
+
+    def test_malformed_ids_are_rejected(self):
+        for value in ['', 'SP-', 'XX-G00001AK', self.ids[0][:-1], self.ids[0] + 'A', 'SP-G0000IAK', None]:
+            self.assertFalse(is_valid_certificate_id(value), value)
+
+    def test_every_single_character_typo_is_caught(self):
+        for certificate_id in self.ids:
+            body = certificate_id[len(PREFIX):]
+            for i, original in enumerate(body):
+                for char in ALPHABET:
+                    if char != original:
+                        typo = PREFIX + body[:i] + char + body[i + 1:]
+                        self.assertFalse(is_valid_certificate_id(typo), typo)
+
+    def test_adjacent_swaps_are_caught_except_zero_and_z(self):
+        for certificate_id in self.ids:
+            body = certificate_id[len(PREFIX):]
+            for i in range(len(body) - 1):
+                if body[i] != body[i + 1] and {body[i], body[i + 1]} != {'0', 'Z'}:
+                    swapped = PREFIX + body[:i] + body[i + 1] + body[i] + body[i + 2:]
+                    self.assertFalse(is_valid_certificate_id(swapped), swapped)
+
+    def test_zero_and_z_swap_is_the_luhn_blind_spot(self):
+        body = 'G0Z79E7'
+        swapped = 'GZ079E7'
+        self.assertEqual(check_character(body), check_character(swapped))
+
+    def test_check_character_completes_the_body(self):
+        certificate_id = self.ids[3]
+        body = certificate_id[len(PREFIX):-1]
+        self.assertEqual(check_character(body), certificate_id[-1])
+
+    def test_neighbouring_numbers_give_distinct_ids(self):
+        ids = [encode_certificate_id(n) for n in range(5000)]
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_sequence_exhaustion_is_an_error(self):
+        with self.assertRaises(ValueError):
+            encode_certificate_id(2 ** 34)
+
+
+class ReserveBlockTests(TestCase):
+    def test_blocks_are_consecutive_and_disjoint(self):
+        first = reserve_block(10)
+        second = reserve_block(5)
+        self.assertEqual(first, range(0, 10))
+        self.assertEqual(second, range(10, 15))
+        self.assertEqual(CertificateIdSequence.objects.get(name=SEQUENCE_NAME).next_value, 15)
+
+
+@override_settings(CERTIFICATE_ID_BLOCK_SIZE=10)
+class AllocatorTests(TestCase):
+    def setUp(self):
+        self.allocator = CertificateIdAllocator()
+
+    def test_leftovers_of_a_block_are_used_before_reserving_another(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.allocator.allocate(3)
+        self.assertEqual(first, [encode_certificate_id(n) for n in range(3)])
+        with self.assertNumQueries(0):
+            second = self.allocator.allocate(7)
+        self.assertEqual(second, [encode_certificate_id(n) for n in range(3, 10)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            third = self.allocator.allocate(2)
+        self.assertEqual(third, [encode_certificate_id(n) for n in range(10, 12)])
+        self.assertEqual(CertificateIdSequence.objects.get(name=SEQUENCE_NAME).next_value, 20)
+
+    def test_large_requests_reserve_a_block_of_their_own_size(self):
+        ids = self.allocator.allocate(25)
+        self.assertEqual(len(set(ids)), 25)
+        self.assertEqual(CertificateIdSequence.objects.get(name=SEQUENCE_NAME).next_value, 25)
+
+    def test_a_rolled_back_reservation_keeps_no_leftovers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    rolled_back = self.allocator.allocate(3)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse(CertificateIdSequence.objects.filter(name=SEQUENCE_NAME, next_value__gt=0).exists())
+
+        # The reservation was undone with the transaction, so the numbers are
+        # handed out again, by a fresh block rather than from memory
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.allocator.allocate(3), rolled_back)
+        self.assertEqual(CertificateIdSequence.objects.get(name=SEQUENCE_NAME).next_value, 10)
+
+
+class VerificationCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+        self.certificate = issue(self.course, 'learner')
+        self.url = f'/api/certificates/verify/{self.certificate.certificate_id}/'
+        self.unknown = encode_certificate_id(10 ** 6)
+
+    def test_hits_are_cached(self):
+        self.assertTrue(self.client.get(self.url).json()['valid'])
+        with self.assertNumQueries(0):
+            payload = self.client.get(self.url).json()
+        self.assertEqual(payload['user'], 'learner')
+        self.assertEqual(payload['course'], 'Course')
+
+    def test_misses_are_cached_briefly(self):
+        self.assertEqual(self.client.get(f'/api/certificates/verify/{self.unknown}/').status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(f'/api/certificates/verify/{self.unknown}/').status_code, 404)
+        with override_settings(CERTIFICATE_VERIFY_NOT_FOUND_TIMEOUT=0):
+            cache.clear()
+            get_verification(self.unknown)
+            with self.assertNumQueries(1):
+                get_verification(self.unknown)
+
+    def test_malformed_ids_never_reach_the_database_or_cache(self):
+        typo = self.certificate.certificate_id[:-1] + ('0' if self.certificate.certificate_id[-1] != '0' else '1')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(f'/api/certificates/verify/{typo}/').status_code, 404)
+        self.assertIsNone(cache.get(verification_key(typo)))
+
+    def test_issuing_clears_a_cached_miss_on_commit(self):
+        self.assertIsNone(get_verification(self.unknown))
+        with self.captureOnCommitCallbacks(execute=True):
+            Certificate.objects.create(
+                user=CustomUser.objects.create_user('late', 'late@example.com', 'password-1'),
+                course=self.course, score=80, certificate_id=self.unknown,
+            )
+        self.assertEqual(get_verification(self.unknown)['user'], 'late')
+
+    def test_updates_are_visible_once_committed(self):
+        get_verification(self.certificate.certificate_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.certificate.blockchain_minted = True
+            self.certificate.save()
+            # Still the committed state while the transaction is open
+            self.assertFalse(get_verification(self.certificate.certificate_id)['blockchain_minted'])
+        self.assertTrue(get_verification(self.certificate.certificate_id)['blockchain_minted'])
+
+
+class BulkVerifyTests(TestCase):
+    url = '/api/certificates/verify/'
+
+    def setUp(self):
+        cache.clear()
+        course = make_course()
+        self.ids = [issue(course, f'learner{i}').certificate_id for i in range(5)]
+        cache.clear()
+
+    def verify(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_one_query_for_every_uncached_id_then_none(self):
+        unknown = encode_certificate_id(10 ** 6)
+        ids = self.ids + [unknown, 'SP-BOGUS', self.ids[0]]
+        with self.assertNumQueries(1):
+            results = self.verify({'certificate_ids': ids}).json()['results']
+        self.assertCountEqual(results, self.ids + [unknown, 'SP-BOGUS'])
+        self.assertTrue(all(results[certificate_id]['valid'] for certificate_id in self.ids))
+        self.assertFalse(results[unknown]['valid'])
+        self.assertFalse(results['SP-BOGUS']['valid'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.verify({'certificate_ids': ids}).json()['results'], results)
+
+    def test_shares_the_single_verification_cache(self):
+        self.client.get(f'/api/certificates/verify/{self.ids[0]}/')
+        with self.assertNumQueries(1):
+            self.verify({'certificate_ids': self.ids})
+        with self.assertNumQueries(0):
+            self.client.get(f'/api/certificates/verify/{self.ids[4]}/')
+
+    @override_settings(CERTIFICATE_BULK_VERIFY_MAX=3)
+    def test_bad_requests(self):
+        self.assertEqual(self.verify({'certificate_ids': self.ids}).status_code, 400)
+        self.assertEqual(self.verify({'certificate_ids': 'SP-1A2B3C4D'}).status_code, 400)
+        self.assertEqual(self.verify({'certificate_ids': [1, 2]}).status_code, 400)
+        self.assertEqual(self.verify(['SP-1A2B3C4D']).status_code, 400)
+        self.assertEqual(self.client.post(self.url, 'not json', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class FailingChain(BaseChainClient):
+    def mint_batch(self, certificates):
+        return [MintResult(cert['certificate_id'], error='reverted') for cert in certificates]
+
+
+class BrokenChain(BaseChainClient):
+    def mint_batch(self, certificates):
+        raise ConnectionError('node unreachable')
+
+
+class MintQueueTests(TestCase):
+    def setUp(self):
+        LocalChainClient.reset()
+        self.course = make_course()
+        self.certificates = [issue(self.course, f'learner{i}', wallet=f'0x{i + 1:040x}') for i in range(3)]
+
+    def status(self, certificate):
+        certificate.refresh_from_db()
+        return certificate.mint_status
+
+    def test_claim_takes_pending_certificates_with_a_wallet_once(self):
+        issue(self.course, 'no-wallet')
+        batch = claim_batch(10)
+        self.assertEqual([cert.pk for cert in batch], [cert.pk for cert in self.certificates])
+        self.assertEqual(len({cert.mint_batch for cert in batch}), 1)
+        self.assertTrue(all(cert.mint_status == Certificate.MINT_PROCESSING for cert in batch))
+        self.assertTrue(all(cert.mint_attempts == 1 for cert in batch))
+        self.assertEqual(claim_batch(10), [])
+
+    def test_claim_respects_the_batch_size(self):
+        self.assertEqual(len(claim_batch(2)), 2)
+        self.assertEqual(len(claim_batch(2)), 1)
+
+    def test_process_writes_minted_results(self):
+        batch = claim_batch(10)
+        self.assertEqual(process_batch(LocalChainClient(), batch), 3)
+        for certificate in self.certificates:
+            certificate.refresh_from_db()
+            self.assertEqual(certificate.mint_status, Certificate.MINT_MINTED)
+            self.assertTrue(certificate.blockchain_minted)
+            self.assertTrue(certificate.transaction_hash.startswith('0x'))
+            self.assertEqual(certificate.mint_batch, '')
+            self.assertIsNone(certificate.mint_claimed_at)
+
+    @override_settings(CERTIFICATE_MINT_MAX_ATTEMPTS=2)
+    def test_failures_are_retried_then_given_up(self):
+        self.assertEqual(process_batch(FailingChain(), claim_batch(10)), 0)
+        self.assertEqual(self.status(self.certificates[0]), Certificate.MINT_PENDING)
+        self.assertEqual(self.certificates[0].mint_error, 'reverted')
+
+        process_batch(BrokenChain(), claim_batch(10))
+        self.assertEqual(self.status(self.certificates[0]), Certificate.MINT_FAILED)
+        self.assertEqual(self.certificates[0].mint_error, 'node unreachable')
+        self.assertEqual(claim_batch(10), [])
+
+    def test_release_returns_only_stale_claims(self):
+        stale = claim_batch(1)
+        Certificate.objects.filter(pk=stale[0].pk).update(mint_claimed_at=timezone.now() - timedelta(hours=1))
+        claim_batch(1)
+        self.assertEqual(release_stale_claims(timeout=600), 1)
+        self.assertEqual(self.status(self.certificates[0]), Certificate.MINT_PENDING)
+        self.assertEqual(self.status(self.certificates[1]), Certificate.MINT_PROCESSING)
+
+    def test_results_of_a_released_claim_do_not_overwrite_the_new_owner(self):
+        abandoned = claim_batch(10)
+        release_stale_claims(timeout=-1)
+        current = claim_batch(10)
+
+        self.assertEqual(process_batch(LocalChainClient(), abandoned), 0)
+        self.assertEqual(self.status(self.certificates[0]), Certificate.MINT_PROCESSING)
+        self.assertEqual(process_batch(LocalChainClient(), current), 3)
+        self.assertEqual(self.status(self.certificates[0]), Certificate.MINT_MINTED)
+
+    def test_browser_mint_is_refused_while_claimed_or_once_minted(self):
+        claim_batch(1)
+        claimed, unclaimed = self.certificates[0], self.certificates[1]
+        self.assertFalse(record_client_mint(claimed, '0x' + 'a' * 64, '1'))
+        self.assertEqual(self.status(claimed), Certificate.MINT_PROCESSING)
+
+        self.assertTrue(record_client_mint(unclaimed, '0x' + 'b' * 64, '2'))
+        self.assertEqual(self.status(unclaimed), Certificate.MINT_MINTED)
+        self.assertFalse(record_client_mint(unclaimed, '0x' + 'c' * 64, '3'))
+        unclaimed.refresh_from_db()
+        self.assertEqual(unclaimed.nft_token_id, '2')
+
+
+class ReconcileMintsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        course = make_course()
+        self.certificates = [issue(course, f'learner{i}') for i in range(6)]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.ledger = os.path.join(directory.name, 'ledger.jsonl')
+        self.checkpoint = os.path.join(directory.name, 'checkpoint.json')
+        with open(self.ledger, 'w', encoding='utf-8') as fh:
+            for i, certificate in enumerate(self.certificates[:3]):
+                fh.write(json.dumps({
+                    'certificate_id': certificate.certificate_id,
+                    'transaction_hash': f'0x{i}', 'nft_token_id': i,
+                }) + '\n')
+        # 0 already matches the chain; 5 claims a mint the chain does not have
+        self.mark_minted(self.certificates[0], '0x0', '0')
+        self.mark_minted(self.certificates[5], '0xlost', '9')
+
+    def mark_minted(self, certificate, transaction_hash, nft_token_id):
+        Certificate.objects.filter(pk=certificate.pk).update(
+            blockchain_minted=True, transaction_hash=transaction_hash, nft_token_id=nft_token_id,
+            mint_status=Certificate.MINT_MINTED,
+        )
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        with override_settings(CERTIFICATE_CHAIN_LEDGER=self.ledger):
+            call_command(
+                'reconcile_mints', '--reader', 'certificates.chain.FileChainClient',
+                '--chunk-size', '2', '--lookup-size', '1', '--checkpoint', self.checkpoint, *args, stdout=out,
+            )
+        return out.getvalue()
+
+    def test_fixes_mismatches_and_flags_mints_missing_on_chain(self):
+        output = self.reconcile()
+        self.assertIn('Checked 6 certificates', output)
+        self.assertIn('2 mismatches fixed', output)
+        self.assertIn('1 minted certificates are missing from the chain', output)
+
+        minted = Certificate.objects.filter(blockchain_minted=True).order_by('pk')
+        self.assertEqual([c.pk for c in minted], [c.pk for c in self.certificates[:3]] + [self.certificates[5].pk])
+        second = Certificate.objects.get(pk=self.certificates[2].pk)
+        self.assertEqual((second.transaction_hash, second.nft_token_id, second.mint_status), ('0x2', '2', 'minted'))
+        lost = Certificate.objects.get(pk=self.certificates[5].pk)
+        self.assertEqual((lost.transaction_hash, lost.mint_status), ('0xlost', 'minted'))
+        self.assertIn('manual review', lost.mint_error)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_dry_run_writes_nothing(self):
+        self.assertIn('2 mismatches found', self.reconcile('--dry-run'))
+        self.assertFalse(Certificate.objects.get(pk=self.certificates[1].pk).blockchain_minted)
+        self.assertEqual(Certificate.objects.get(pk=self.certificates[5].pk).mint_error, '')
+
+    def test_resumes_after_the_checkpoint(self):
+        with open(self.checkpoint, 'w', encoding='utf-8') as fh:
+            json.dump({'last_pk': self.certificates[1].pk}, fh)
+        output = self.reconcile()
+        self.assertIn(f'Resuming after certificate #{self.certificates[1].pk}', output)
+        self.assertIn('Checked 4 certificates', output)
+        self.assertFalse(Certificate.objects.get(pk=self.certificates[1].pk).blockchain_minted)
+
+    def test_refuses_an_in_process_reader(self):
+        with self.assertRaises(CommandError):
+            call_command('reconcile_mints', '--reader', 'certificates.chain.LocalChainClient', stdout=io.StringIO())
@@ -6,8 +6,10 @@ from . import views
 urlpatterns = [
     # Remove 'api/certificates/' prefix - it's already in main urls.py!
     path('', views.user_certificates, name='user_certificates'),
-    path('<str:certificate_id>/', views.certificate_detail, name='certificate_detail'),
+    # Fixed paths must come before the <certificate_id> catch-all
+    path('verify/', views.verify_certificates_bulk, name='verify_certificates_bulk'),
     path('verify/<str:certificate_id>/', views.verify_certificate, name='verify_certificate'),
     path('update-blockchain/', views.update_blockchain, name='update_blockchain'),
     path('mint/<int:certificate_pk>/', views.mint_nft, name='mint_nft'),
+    path('<str:certificate_id>/', views.certificate_detail, name='certificate_detail'),
 ]
\ No newline at end of file
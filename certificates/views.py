@@ -1,15 +1,23 @@
 # certificates/views.py - FIXED VERSION
 
-from django.shortcuts import get_object_or_404, render
+from django.conf import settings
+from django.shortcuts import aget_object_or_404, get_object_or_404, render
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
+from backend.routers import replica_reads
+from backend.sqlite import aserialized_write
+from backend.streaming import StreamingJsonResponse, stream_items
+from .cache import aget_verification, aget_verifications
+from .minting import record_client_mint
 from .models import Certificate
 import json
 from django.views.decorators.csrf import csrf_exempt
 
+ALREADY_MINTING = 'Certificate is already minted or being minted by the server'
+
 @csrf_exempt
 @login_required
-def update_blockchain(request):
+async def update_blockchain(request):
     """Update certificate with blockchain transaction data"""
     if request.method != 'POST':
         return JsonResponse({'error': 'POST method required'}, status=405)
@@ -20,11 +28,9 @@ def update_blockchain(request):
         tx_hash = data.get('transaction_hash')
         token_id = data.get('nft_token_id')
         
-        certificate = Certificate.objects.get(certificate_id=certificate_id, user=request.user)
-        certificate.transaction_hash = tx_hash
-        certificate.nft_token_id = token_id
-        certificate.blockchain_minted = True
-        certificate.save()
+        certificate = await Certificate.objects.aget(certificate_id=certificate_id, user=await request.auser())
+        if not await aserialized_write(record_client_mint, certificate, tx_hash, token_id):
+            return JsonResponse({'error': ALREADY_MINTING}, status=409)
         
         return JsonResponse({
             'success': True,
@@ -35,28 +41,37 @@ def update_blockchain(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
-@login_required
-def user_certificates(request):
-    """Get all certificates for logged-in user"""
-    certificates = Certificate.objects.filter(user=request.user).select_related('course')
-    
-    certs_data = [{
-        'certificate_id': cert.certificate_id,
+def certificate_values(user):
+    """A user's certificates, as .values() dicts for certificate_item"""
+    return Certificate.objects.filter(user=user).values(
+        'certificate_id', 'course__title', 'course__slug', 'course__category', 'course__difficulty',
+        'score', 'issued_at', 'blockchain_minted', 'mint_status', 'transaction_hash', 'nft_token_id',
+    )
+
+def certificate_item(cert):
+    return {
+        'certificate_id': cert['certificate_id'],
         'course': {
-            'title': cert.course.title,
-            'slug': cert.course.slug,
-            'category': cert.course.category if hasattr(cert.course, 'category') else 'general',
-            'difficulty': cert.course.difficulty if hasattr(cert.course, 'difficulty') else 'intermediate',
+            'title': cert['course__title'],
+            'slug': cert['course__slug'],
+            'category': cert['course__category'] or 'general',
+            'difficulty': cert['course__difficulty'] or 'intermediate',
         },
-        'score': cert.score,
-        'issued_at': cert.issued_at.isoformat(),
-        'blockchain_minted': cert.blockchain_minted,
-        'transaction_hash': cert.transaction_hash,
-        'nft_token_id': cert.nft_token_id,
-    } for cert in certificates]
-    
-    return JsonResponse({'certificates': certs_data})
+        'score': cert['score'],
+        'issued_at': cert['issued_at'].isoformat(),
+        'blockchain_minted': cert['blockchain_minted'],
+        'mint_status': cert['mint_status'],
+        'transaction_hash': cert['transaction_hash'],
+        'nft_token_id': cert['nft_token_id'],
+    }
 
+@login_required
+async def user_certificates(request):
+    """Get all certificates for logged-in user"""
+    certificates = certificate_values(await request.auser())
+    return StreamingJsonResponse('certificates', stream_items(request, certificates, certificate_item))
+
+@replica_reads
 def certificate_detail(request, certificate_id):
     """Get certificate details - Returns HTML page OR JSON based on request"""
     certificate = get_object_or_404(Certificate, certificate_id=certificate_id)
@@ -88,27 +103,44 @@ def certificate_detail(request, certificate_id):
     }
     return render(request, 'certificates/certificate_detail.html', context)
 
-def verify_certificate(request, certificate_id):
+@replica_reads
+async def verify_certificate(request, certificate_id):
     """Verify if a certificate is valid"""
-    try:
-        certificate = Certificate.objects.get(certificate_id=certificate_id)
-        return JsonResponse({
-            'valid': True,
-            'certificate_id': certificate.certificate_id,
-            'user': certificate.user.username,
-            'course': certificate.course.title,
-            'issued_at': certificate.issued_at.isoformat(),
-            'blockchain_minted': certificate.blockchain_minted,
-            'nft_token_id': certificate.nft_token_id,
-        })
-    except Certificate.DoesNotExist:
+    payload = await aget_verification(certificate_id)
+    if payload is None:
         return JsonResponse({
             'valid': False,
             'message': 'Certificate not found'
         }, status=404)
+    return JsonResponse(payload)
+
+@csrf_exempt
+async def verify_certificates_bulk(request):
+    """Verify a list of certificate ids in one request"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST method required'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    certificate_ids = data.get('certificate_ids') if isinstance(data, dict) else None
+    if not isinstance(certificate_ids, list) or not all(isinstance(c, str) for c in certificate_ids):
+        return JsonResponse({'error': 'certificate_ids must be a list of strings'}, status=400)
+    
+    limit = getattr(settings, 'CERTIFICATE_BULK_VERIFY_MAX', 500)
+    if len(certificate_ids) > limit:
+        return JsonResponse({'error': f'At most {limit} certificate ids per request'}, status=400)
+    
+    results = {
+        certificate_id: payload or {'valid': False, 'message': 'Certificate not found'}
+        for certificate_id, payload in (await aget_verifications(dict.fromkeys(certificate_ids))).items()
+    }
+    return JsonResponse({'results': results})
 
 @login_required
-def mint_nft(request, certificate_pk):
+async def mint_nft(request, certificate_pk):
     """
     Mint NFT certificate on blockchain
     This endpoint is called after blockchain minting to update the database
@@ -116,7 +148,7 @@ def mint_nft(request, certificate_pk):
     if request.method != 'POST':
         return JsonResponse({'error': 'POST method required'}, status=405)
     
-    certificate = get_object_or_404(Certificate, pk=certificate_pk, user=request.user)
+    certificate = await aget_object_or_404(Certificate, pk=certificate_pk, user=await request.auser())
     
     try:
         data = json.loads(request.body)
@@ -124,11 +156,12 @@ def mint_nft(request, certificate_pk):
         token_id = data.get('nft_token_id')
         
         if tx_hash and token_id:
-            certificate.transaction_hash = tx_hash
-            certificate.nft_token_id = token_id
-            certificate.blockchain_minted = True
-            certificate.save()
-            
+            if not await aserialized_write(record_client_mint, certificate, tx_hash, token_id):
+                return JsonResponse({
+                    'success': False,
+                    'error': ALREADY_MINTING,
+                }, status=409)
+                
             return JsonResponse({
                 'success': True,
                 'message': 'Certificate successfully minted as NFT',
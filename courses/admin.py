@@ -1,7 +1,8 @@
 # courses/admin.py
 
 from django.contrib import admin
-from .models import Course, Quiz, Question, UserProgress
+from .models import Course, Quiz, QuizAttempt, QuizAttemptRollup, Question, UserProgress
+from .search import search_course_ids
 
 class QuestionInline(admin.TabularInline):
     """
@@ -12,14 +13,47 @@ class QuestionInline(admin.TabularInline):
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ['title', 'category', 'difficulty', 'duration', 'is_active', 'created_at']
+    list_display = ['title', 'category', 'difficulty', 'duration', 'is_active', 'attempts', 'pass_rate',
+                    'average_score', 'best_score', 'certificates_issued', 'created_at']
     list_filter = ['category', 'difficulty', 'is_active']
+    list_select_related = ['stats']
     search_fields = ['title', 'description']
     prepopulated_fields = {'slug': ('title',)}
+    
+    def _stat(self, obj, name):
+        stats = getattr(obj, 'stats', None)
+        return getattr(stats, name) if stats is not None else 0
+    
+    @admin.display(description='Attempts', ordering='stats__attempts')
+    def attempts(self, obj):
+        return self._stat(obj, 'attempts')
+    
+    @admin.display(description='Pass rate %')
+    def pass_rate(self, obj):
+        return self._stat(obj, 'pass_rate')
+    
+    @admin.display(description='Avg score')
+    def average_score(self, obj):
+        return self._stat(obj, 'average_score')
+    
+    @admin.display(description='Best', ordering='stats__best_score')
+    def best_score(self, obj):
+        return self._stat(obj, 'best_score')
+    
+    @admin.display(description='Certificates', ordering='stats__certificates_issued')
+    def certificates_issued(self, obj):
+        return self._stat(obj, 'certificates_issued')
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Use the FTS5 index instead of LIKE '%...%' when it is available"""
+        ids = search_course_ids(search_term) if search_term.strip() else None
+        if ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=ids), False
 
 @admin.register(Quiz)
 class QuizAdmin(admin.ModelAdmin):
-    list_display = ['course', 'passing_score', 'time_limit']
+    list_display = ['course', 'passing_score', 'time_limit', 'questions_per_attempt']
     inlines = [QuestionInline]
 
 @admin.register(Question)
@@ -31,4 +65,18 @@ class QuestionAdmin(admin.ModelAdmin):
 class UserProgressAdmin(admin.ModelAdmin):
     list_display = ['user', 'course', 'score', 'completed', 'completed_at']
     list_filter = ['completed', 'course']
-    search_fields = ['user__username', 'course__title']
\ No newline at end of file
+    search_fields = ['user__username', 'course__title']
+
+@admin.register(QuizAttempt)
+class QuizAttemptAdmin(admin.ModelAdmin):
+    list_display = ['user', 'course', 'score', 'passed', 'submitted_at']
+    list_select_related = ['user', 'course']
+    raw_id_fields = ['user', 'course']
+    search_fields = ['user__username']
+
+@admin.register(QuizAttemptRollup)
+class QuizAttemptRollupAdmin(admin.ModelAdmin):
+    list_display = ['user', 'course', 'attempts', 'passes', 'best_score', 'first_attempt_at', 'last_attempt_at']
+    list_select_related = ['user', 'course']
+    raw_id_fields = ['user', 'course']
+    search_fields = ['user__username']
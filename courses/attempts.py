@@ -0,0 +1,100 @@
+# courses/attempts.py
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import QuizAttempt, QuizAttemptRollup
+
+ATTEMPT_FIELDS = ('id', 'user_id', 'course_id', 'score', 'passed', 'submitted_at')
+
+
+class RollupDelta:
+    """Attempts for one (user, course) pair folded together before writing"""
+    __slots__ = ('attempts', 'passes', 'score_total', 'best_score', 'first_attempt_at', 'last_attempt_at')
+
+    def __init__(self, row):
+        self.attempts = 1
+        self.passes = int(row['passed'])
+        self.score_total = row['score']
+        self.best_score = row['score']
+        self.first_attempt_at = self.last_attempt_at = row['submitted_at']
+
+    def add(self, row):
+        self.attempts += 1
+        self.passes += int(row['passed'])
+        self.score_total += row['score']
+        self.best_score = max(self.best_score, row['score'])
+        self.first_attempt_at = min(self.first_attempt_at, row['submitted_at'])
+        self.last_attempt_at = max(self.last_attempt_at, row['submitted_at'])
+
+    def merge_into(self, rollup):
+        rollup.attempts += self.attempts
+        rollup.passes += self.passes
+        rollup.score_total += self.score_total
+        rollup.best_score = max(rollup.best_score, self.best_score)
+        rollup.first_attempt_at = min(rollup.first_attempt_at, self.first_attempt_at)
+        rollup.last_attempt_at = max(rollup.last_attempt_at, self.last_attempt_at)
+
+
+def old_attempts(cutoff, after_pk=0, limit=1000):
+    """The next chunk of attempts submitted before ``cutoff``, oldest first"""
+    return list(
+        QuizAttempt.objects.filter(submitted_at__lt=cutoff, pk__gt=after_pk)
+        .order_by('pk').values(*ATTEMPT_FIELDS)[:limit]
+    )
+
+
+def compact(rows, archive=None):
+    """
+    Fold a chunk of attempt rows into the rollup table and delete them.
+
+    Runs in one transaction, so a chunk is either fully summarised and
+    pruned or left untouched. With ``archive`` (a text file) the raw rows
+    are appended as JSON lines first; a failed commit can therefore leave
+    a chunk in the archive twice, but never lose it.
+    """
+    deltas = {}
+    for row in rows:
+        key = (row['user_id'], row['course_id'])
+        if key in deltas:
+            deltas[key].add(row)
+        else:
+            deltas[key] = RollupDelta(row)
+
+    if archive is not None:
+        archive.writelines(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+        archive.flush()
+
+    with transaction.atomic():
+        user_ids = {user_id for user_id, _ in deltas}
+        course_ids = {course_id for _, course_id in deltas}
+        existing = {
+            (r.user_id, r.course_id): r
+            for r in QuizAttemptRollup.objects.select_for_update().filter(
+                user_id__in=user_ids, course_id__in=course_ids,
+            )
+            if (r.user_id, r.course_id) in deltas
+        }
+
+        to_create, to_update = [], []
+        for (user_id, course_id), delta in deltas.items():
+            rollup = existing.get((user_id, course_id))
+            if rollup is None:
+                rollup = QuizAttemptRollup(
+                    user_id=user_id, course_id=course_id,
+                    first_attempt_at=delta.first_attempt_at, last_attempt_at=delta.last_attempt_at,
+                )
+                to_create.append(rollup)
+            else:
+                to_update.append(rollup)
+            delta.merge_into(rollup)
+
+        QuizAttemptRollup.objects.bulk_create(to_create)
+        QuizAttemptRollup.objects.bulk_update(to_update, [
+            'attempts', 'passes', 'score_total', 'best_score', 'first_attempt_at', 'last_attempt_at',
+        ])
+        QuizAttempt.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+
+    return len(deltas)
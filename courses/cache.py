@@ -0,0 +1,111 @@
+# courses/cache.py
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+from backend.routers import cache_timeout
+
+CATALOGUE_VERSION_KEY = 'courses:catalogue:version'
+
+
+def _timeout():
+    return cache_timeout(getattr(settings, 'COURSE_CACHE_TIMEOUT', 60 * 60 * 24))
+
+
+def get_catalogue_version():
+    """
+    Current catalogue version, in milliseconds since the epoch.
+
+    If the cache was flushed we start a fresh version, which simply orphans
+    old payloads. It is not sent as Last-Modified: HTTP dates only have
+    whole seconds, so two changes within one second would look the same to
+    a client revalidating with If-Modified-Since. The ETag carries the full
+    version instead.
+    """
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(CATALOGUE_VERSION_KEY, version, None):
+            version = cache.get(CATALOGUE_VERSION_KEY, version)
+    return version
+
+
+def bump_catalogue_version():
+    """Invalidate every cached catalogue payload"""
+    version = max(int(time.time() * 1000), get_catalogue_version() + 1)
+    cache.set(CATALOGUE_VERSION_KEY, version, None)
+    return version
+
+
+def catalogue_changed_recently(request, *args, **kwargs):
+    """
+    True for REPLICA_MAX_LAG seconds after a catalogue change.
+
+    Catalogue ETags follow the version on the primary at once; a body read
+    from a replica that has not caught up would be stored by clients under
+    the new ETag and revalidated with 304s until the next change, so these
+    reads stay on the primary until the replicas are known to be fresh.
+    """
+    lag = getattr(settings, 'REPLICA_MAX_LAG', 30)
+    return time.time() * 1000 - get_catalogue_version() < lag * 1000
+
+
+def catalogue_etag(request, *args, **kwargs):
+    """ETag for catalogue responses; varies with the version and the URL"""
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()[:12]
+    return f'{get_catalogue_version()}-{digest}'
+
+
+def payload_key(name, parts):
+    """Cache key for a catalogue payload under the current version"""
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'courses:{name}:{get_catalogue_version()}:{digest}'
+
+
+def cache_stream(key, chunks):
+    """Pass a streamed payload through, storing the full body once it completes"""
+    if hasattr(chunks, '__aiter__'):
+        return _acache_stream(key, chunks)
+    return _cache_stream(key, chunks)
+
+
+def _cache_stream(key, chunks):
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(body), _timeout())
+
+
+async def _acache_stream(key, chunks):
+    body = []
+    async for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(body), _timeout())
+
+
+async def cached_json_response(name, parts, build):
+    """
+    Serve a JSON payload from the catalogue cache.
+
+    ``build`` is a coroutine function returning ``(data, status)``; only 200
+    payloads are stored, keyed by the catalogue version so a bump makes
+    every old entry unreachable. The cache itself is read synchronously:
+    a hit must not cost a trip through a thread pool.
+    """
+    key = payload_key(name, parts)
+    content = cache.get(key)
+    if content is None:
+        data, status = await build()
+        content = json.dumps(data, cls=DjangoJSONEncoder).encode()
+        if status != 200:
+            return HttpResponse(content, content_type='application/json', status=status)
+        cache.set(key, content, _timeout())
+    return HttpResponse(content, content_type='application/json')
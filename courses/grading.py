@@ -0,0 +1,154 @@
+# courses/grading.py
+
+import random
+from array import array
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from .models import Question
+
+QUESTION_FIELDS = ('id', 'question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'points')
+ATTEMPT_SALT = 'courses.grading.attempt'
+
+
+class InvalidAttempt(ValueError):
+    """Raised for a missing, tampered, expired or foreign attempt token"""
+
+
+def _cache_key(quiz_id):
+    return f'courses:quiz:{quiz_id}:compiled'
+
+
+def question_payload(q):
+    return {field: q[field] for field in QUESTION_FIELDS}
+
+
+async def aload_questions(question_ids):
+    """Answer-free payloads for the given questions, in the given order"""
+    rows = {q['id']: q async for q in Question.objects.filter(id__in=question_ids).values(*QUESTION_FIELDS)}
+    return [question_payload(rows[qid]) for qid in question_ids if qid in rows]
+
+
+class CompiledQuiz:
+    """
+    Answer key for one quiz, flattened into parallel arrays.
+
+    ``question_keys`` holds the question ids as the strings clients use in
+    their answer maps, ``correct_answers`` is one letter per question and
+    ``points`` the matching weights. ``payload`` is the answer-free quiz
+    body returned by quiz_view; for a question bank it carries no
+    questions, since each attempt is served its own sample.
+    """
+    __slots__ = (
+        'quiz_id', 'passing_score', 'questions_per_attempt', 'question_ids', 'question_keys',
+        'positions', 'correct_answers', 'points', 'total_points', 'payload',
+    )
+
+    def __init__(self, quiz, questions):
+        self.quiz_id = quiz.id
+        self.passing_score = quiz.passing_score
+        self.question_ids = array('q', (q['id'] for q in questions))
+        self.question_keys = tuple(str(q['id']) for q in questions)
+        self.positions = {qid: i for i, qid in enumerate(self.question_ids)}
+        self.correct_answers = ''.join(q['correct_answer'] for q in questions)
+        self.points = array('q', (q['points'] for q in questions))
+        self.total_points = sum(self.points)
+        per_attempt = quiz.questions_per_attempt
+        self.questions_per_attempt = per_attempt if per_attempt and per_attempt < len(questions) else None
+        self.payload = {
+            'passing_score': quiz.passing_score,
+            'time_limit': quiz.time_limit,
+        }
+        if self.is_bank:
+            self.payload.update(bank_size=len(questions), questions_per_attempt=self.questions_per_attempt)
+
+    @property
+    def is_bank(self):
+        """True when each attempt is served a random subset of the questions"""
+        return self.questions_per_attempt is not None
+
+    def sample(self, rng=random):
+        """Draw questions_per_attempt distinct question ids without touching the database"""
+        picks = rng.sample(range(len(self.question_ids)), self.questions_per_attempt)
+        return [self.question_ids[i] for i in picks]
+
+    def grade(self, answers, question_ids=None):
+        """
+        Return the percentage score for an answers map {question_id: letter}.
+
+        With ``question_ids`` only those questions count, out of their own
+        points total; ids no longer in the quiz are ignored.
+        """
+        if question_ids is None:
+            graded = range(len(self.question_keys))
+        else:
+            graded = [self.positions[qid] for qid in dict.fromkeys(question_ids) if qid in self.positions]
+        earned = total = 0
+        for i in graded:
+            points = self.points[i]
+            total += points
+            if answers.get(self.question_keys[i]) == self.correct_answers[i]:
+                earned += points
+        return int((earned / total) * 100) if total > 0 else 0
+
+    def passed(self, score):
+        return score >= self.passing_score
+
+
+def sign_attempt(compiled, user_id, question_ids):
+    """Token recording which questions a learner was served"""
+    return signing.dumps(
+        {'q': compiled.quiz_id, 'u': user_id, 'ids': question_ids},
+        salt=ATTEMPT_SALT, compress=True,
+    )
+
+
+def load_attempt(token, compiled, user_id, max_age):
+    """Return the question ids served with ``token``, checking it belongs to this quiz and learner"""
+    if not token:
+        raise InvalidAttempt('attempt_token is required for this quiz')
+    try:
+        attempt = signing.loads(token, salt=ATTEMPT_SALT, max_age=max_age)
+    except signing.SignatureExpired:
+        raise InvalidAttempt('This attempt has expired, please start the quiz again')
+    except signing.BadSignature:
+        raise InvalidAttempt('Invalid attempt token')
+    if attempt.get('q') != compiled.quiz_id or attempt.get('u') != user_id:
+        raise InvalidAttempt('Invalid attempt token')
+    return attempt['ids']
+
+
+def compile_quiz(quiz):
+    """Build a CompiledQuiz straight from the database"""
+    questions = Question.objects.filter(quiz_id=quiz.id).order_by('id')
+    compiled = CompiledQuiz(quiz, list(questions.values('id', 'correct_answer', 'points')))
+    if not compiled.is_bank:
+        # A bank never caches question text: each attempt loads its own
+        # sample by primary key
+        compiled.payload['questions'] = [question_payload(q) for q in questions.values(*QUESTION_FIELDS)]
+    return compiled
+
+
+def get_compiled_quiz(quiz):
+    """Return the cached CompiledQuiz for a quiz, compiling it on a miss"""
+    key = _cache_key(quiz.id)
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = compile_quiz(quiz)
+        cache.set(key, compiled, getattr(settings, 'QUIZ_CACHE_TIMEOUT', 60 * 60 * 24))
+    return compiled
+
+
+async def aget_compiled_quiz(quiz):
+    """get_compiled_quiz for async views; only a cache miss leaves the event loop"""
+    compiled = cache.get(_cache_key(quiz.id))
+    if compiled is None:
+        compiled = await sync_to_async(get_compiled_quiz)(quiz)
+    return compiled
+
+
+def invalidate_compiled_quiz(quiz_id):
+    cache.delete(_cache_key(quiz_id))
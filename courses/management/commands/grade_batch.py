@@ -0,0 +1,283 @@
+# courses/management/commands/grade_batch.py
+
+import csv
+import json
+import time
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from django.db.models import Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from certificates.cache import invalidate_verification
+from certificates.identifiers import assign_certificate_ids
+from certificates.models import Certificate
+from courses.grading import get_compiled_quiz
+from courses.models import Course, QuizAttempt, UserProgress
+from courses.stats import StatsDelta
+
+
+def read_sheets(fh, fmt):
+    """Yield (line number, record) pairs from a JSONL or CSV answer file"""
+    if fmt == 'csv':
+        for lineno, row in enumerate(csv.DictReader(fh), start=2):
+            yield lineno, row
+        return
+    for lineno, line in enumerate(fh, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield lineno, json.loads(line)
+        except ValueError:
+            yield lineno, None
+
+
+def parse_question_ids(value):
+    """
+    The questions a sheet was served, as a list of ints, None when absent
+    or False when malformed. CSV cells may hold a JSON list or "1,2,3".
+    """
+    if value in (None, ''):
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value) if value.lstrip().startswith('[') else value.split(',')
+        except ValueError:
+            return False
+    if not isinstance(value, list):
+        return False
+    try:
+        return [int(qid) for qid in value]
+    except (TypeError, ValueError):
+        return False
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class SheetResult:
+    """Best outcome for one (user, course) pair within a chunk"""
+    __slots__ = ('score', 'pass_score')
+
+    def __init__(self):
+        self.score = 0
+        self.pass_score = None
+
+
+class Command(BaseCommand):
+    help = 'Grade a file of offline answer sheets (JSONL or CSV) in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File of {"user", "course", "answers"[, "question_ids"]} records')
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help='Input format (default: guessed from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Answer sheets graded and written per transaction')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        self.verbosity = options['verbosity']
+        self.users = {}
+        self.courses = {}
+        self.stats = Counter()
+
+        started = time.perf_counter()
+        try:
+            with open(path, newline='', encoding='utf-8') as fh:
+                for chunk in chunked(read_sheets(fh, fmt), chunk_size):
+                    committed = self.stats['graded']
+                    try:
+                        self.grade_chunk(chunk)
+                    except DatabaseError as e:
+                        # Earlier chunks are committed; say where to resume
+                        raise CommandError(
+                            f'Chunk starting at line {chunk[0][0]} was rolled back ({e}); '
+                            f'the {committed} sheets graded before it are committed'
+                        )
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+        elapsed = time.perf_counter() - started
+
+        stats = self.stats
+        rate = stats['graded'] / elapsed if elapsed > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Graded {stats['graded']} sheets ({stats['passed']} passed, "
+            f"{stats['skipped']} skipped) in {elapsed:.2f}s - {rate:.0f} sheets/s"
+        ))
+        self.stdout.write(
+            f"Progress: {stats['progress_created']} created, {stats['progress_updated']} updated; "
+            f"certificates issued: {stats['certificates']}"
+        )
+
+    def skip(self, lineno, reason):
+        self.stats['skipped'] += 1
+        if self.verbosity > 1:
+            self.stderr.write(f'line {lineno}: {reason}')
+
+    def resolve_users(self, chunk):
+        usernames = {
+            str(record['user']) for _, record in chunk
+            if isinstance(record, dict) and record.get('user') and str(record['user']) not in self.users
+        }
+        if usernames:
+            found = dict(get_user_model().objects.filter(username__in=usernames).values_list('username', 'id'))
+            for username in usernames:
+                self.users[username] = found.get(username)
+
+    def get_course(self, slug):
+        """Return (course_id, CompiledQuiz) for a slug, or None when it has no quiz"""
+        if slug not in self.courses:
+            course = Course.objects.select_related('quiz').filter(slug=slug).first()
+            if course is None or not hasattr(course, 'quiz'):
+                self.courses[slug] = None
+            else:
+                self.courses[slug] = (course.id, get_compiled_quiz(course.quiz))
+        return self.courses[slug]
+
+    def grade_chunk(self, chunk):
+        self.resolve_users(chunk)
+
+        results = {}
+        course_stats = {}
+        attempts = []
+        now = timezone.now()
+        for lineno, record in chunk:
+            if not isinstance(record, dict):
+                self.skip(lineno, 'malformed record')
+                continue
+            answers = record.get('answers') or {}
+            if isinstance(answers, str):
+                try:
+                    answers = json.loads(answers)
+                except ValueError:
+                    self.skip(lineno, 'answers are not valid JSON')
+                    continue
+            if not isinstance(answers, dict):
+                self.skip(lineno, 'answers must map question ids to letters')
+                continue
+
+            user_id = self.users.get(str(record.get('user')))
+            if user_id is None:
+                self.skip(lineno, f"unknown user {record.get('user')!r}")
+                continue
+            course = self.get_course(record.get('course'))
+            if course is None:
+                self.skip(lineno, f"unknown course or no quiz {record.get('course')!r}")
+                continue
+            course_id, compiled = course
+
+            question_ids = parse_question_ids(record.get('question_ids'))
+            if question_ids is False:
+                self.skip(lineno, 'question_ids must be a list of question ids')
+                continue
+            if question_ids is None and compiled.is_bank:
+                self.skip(lineno, 'question_ids are required for question-bank quizzes')
+                continue
+
+            # Same rules as submit_quiz
+            score = compiled.grade(answers, question_ids)
+            passed = compiled.passed(score)
+            course_stats.setdefault(course_id, StatsDelta()).add_attempt(score, passed)
+            attempts.append(QuizAttempt(
+                user_id=user_id, course_id=course_id, score=score, passed=passed, submitted_at=now,
+            ))
+            result = results.setdefault((user_id, course_id), SheetResult())
+            result.score = max(result.score, score)
+            if passed:
+                self.stats['passed'] += 1
+                if result.pass_score is None:
+                    result.pass_score = score
+            self.stats['graded'] += 1
+
+        if results:
+            self.write_results(results, course_stats, attempts, now)
+
+    def write_results(self, results, course_stats, attempts, now):
+        user_ids = {user_id for user_id, _ in results}
+        course_ids = {course_id for _, course_id in results}
+
+        with transaction.atomic():
+            QuizAttempt.objects.bulk_create(attempts)
+
+            existing = set(
+                UserProgress.objects.filter(user_id__in=user_ids, course_id__in=course_ids)
+                .values_list('user_id', 'course_id')
+            ) & results.keys()
+
+            # Rows a concurrent submission inserts after that read are
+            # skipped here and merged by the updates below
+            to_create = [
+                UserProgress(
+                    user_id=user_id,
+                    course_id=course_id,
+                    score=result.score,
+                    completed=result.pass_score is not None,
+                    completed_at=now if result.pass_score is not None else None,
+                )
+                for (user_id, course_id), result in results.items()
+                if (user_id, course_id) not in existing
+            ]
+            UserProgress.objects.bulk_create(to_create, ignore_conflicts=True)
+
+            # Same upsert as _save_progress, one UPDATE per (course, score,
+            # passed); a no-op on the rows just inserted
+            groups = defaultdict(list)
+            for (user_id, course_id), result in results.items():
+                groups[(course_id, result.score, result.pass_score is not None)].append(user_id)
+            for (course_id, score, passed), group in groups.items():
+                values = {'score': Greatest('score', Value(score))}
+                if passed:
+                    values.update(completed=True, completed_at=now)
+                UserProgress.objects.filter(course_id=course_id, user_id__in=group).update(**values)
+
+            passed_keys = {key for key, result in results.items() if result.pass_score is not None}
+            if passed_keys:
+                have = set(
+                    Certificate.objects.filter(user_id__in=user_ids, course_id__in=course_ids)
+                    .values_list('user_id', 'course_id')
+                )
+                certificates = assign_certificate_ids([
+                    Certificate(
+                        user_id=user_id,
+                        course_id=course_id,
+                        score=results[(user_id, course_id)].pass_score,
+                    )
+                    for user_id, course_id in passed_keys - have
+                ])
+                Certificate.objects.bulk_create(certificates, ignore_conflicts=True)
+                # Where a concurrent submission issued the certificate first,
+                # ours was skipped; the ids are new, so a match is our row
+                inserted = set(
+                    Certificate.objects.filter(certificate_id__in=[c.certificate_id for c in certificates])
+                    .values_list('certificate_id', flat=True)
+                )
+                certificates = [c for c in certificates if c.certificate_id in inserted]
+                for certificate in certificates:
+                    course_stats[certificate.course_id].certificates_issued += 1
+                # bulk_create skips post_save, so clear any cached "not found"
+                transaction.on_commit(
+                    lambda ids=[c.certificate_id for c in certificates]: invalidate_verification(*ids)
+                )
+                self.stats['certificates'] += len(certificates)
+
+            for course_id, delta in course_stats.items():
+                delta.apply(course_id)
+
+        self.stats['progress_created'] += len(to_create)
+        self.stats['progress_updated'] += len(existing)
@@ -0,0 +1,34 @@
+# courses/management/commands/rebuild_course_stats.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from courses.models import Course, CourseStats
+from courses.stats import compute_course_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount the CourseStats rollup from the attempt log, rollups, progress and certificates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('courses', nargs='*', metavar='slug',
+                            help='Only rebuild these courses (default: all)')
+
+    def handle(self, *args, **options):
+        course_ids = None
+        if options['courses']:
+            found = dict(Course.objects.filter(slug__in=options['courses']).values_list('slug', 'id'))
+            missing = set(options['courses']) - set(found)
+            if missing:
+                raise CommandError(f'Unknown course(s): {", ".join(sorted(missing))}')
+            course_ids = list(found.values())
+
+        with transaction.atomic():
+            stats = compute_course_stats(course_ids)
+            existing = CourseStats.objects.all()
+            if course_ids is not None:
+                existing = existing.filter(course_id__in=course_ids)
+            existing.delete()
+            CourseStats.objects.bulk_create(stats.values())
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {len(stats)} courses'))
@@ -0,0 +1,63 @@
+# courses/management/commands/rollup_quiz_attempts.py
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from courses.attempts import compact, old_attempts
+
+
+class Command(BaseCommand):
+    help = 'Summarise quiz attempts older than the retention window per learner and course, then prune them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int,
+                            default=getattr(settings, 'QUIZ_ATTEMPT_RETENTION_DAYS', 90),
+                            help='Keep raw attempts this many days (default: QUIZ_ATTEMPT_RETENTION_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Attempts folded and deleted per transaction')
+        parser.add_argument('--archive', help='Append pruned attempts to this JSONL file')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would be pruned')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1 or options['retention_days'] < 0:
+            raise CommandError('--chunk-size must be positive and --retention-days not negative')
+
+        cutoff = timezone.now() - timedelta(days=options['retention_days'])
+        archive = None
+        if options['archive'] and not options['dry_run']:
+            try:
+                archive = open(options['archive'], 'a', encoding='utf-8')
+            except OSError as e:
+                raise CommandError(f"Cannot open {options['archive']}: {e}")
+
+        pruned = pairs = 0
+        last_pk = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                rows = old_attempts(cutoff, last_pk, chunk_size)
+                if not rows:
+                    break
+                last_pk = rows[-1]['id']
+                if not options['dry_run']:
+                    pairs += compact(rows, archive)
+                pruned += len(rows)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'  {pruned} attempts processed (up to #{last_pk})')
+        finally:
+            if archive is not None:
+                archive.close()
+
+        elapsed = time.perf_counter() - started
+        if options['dry_run']:
+            self.stdout.write(f'Would prune {pruned} attempts older than {cutoff:%Y-%m-%d %H:%M}')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Pruned {pruned} attempts older than {cutoff:%Y-%m-%d %H:%M} '
+            f'into {pairs} learner/course rollups in {elapsed:.2f}s'
+        ))
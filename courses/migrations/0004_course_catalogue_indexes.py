@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_alter_course_category'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['is_active', '-created_at', 'id'], name='course_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['is_active', 'category', '-created_at', 'id'], name='course_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['is_active', 'difficulty', '-created_at', 'id'], name='course_difficulty_created_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_course_catalogue_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='course',
+            name='course_active_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='course',
+            name='course_category_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='course',
+            name='course_difficulty_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', 'id'], name='course_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-created_at', 'id'], name='course_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['difficulty', '-created_at', 'id'], name='course_difficulty_created_idx'),
+        ),
+    ]
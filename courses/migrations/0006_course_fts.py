@@ -0,0 +1,36 @@
+# Full-text index over courses (SQLite FTS5); kept in sync by courses.signals
+
+from django.db import migrations
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Course = apps.get_model('courses', 'Course')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS courses_course_fts "
+            "USING fts5(title, description, content, tokenize = 'porter unicode61')"
+        )
+        cursor.executemany(
+            'INSERT INTO courses_course_fts (rowid, title, description, content) VALUES (%s, %s, %s, %s)',
+            list(Course.objects.values_list('id', 'title', 'description', 'content')),
+        )
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS courses_course_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStats',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='courses.course')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('passes', models.PositiveIntegerField(default=0)),
+                ('score_total', models.PositiveBigIntegerField(default=0)),
+                ('best_score', models.IntegerField(default=0)),
+                ('certificates_issued', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Course Stats',
+                'verbose_name_plural': 'Course Stats',
+            },
+        ),
+    ]
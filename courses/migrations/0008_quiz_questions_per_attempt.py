@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_course_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='questions_per_attempt',
+            field=models.PositiveIntegerField(blank=True, help_text='Question-bank mode: serve each learner a random sample of this many questions. Leave blank to serve every question.', null=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_quiz_questions_per_attempt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField()),
+                ('passed', models.BooleanField()),
+                ('submitted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('course', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='courses.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Quiz Attempt',
+                'verbose_name_plural': 'Quiz Attempts',
+                'indexes': [models.Index(fields=['submitted_at'], name='quiz_attempt_submitted_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizAttemptRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('passes', models.PositiveIntegerField(default=0)),
+                ('score_total', models.PositiveBigIntegerField(default=0)),
+                ('best_score', models.IntegerField(default=0)),
+                ('first_attempt_at', models.DateTimeField()),
+                ('last_attempt_at', models.DateTimeField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='courses.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Quiz Attempt Rollup',
+                'verbose_name_plural': 'Quiz Attempt Rollups',
+                'unique_together': {('user', 'course')},
+            },
+        ),
+    ]
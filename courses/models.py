@@ -2,6 +2,7 @@
 
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class Course(models.Model):
     """
@@ -42,6 +43,27 @@ class Course(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Course'
         verbose_name_plural = 'Courses'
+        indexes = [
+            # Keyset pagination of the catalogue, optionally filtered. Partial
+            # on is_active: SQLite renders is_active=True as a bare
+            # WHERE "is_active", which can match an index condition but not
+            # an is_active index column.
+            models.Index(
+                fields=['-created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='course_active_created_idx',
+            ),
+            models.Index(
+                fields=['category', '-created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='course_category_created_idx',
+            ),
+            models.Index(
+                fields=['difficulty', '-created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='course_difficulty_created_idx',
+            ),
+        ]
 
 
 class Quiz(models.Model):
@@ -51,6 +73,11 @@ class Quiz(models.Model):
     course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='quiz')
     passing_score = models.IntegerField(default=70, help_text="Percentage needed to pass")
     time_limit = models.IntegerField(default=30, help_text="Time limit in minutes")
+    questions_per_attempt = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text="Question-bank mode: serve each learner a random sample of this many questions. "
+                  "Leave blank to serve every question.",
+    )
     
     def __str__(self):
         return f"Quiz for {self.course.title}"
@@ -101,4 +128,80 @@ class UserProgress(models.Model):
         verbose_name_plural = 'User Progress'
     
     def __str__(self):
-        return f"{self.user.username} - {self.course.title}"
\ No newline at end of file
+        return f"{self.user.username} - {self.course.title}"
+
+class CourseStats(models.Model):
+    """
+    Per-course counters, maintained incrementally as quizzes are graded.
+
+    Totals rather than averages are stored so every update is a plain
+    increment; run rebuild_course_stats to backfill or repair drift.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    attempts = models.PositiveIntegerField(default=0)
+    passes = models.PositiveIntegerField(default=0)
+    score_total = models.PositiveBigIntegerField(default=0)
+    best_score = models.IntegerField(default=0)
+    certificates_issued = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Course Stats'
+        verbose_name_plural = 'Course Stats'
+    
+    def __str__(self):
+        return f"Stats for {self.course_id}"
+    
+    @property
+    def pass_rate(self):
+        return round(100 * self.passes / self.attempts, 1) if self.attempts else 0
+    
+    @property
+    def average_score(self):
+        return round(self.score_total / self.attempts, 1) if self.attempts else 0
+
+
+class QuizAttempt(models.Model):
+    """
+    One graded quiz submission. Append-only: rows are only ever inserted,
+    then folded into QuizAttemptRollup and pruned by rollup_quiz_attempts.
+
+    Kept deliberately narrow, with no index on course, so the insert on
+    every submission stays cheap.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, db_index=False)
+    score = models.IntegerField()
+    passed = models.BooleanField()
+    submitted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Quiz Attempt'
+        verbose_name_plural = 'Quiz Attempts'
+        indexes = [
+            # Retention sweeps walk attempts oldest first
+            models.Index(fields=['submitted_at'], name='quiz_attempt_submitted_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.course_id}: {self.score}"
+
+
+class QuizAttemptRollup(models.Model):
+    """Summary of a learner's attempts at a course that have been pruned from QuizAttempt"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    attempts = models.PositiveIntegerField(default=0)
+    passes = models.PositiveIntegerField(default=0)
+    score_total = models.PositiveBigIntegerField(default=0)
+    best_score = models.IntegerField(default=0)
+    first_attempt_at = models.DateTimeField()
+    last_attempt_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['user', 'course']
+        verbose_name = 'Quiz Attempt Rollup'
+        verbose_name_plural = 'Quiz Attempt Rollups'
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.course_id}: {self.attempts} attempts"
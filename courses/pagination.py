@@ -0,0 +1,100 @@
+# courses/pagination.py
+
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def encode_cursor(created_at, pk):
+    """Pack the (created_at, id) keyset position into an opaque token"""
+    raw = json.dumps([created_at.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Unpack a token produced by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if created_at is None:
+        raise InvalidCursor('Invalid cursor')
+    return created_at, pk
+
+
+def get_page_size(value):
+    """Clamp the requested page size to the configured bounds"""
+    default = getattr(settings, 'COURSE_LIST_PAGE_SIZE', 20)
+    maximum = getattr(settings, 'COURSE_LIST_MAX_PAGE_SIZE', 100)
+    if not value:
+        return default
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def after_cursor(queryset, cursor):
+    """
+    Restrict a queryset to rows after the cursor position.
+
+    Written as ``created_at <= c AND (created_at < c OR id > pk)`` rather
+    than the textbook ``created_at < c OR (created_at = c AND id > pk)``:
+    the standalone range term lets SQLite seek straight to the cursor in
+    the (created_at, id) index instead of walking it from the top.
+    """
+    if not cursor:
+        return queryset
+    created_at, pk = decode_cursor(cursor)
+    return queryset.filter(
+        Q(created_at__lte=created_at),
+        Q(created_at__lt=created_at) | Q(id__gt=pk),
+    )
+
+
+class KeysetPage:
+    """
+    One page of a queryset ordered by (-created_at, id), read lazily.
+
+    Iterating streams the rows with ``iterator()`` (``aiterator()`` for
+    ``async for``); page_size + 1 rows are requested so we know whether
+    another page exists without a COUNT query. ``next_cursor`` is set once
+    iteration has finished. The queryset must yield dicts carrying
+    'created_at' and 'id' (i.e. come from .values()).
+    """
+
+    def __init__(self, queryset, cursor=None, page_size=20):
+        self.queryset = after_cursor(queryset.order_by('-created_at', 'id'), cursor)[:page_size + 1]
+        self.page_size = page_size
+        self.next_cursor = None
+
+    def __iter__(self):
+        last = None
+        for i, row in enumerate(self.queryset.iterator()):
+            if i == self.page_size:
+                self.next_cursor = encode_cursor(last['created_at'], last['id'])
+                return
+            last = row
+            yield row
+
+    async def __aiter__(self):
+        last = None
+        i = 0
+        async for row in self.queryset.aiterator():
+            if i == self.page_size:
+                self.next_cursor = encode_cursor(last['created_at'], last['id'])
+                return
+            last = row
+            i += 1
+            yield row
@@ -0,0 +1,73 @@
+# courses/rendering.py
+
+import gzip
+import re
+
+import markdown
+import nh3
+from django.conf import settings
+from django.core.cache import cache
+
+from backend.offload import offload
+
+from .cache import catalogue_etag
+
+# Bump when the pipeline changes so every course is rendered again
+RENDER_VERSION = 1
+
+ACCEPTS_GZIP_RE = re.compile(r'\bgzip\b')
+
+
+def accepts_gzip(request):
+    return bool(ACCEPTS_GZIP_RE.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+
+
+def content_etag(request, *args, **kwargs):
+    """Catalogue ETag, with a suffix for the gzip body so each encoding has its own"""
+    etag = catalogue_etag(request, *args, **kwargs)
+    return f'{etag}-gz' if accepts_gzip(request) else etag
+
+
+def looks_like_html(text):
+    return text.lstrip().startswith('<')
+
+
+def render_content(text):
+    """Course content (markdown or HTML) to sanitized HTML"""
+    if looks_like_html(text):
+        html = text
+    else:
+        html = markdown.markdown(text, extensions=['extra', 'sane_lists'])
+    return nh3.clean(html, link_rel='noopener noreferrer')
+
+
+def _cache_key(course):
+    return f'courses:content:{RENDER_VERSION}:{course.pk}:{course.updated_at.timestamp()}'
+
+
+def get_rendered_content(course):
+    """
+    Rendered content for a course, computed once per ``updated_at``.
+
+    Returns a dict with the sanitized ``html`` and a pre-compressed
+    ``gzip`` body. Saving the course moves updated_at, so the
+    next request renders under a new key and the old entry simply expires.
+    """
+    key = _cache_key(course)
+    rendered = cache.get(key)
+    if rendered is None:
+        html = render_content(course.content)
+        rendered = {
+            'html': html,
+            'gzip': gzip.compress(html.encode(), compresslevel=9, mtime=0),
+        }
+        cache.set(key, rendered, getattr(settings, 'COURSE_CACHE_TIMEOUT', 60 * 60 * 24))
+    return rendered
+
+
+async def aget_rendered_content(course):
+    """get_rendered_content for async views, rendering on the CPU pool on a miss"""
+    rendered = cache.get(_cache_key(course))
+    if rendered is None:
+        rendered = await offload(get_rendered_content)(course)
+    return rendered
@@ -0,0 +1,112 @@
+# courses/search.py
+
+import html
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Course
+
+FTS_TABLE = 'courses_course_fts'
+
+# Highlight markers that cannot appear in course text; swapped for <mark>
+# after the snippet has been HTML-escaped.
+_OPEN, _CLOSE = '\x02', '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(text):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word is quoted, so FTS5 operators typed by users are treated as
+    plain words; the last word is a prefix match for search-as-you-type.
+    """
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def index_course(course):
+    """Insert or replace a course's row in the FTS index"""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [course.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, content) VALUES (%s, %s, %s, %s)',
+            [course.pk, course.title, course.description, course.content],
+        )
+
+
+def unindex_course(course_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [course_id])
+
+
+def _render_snippet(snippet):
+    return html.escape(snippet).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+def search_courses(text, limit=20):
+    """
+    Ranked search over active courses.
+
+    Returns dicts with the catalogue fields plus an HTML-safe ``snippet``
+    highlighting the matched words. Titles weigh more than descriptions,
+    which weigh more than the course body.
+    """
+    match = build_match_query(text)
+    if match is None:
+        return []
+
+    if not fts_available():
+        # Portable fallback for non-SQLite databases
+        courses = Course.objects.filter(
+            Q(title__icontains=text) | Q(description__icontains=text), is_active=True,
+        ).values(
+            'id', 'title', 'slug', 'description', 'category', 'difficulty', 'duration',
+        )[:limit]
+        return [{**course, 'snippet': html.escape(course['description'][:160])} for course in courses]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            SELECT c.id, c.title, c.slug, c.description, c.category, c.difficulty, c.duration,
+                   snippet({FTS_TABLE}, -1, %s, %s, '…', 16)
+            FROM {FTS_TABLE}
+            JOIN courses_course c ON c.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s AND c.is_active
+            ORDER BY bm25({FTS_TABLE}, 10.0, 4.0, 1.0)
+            LIMIT %s
+            ''',
+            [_OPEN, _CLOSE, match, limit],
+        )
+        columns = ['id', 'title', 'slug', 'description', 'category', 'difficulty', 'duration']
+        return [
+            {**dict(zip(columns, row[:-1])), 'snippet': _render_snippet(row[-1])}
+            for row in cursor.fetchall()
+        ]
+
+
+def search_course_ids(text, limit=1000):
+    """Ids of courses matching ``text``, best first, active or not (for the admin)"""
+    match = build_match_query(text)
+    if match is None or not fts_available():
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s',
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
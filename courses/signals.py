@@ -0,0 +1,49 @@
+# courses/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalogue_version
+from .grading import invalidate_compiled_quiz
+from .models import Course, Question, Quiz
+from .search import index_course, unindex_course
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_catalogue(sender, **kwargs):
+    """
+    Any course change makes every cached catalogue payload stale. Bumped
+    on commit: any earlier, a concurrent reader could cache the old row
+    under the new version (and ETag) until the next change.
+    """
+    transaction.on_commit(bump_catalogue_version, using=kwargs.get('using'))
+
+
+@receiver(post_save, sender=Course)
+def update_search_index(sender, instance, **kwargs):
+    index_course(instance)
+
+
+@receiver(post_delete, sender=Course)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_course(instance.pk)
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def invalidate_quiz(sender, instance, **kwargs):
+    """
+    Dropped on commit: an admin saves a quiz and its question inline in one
+    transaction, and a recompile inside it would cache the old answer key.
+    """
+    quiz_id = instance.pk
+    transaction.on_commit(lambda: invalidate_compiled_quiz(quiz_id), using=kwargs.get('using'))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_quiz(sender, instance, **kwargs):
+    quiz_id = instance.quiz_id
+    transaction.on_commit(lambda: invalidate_compiled_quiz(quiz_id), using=kwargs.get('using'))
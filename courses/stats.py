@@ -0,0 +1,147 @@
+# courses/stats.py
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import CourseStats, QuizAttempt, QuizAttemptRollup, UserProgress
+
+# Counter columns read when serializing stats
+STATS_FIELDS = ('attempts', 'passes', 'score_total', 'best_score', 'certificates_issued')
+
+
+def _increment(course_id, attempts=0, passes=0, score_total=0, best_score=None, certificates_issued=0):
+    """
+    Add to a course's counters with a single UPDATE ... SET x = x + n.
+
+    Concurrent updates never lose increments. The first update for a course
+    creates the row; losing that INSERT race falls back to the UPDATE.
+    """
+    deltas = {
+        'attempts': attempts,
+        'passes': passes,
+        'score_total': score_total,
+        'certificates_issued': certificates_issued,
+    }
+    values = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if best_score is not None:
+        values['best_score'] = Greatest('best_score', Value(best_score))
+    if not values:
+        return
+    values['updated_at'] = timezone.now()
+    
+    rows = CourseStats.objects.filter(course_id=course_id)
+    if rows.update(**values):
+        return
+    try:
+        with transaction.atomic():
+            CourseStats.objects.create(course_id=course_id, best_score=best_score or 0, **deltas)
+    except IntegrityError:
+        rows.update(**values)
+
+
+def record_attempt(course_id, score, passed, certificate_issued=False):
+    """Count one graded submission, and the certificate it issued if any"""
+    _increment(
+        course_id,
+        attempts=1,
+        passes=int(passed),
+        score_total=score,
+        best_score=score,
+        certificates_issued=int(certificate_issued),
+    )
+
+
+class StatsDelta:
+    """Counters accumulated for one course over a batch, applied in one UPDATE"""
+    __slots__ = ('attempts', 'passes', 'score_total', 'best_score', 'certificates_issued')
+
+    def __init__(self):
+        self.attempts = self.passes = self.score_total = self.certificates_issued = 0
+        self.best_score = None
+
+    def add_attempt(self, score, passed):
+        self.attempts += 1
+        self.passes += int(passed)
+        self.score_total += score
+        self.best_score = score if self.best_score is None else max(self.best_score, score)
+
+    def apply(self, course_id):
+        _increment(
+            course_id,
+            attempts=self.attempts,
+            passes=self.passes,
+            score_total=self.score_total,
+            best_score=self.best_score,
+            certificates_issued=self.certificates_issued,
+        )
+
+
+def stats_payload(stats):
+    """API representation of a CourseStats row (or None for a course with no attempts yet)"""
+    if stats is None:
+        stats = CourseStats()
+    return {
+        'attempts': stats.attempts,
+        'pass_rate': stats.pass_rate,
+        'average_score': stats.average_score,
+        'best_score': stats.best_score,
+        'certificates_issued': stats.certificates_issued,
+    }
+
+
+def _add_counts(stats, rows):
+    for row in rows:
+        course_id = row['course_id']
+        course_stats = stats.get(course_id)
+        if course_stats is None:
+            course_stats = stats[course_id] = CourseStats(course_id=course_id)
+        course_stats.attempts += row['attempts']
+        course_stats.passes += row['passes']
+        course_stats.score_total += row['score_total'] or 0
+        course_stats.best_score = max(course_stats.best_score, row['best_score'] or 0)
+
+
+def compute_course_stats(course_ids=None):
+    """
+    Recount stats from the source tables, as {course_id: CourseStats}.
+
+    Attempts come from the QuizAttempt log plus the rollups of pruned
+    attempts. Learners whose attempts predate the log have only their
+    UserProgress row, which counts as one attempt at their best score.
+    """
+    from certificates.models import Certificate
+
+    def scoped(queryset):
+        if course_ids is not None:
+            queryset = queryset.filter(course_id__in=course_ids)
+        return queryset.values('course_id').order_by()
+
+    logged = QuizAttempt.objects.filter(user_id=OuterRef('user_id'), course_id=OuterRef('course_id'))
+    rolled_up = QuizAttemptRollup.objects.filter(user_id=OuterRef('user_id'), course_id=OuterRef('course_id'))
+    unlogged = UserProgress.objects.filter(~Exists(logged), ~Exists(rolled_up))
+    
+    stats = {}
+    _add_counts(stats, scoped(QuizAttempt.objects.all()).annotate(
+        attempts=Count('id'),
+        passes=Count('id', filter=Q(passed=True)),
+        score_total=Sum('score'),
+        best_score=Max('score'),
+    ))
+    _add_counts(stats, scoped(QuizAttemptRollup.objects.all()).annotate(
+        attempts=Sum('attempts'),
+        passes=Sum('passes'),
+        score_total=Sum('score_total'),
+        best_score=Max('best_score'),
+    ))
+    _add_counts(stats, scoped(unlogged).annotate(
+        attempts=Count('id'),
+        passes=Count('id', filter=Q(completed=True)),
+        score_total=Sum('score'),
+        best_score=Max('score'),
+    ))
+    
+    for row in scoped(Certificate.objects.all()).annotate(n=Count('id')):
+        stats.setdefault(row['course_id'], CourseStats(course_id=row['course_id'])).certificates_issued = row['n']
+    return stats
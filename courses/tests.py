@@ -1,3 +1,482 @@
-from django.test import TestCase
+# courses/tests.py
 
-# Create your tests here.
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from certificates.models import Certificate
+from users.models import CustomUser
+from .cache import bump_catalogue_version, catalogue_changed_recently, get_catalogue_version
+from .grading import (
+    InvalidAttempt, _cache_key, compile_quiz, get_compiled_quiz, load_attempt, sign_attempt,
+)
+from .models import Course, CourseStats, Question, Quiz, QuizAttempt, UserProgress
+from .rendering import get_rendered_content, render_content
+from .views import _save_progress
+
+
+def content(response):
+    """The full body of a plain or streamed response"""
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def make_course(slug='python-basics', questions=4, passing_score=50):
+    course = Course.objects.create(
+        title=slug, slug=slug, description='Test course', category='programming',
+        difficulty='beginner', duration=10, content='# Test',
+    )
+    quiz = Quiz.objects.create(course=course, passing_score=passing_score)
+    Question.objects.bulk_create([
+        Question(quiz=quiz, question_text=f'Question {i}', option_a='a', option_b='b',
+                 option_c='c', option_d='d', correct_answer='A', points=1)
+        for i in range(questions)
+    ])
+    return course
+
+
+class SaveProgressTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('learner', 'learner@example.com', 'password-1')
+        self.course = make_course()
+        self.now = timezone.now()
+
+    def progress(self):
+        return UserProgress.objects.get(user=self.user, course=self.course)
+
+    def test_first_attempt_inserts_the_row(self):
+        _save_progress(self.user, self.course, 40, False, self.now)
+        progress = self.progress()
+        self.assertEqual(progress.score, 40)
+        self.assertFalse(progress.completed)
+        self.assertIsNone(progress.completed_at)
+
+    def test_keeps_the_best_score(self):
+        _save_progress(self.user, self.course, 80, False, self.now)
+        _save_progress(self.user, self.course, 30, False, self.now)
+        self.assertEqual(self.progress().score, 80)
+        _save_progress(self.user, self.course, 90, False, self.now)
+        self.assertEqual(self.progress().score, 90)
+
+    def test_pass_completes_and_a_later_fail_does_not_undo_it(self):
+        _save_progress(self.user, self.course, 40, False, self.now)
+        _save_progress(self.user, self.course, 75, True, self.now)
+        _save_progress(self.user, self.course, 10, False, self.now + timedelta(minutes=1))
+        progress = self.progress()
+        self.assertEqual(progress.score, 75)
+        self.assertTrue(progress.completed)
+        self.assertEqual(progress.completed_at, self.now)
+
+    def test_existing_row_costs_a_single_update(self):
+        _save_progress(self.user, self.course, 40, False, self.now)
+        with self.assertNumQueries(1):
+            _save_progress(self.user, self.course, 60, False, self.now)
+
+    def test_losing_the_insert_race_falls_back_to_the_update(self):
+        # Another request inserts the row after our UPDATE found nothing, so
+        # our INSERT hits the unique constraint
+        UserProgress.objects.create(user=self.user, course=self.course, score=70)
+        update = QuerySet.update
+        calls = []
+
+        def update_missing_row_once(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update_missing_row_once):
+            _save_progress(self.user, self.course, 55, True, self.now)
+        self.assertEqual(len(calls), 2)
+        progress = self.progress()
+        self.assertEqual(progress.score, 70)
+        self.assertTrue(progress.completed)
+        self.assertEqual(UserProgress.objects.count(), 1)
+
+
+class SubmitQuizTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('learner', 'learner@example.com', 'password-1')
+        self.course = make_course()
+        self.client.force_login(self.user)
+        self.question_ids = list(self.course.quiz.questions.order_by('id').values_list('id', flat=True))
+
+    def submit(self, correct):
+        answers = {str(qid): 'A' if i < correct else 'B' for i, qid in enumerate(self.question_ids)}
+        response = self.client.post(
+            f'/api/courses/{self.course.slug}/submit/',
+            json.dumps({'answers': answers}), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_submissions_record_attempts_best_score_and_one_certificate(self):
+        self.assertFalse(self.submit(1)['passed'])
+        first = self.submit(4)
+        self.assertTrue(first['passed'])
+        second = self.submit(3)
+        self.assertEqual(second['certificate_id'], first['certificate_id'])
+        self.submit(0)
+
+        progress = UserProgress.objects.get(user=self.user, course=self.course)
+        self.assertEqual(progress.score, 100)
+        self.assertTrue(progress.completed)
+        self.assertEqual(QuizAttempt.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(self.user.certificate_set.count(), 1)
+
+    def test_get_is_rejected(self):
+        response = self.client.get(f'/api/courses/{self.course.slug}/submit/')
+        self.assertEqual(response.status_code, 405)
+
+
+class CatalogueCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+
+    def test_list_and_detail_are_served_from_the_cache(self):
+        body = content(self.client.get('/api/courses/'))
+        content(self.client.get(f'/api/courses/{self.course.slug}/'))
+        with self.assertNumQueries(0):
+            self.assertEqual(content(self.client.get('/api/courses/')), body)
+            detail = json.loads(content(self.client.get(f'/api/courses/{self.course.slug}/')))
+        self.assertEqual(detail['course']['slug'], self.course.slug)
+
+    def test_revalidation_by_etag(self):
+        response = self.client.get('/api/courses/')
+        content(response)
+        self.assertFalse(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            revalidated = self.client.get('/api/courses/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        other = self.client.get('/api/courses/?category=ai')
+        self.assertNotEqual(other['ETag'], response['ETag'])
+
+    def test_course_change_invalidates_after_commit(self):
+        response = self.client.get('/api/courses/')
+        content(response)
+        version = get_catalogue_version()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.course.title = 'Renamed course'
+            self.course.save()
+            # Until the change commits, readers keep the old version
+            self.assertEqual(get_catalogue_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(get_catalogue_version(), version)
+
+        fresh = self.client.get('/api/courses/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertIn(b'Renamed course', content(fresh))
+
+    def test_deleting_a_course_invalidates(self):
+        content(self.client.get(f'/api/courses/{self.course.slug}/'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.delete()
+        self.assertEqual(self.client.get(f'/api/courses/{self.course.slug}/').status_code, 404)
+
+
+class CompiledQuizTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.quiz = make_course().quiz
+        self.questions = list(self.quiz.questions.order_by('id'))
+
+    def test_compiled_quiz_is_cached(self):
+        get_compiled_quiz(self.quiz)
+        with self.assertNumQueries(0):
+            compiled = get_compiled_quiz(self.quiz)
+        self.assertEqual(len(compiled.payload['questions']), 4)
+        self.assertNotIn('correct_answer', compiled.payload['questions'][0])
+
+    def test_grading_weighs_points_and_counts_only_served_questions(self):
+        self.questions[0].points = 3
+        self.questions[0].save()
+        compiled = compile_quiz(self.quiz)
+        first, second = (str(q.id) for q in self.questions[:2])
+        self.assertEqual(compiled.grade({first: 'A'}), 50)
+        self.assertEqual(compiled.grade({second: 'A', first: 'B'}), 16)
+        self.assertEqual(compiled.grade({first: 'A'}, [self.questions[0].id, self.questions[1].id]), 75)
+        # Ids that are no longer in the quiz are ignored
+        self.assertEqual(compiled.grade({first: 'A'}, [self.questions[0].id, 0]), 100)
+
+    def test_editing_a_question_invalidates_on_commit(self):
+        get_compiled_quiz(self.quiz)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.questions[0].correct_answer = 'B'
+            self.questions[0].save()
+            # A reader inside the editing transaction's window keeps the
+            # committed key rather than recompiling the old rows into the cache
+            self.assertIsNotNone(cache.get(_cache_key(self.quiz.id)))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(_cache_key(self.quiz.id)))
+        compiled = get_compiled_quiz(self.quiz)
+        self.assertEqual(compiled.grade({str(self.questions[0].id): 'B'}), 25)
+
+    def test_deleting_a_question_invalidates(self):
+        get_compiled_quiz(self.quiz)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.questions[-1].delete()
+        self.assertEqual(len(get_compiled_quiz(self.quiz).question_ids), 3)
+
+
+class AttemptTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('learner', 'learner@example.com', 'password-1')
+        self.course = make_course(questions=20)
+        self.quiz = self.course.quiz
+        self.quiz.questions_per_attempt = 5
+        self.quiz.save()
+        self.compiled = compile_quiz(self.quiz)
+
+    def test_token_round_trip(self):
+        ids = self.compiled.sample()
+        self.assertEqual(len(set(ids)), 5)
+        token = sign_attempt(self.compiled, self.user.id, ids)
+        self.assertEqual(load_attempt(token, self.compiled, self.user.id, 60), ids)
+
+    def test_missing_foreign_tampered_and_expired_tokens_are_rejected(self):
+        token = sign_attempt(self.compiled, self.user.id, self.compiled.sample())
+        other_quiz = compile_quiz(make_course('other', questions=20).quiz)
+        for bad, compiled, user_id, max_age in [
+            (None, self.compiled, self.user.id, 60),
+            (token, self.compiled, self.user.id + 1, 60),
+            (token, other_quiz, self.user.id, 60),
+            (token[:-2] + 'xx', self.compiled, self.user.id, 60),
+            (token, self.compiled, self.user.id, -1),
+        ]:
+            with self.assertRaises(InvalidAttempt):
+                load_attempt(bad, compiled, user_id, max_age)
+
+    def test_bank_submissions_are_graded_on_the_served_sample(self):
+        self.client.force_login(self.user)
+        quiz = self.client.get(f'/api/courses/{self.course.slug}/quiz/').json()['quiz']
+        self.assertEqual(len(quiz['questions']), 5)
+        self.assertEqual(quiz['bank_size'], 20)
+        served = [q['id'] for q in quiz['questions']]
+        unserved = [q.id for q in self.quiz.questions.exclude(id__in=served)]
+
+        def submit(answers, **extra):
+            return self.client.post(
+                f'/api/courses/{self.course.slug}/submit/',
+                json.dumps({'answers': answers, **extra}), content_type='application/json',
+            )
+
+        answers = {**{str(qid): 'B' for qid in served}, **{str(qid): 'A' for qid in unserved}}
+        self.assertEqual(submit(answers, attempt_token=quiz['attempt_token']).json()['score'], 0)
+        self.assertEqual(submit(answers).status_code, 400)
+
+
+class GradeBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+        self.question_ids = list(self.course.quiz.questions.order_by('id').values_list('id', flat=True))
+        self.users = [
+            CustomUser.objects.create_user(f'candidate{i}', f'candidate{i}@example.com', 'password-1')
+            for i in range(5)
+        ]
+
+    def sheet(self, user, correct):
+        answers = {str(qid): 'A' if i < correct else 'B' for i, qid in enumerate(self.question_ids)}
+        return {'user': user.username, 'course': self.course.slug, 'answers': answers}
+
+    def grade(self, lines, *args, suffix='.jsonl'):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as fh:
+            fh.write(''.join(lines))
+        self.addCleanup(os.unlink, fh.name)
+        out = io.StringIO()
+        call_command('grade_batch', fh.name, *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def jsonl(self, *sheets):
+        return [json.dumps(sheet) + '\n' for sheet in sheets]
+
+    def test_grades_sheets_in_chunks(self):
+        UserProgress.objects.create(user=self.users[0], course=self.course, score=90)
+        sheets = self.jsonl(*(self.sheet(user, correct=i) for i, user in enumerate(self.users)))
+        sheets += ['not json\n', json.dumps({'user': 'nobody', 'course': self.course.slug, 'answers': {}}) + '\n']
+        with self.captureOnCommitCallbacks(execute=True):
+            output = self.grade(sheets, '--chunk-size', '2')
+
+        self.assertIn('Graded 5 sheets (3 passed, 2 skipped)', output)
+        self.assertIn('Progress: 4 created, 1 updated; certificates issued: 3', output)
+        self.assertEqual(UserProgress.objects.get(user=self.users[0]).score, 90)
+        self.assertEqual(UserProgress.objects.get(user=self.users[4]).score, 100)
+        self.assertEqual(set(Certificate.objects.values_list('user__username', flat=True)),
+                         {'candidate2', 'candidate3', 'candidate4'})
+        self.assertEqual(QuizAttempt.objects.count(), 5)
+        stats = CourseStats.objects.get(course=self.course)
+        self.assertEqual((stats.attempts, stats.passes, stats.certificates_issued), (5, 3, 3))
+
+    def test_csv_input(self):
+        sheet = self.sheet(self.users[0], correct=4)
+        answers = json.dumps(sheet['answers']).replace('"', '""')
+        output = self.grade(['user,course,answers\n', f'{sheet["user"]},{sheet["course"]},"{answers}"\n'], suffix='.csv')
+        self.assertIn('Graded 1 sheets (1 passed, 0 skipped)', output)
+        self.assertEqual(UserProgress.objects.get(user=self.users[0]).score, 100)
+
+    def test_rows_written_concurrently_are_merged_not_fatal(self):
+        user = self.users[0]
+        create_progress = UserProgress.objects.bulk_create
+        create_certificates = Certificate.objects.bulk_create
+
+        # An online submission lands between the command's read and its inserts
+        def progress_race(objs, **kwargs):
+            UserProgress.objects.create(user=user, course=self.course, score=95, completed=True,
+                                        completed_at=timezone.now())
+            return create_progress(objs, **kwargs)
+
+        def certificate_race(objs, **kwargs):
+            Certificate.objects.create(user=user, course=self.course, score=95)
+            return create_certificates(objs, **kwargs)
+
+        with mock.patch.object(UserProgress.objects, 'bulk_create', progress_race), \
+                mock.patch.object(Certificate.objects, 'bulk_create', certificate_race):
+            output = self.grade(self.jsonl(self.sheet(user, correct=3)))
+
+        self.assertIn('certificates issued: 0', output)
+        progress = UserProgress.objects.get(user=user, course=self.course)
+        self.assertEqual(progress.score, 95)
+        self.assertTrue(progress.completed)
+        self.assertEqual(Certificate.objects.get(user=user).score, 95)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.python = self.course('python', 'Python Programming', 'Learn to program',
+                                  'variables <script>alert(1)</script> loops')
+        self.chain = self.course('blockchain', 'Blockchain basics', 'Smart contracts in Solidity',
+                                 'python scripts for web3')
+        self.course('legacy', 'Python legacy', 'Retired', 'old', is_active=False)
+
+    def course(self, slug, title, description, body, is_active=True):
+        return Course.objects.create(
+            title=title, slug=slug, description=description, category='ai', difficulty='beginner',
+            duration=10, content=body, is_active=is_active,
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/courses/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_ranks_title_matches_first_and_skips_inactive_courses(self):
+        self.assertEqual([r['slug'] for r in self.search('python')], ['python', 'blockchain'])
+
+    def test_last_word_is_a_prefix_and_snippets_are_escaped(self):
+        results = self.search('solid')
+        self.assertEqual([r['slug'] for r in results], ['blockchain'])
+        self.assertIn('<mark>', results[0]['snippet'])
+        snippets = ' '.join(r['snippet'] for r in self.search('script'))
+        self.assertNotIn('<script>', snippets)
+
+    def test_fts_operators_are_plain_words(self):
+        self.assertEqual(self.search('" OR ( NEAR'), [])
+        self.assertEqual(self.client.get('/api/courses/search/').status_code, 400)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.python.title, self.python.description, self.python.content = 'Rust', 'Systems', 'ownership'
+        self.python.save()
+        self.assertEqual([r['slug'] for r in self.search('python')], ['blockchain'])
+        self.assertEqual([r['slug'] for r in self.search('ownership')], ['python'])
+        self.chain.delete()
+        self.assertEqual(self.search('python'), [])
+
+    def test_results_are_not_stored_in_the_catalogue_cache(self):
+        with mock.patch.object(LocMemCache, 'set') as cache_set:
+            for i in range(20):
+                self.search(f'query {i}')
+        self.assertEqual([call for call in cache_set.call_args_list if call.args[0].startswith('courses:')], [])
+
+
+class RenderedContentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+        self.course.content = '# Title\n\nHello *world* <script>alert(1)</script>'
+        self.course.save()
+        self.url = f'/api/courses/{self.course.slug}/content/'
+
+    def test_markdown_and_html_are_sanitised(self):
+        html = render_content(self.course.content)
+        self.assertIn('<h1>Title</h1>', html)
+        self.assertIn('<em>world</em>', html)
+        self.assertNotIn('<script', html)
+        html = render_content('<p onclick="steal()">Hi <a href="https://example.com">link</a></p>')
+        self.assertNotIn('onclick', html)
+        self.assertIn('rel="noopener noreferrer"', html)
+
+    def test_rendered_once_per_update(self):
+        first = get_rendered_content(self.course)
+        with mock.patch('courses.rendering.render_content') as render:
+            self.assertEqual(get_rendered_content(self.course), first)
+        render.assert_not_called()
+        self.course.content = 'Changed'
+        self.course.save()
+        self.assertIn('Changed', get_rendered_content(self.course)['html'])
+
+    def test_gzip_for_clients_that_accept_it(self):
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn(b'<em>world</em>', gzip.decompress(compressed.content))
+        plain = self.client.get(self.url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn(b'<em>world</em>', plain.content)
+        self.assertEqual(json.loads(content(self.client.get(f'/api/courses/{self.course.slug}/')))
+                         ['course']['content_html'], plain.content.decode())
+
+    def test_each_encoding_has_its_own_etag(self):
+        plain = self.client.get(self.url)
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotEqual(plain['ETag'], compressed['ETag'])
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        self.assertEqual(self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip',
+                                         HTTP_IF_NONE_MATCH=plain['ETag']).status_code, 200)
+        not_modified = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Accept-Encoding', not_modified['Vary'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_MAX_LAG=30)
+class CatalogueReplicaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+        self.version = bump_catalogue_version()
+
+    def later(self, seconds):
+        return mock.patch('courses.cache.time.time', return_value=self.version / 1000 + seconds)
+
+    def test_changed_recently_lasts_for_the_replica_lag(self):
+        with self.later(29):
+            self.assertTrue(catalogue_changed_recently(None))
+        with self.later(31):
+            self.assertFalse(catalogue_changed_recently(None))
+
+    def test_reads_stay_on_the_primary_until_replicas_can_have_the_change(self):
+        # The replica is stood in for by the primary; only the choice is checked
+        with mock.patch('backend.routers.random.choice', return_value='default') as choose:
+            with self.later(5):
+                content(self.client.get('/api/courses/'))
+                content(self.client.get(f'/api/courses/{self.course.slug}/'))
+            choose.assert_not_called()
+            with self.later(60):
+                content(self.client.get('/api/courses/'))
+                content(self.client.get(f'/api/courses/{self.course.slug}/'))
+            self.assertEqual(choose.call_count, 2)
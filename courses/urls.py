@@ -7,8 +7,13 @@ app_name = 'courses'
 
 urlpatterns = [
     path('', views.course_list, name='list'),
+    path('search/', views.course_search, name='search'),
+    path('stats/', views.course_stats_bulk, name='stats_bulk'),
+    # Must precede <slug:slug>/, which would otherwise capture it
+    path('progress/', views.user_progress, name='progress'),
     path('<slug:slug>/', views.course_detail, name='detail'),
+    path('<slug:slug>/content/', views.course_content, name='content'),
+    path('<slug:slug>/stats/', views.course_stats, name='stats'),
     path('<slug:slug>/quiz/', views.quiz_view, name='quiz'),
     path('<slug:slug>/submit/', views.submit_quiz, name='submit'),
-    path('progress/', views.user_progress, name='progress'),
 ]
\ No newline at end of file
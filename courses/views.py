@@ -1,135 +1,267 @@
 # courses/views.py
 
-from django.shortcuts import render, get_object_or_404
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Value
+from django.db.models.functions import Greatest
+from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
-from .models import Course, Quiz, Question, UserProgress
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+from .cache import cache_stream, cached_json_response, catalogue_changed_recently, catalogue_etag, payload_key
+from .grading import InvalidAttempt, aget_compiled_quiz, aload_questions, load_attempt, sign_attempt
+from .models import Course, CourseStats, Quiz, QuizAttempt, UserProgress
+from .pagination import InvalidCursor, KeysetPage, get_page_size
+from .rendering import accepts_gzip, aget_rendered_content, content_etag
+from .search import search_courses
+from .stats import STATS_FIELDS, record_attempt, stats_payload
+from backend.routers import replica_reads
+from backend.sqlite import aserialized_write
+from backend.streaming import StreamingJsonResponse, stream_items
+from backend.throttling import concurrency_limit, throttle
 from certificates.models import Certificate
 import json
 
-def course_list(request):
-    """List all active courses"""
+COURSE_LIST_FIELDS = (
+    'id', 'title', 'slug', 'description', 'category', 'difficulty', 'duration',
+)
+
+@condition(etag_func=catalogue_etag)
+@replica_reads(unless=catalogue_changed_recently)
+async def course_list(request):
+    """List active courses, one keyset page at a time"""
+    category = request.GET.get('category')
+    difficulty = request.GET.get('difficulty')
+    
+    if category and category not in dict(Course.CATEGORY_CHOICES):
+        return JsonResponse({'error': 'Unknown category'}, status=400)
+    if difficulty and difficulty not in dict(Course.DIFFICULTY_CHOICES):
+        return JsonResponse({'error': 'Unknown difficulty'}, status=400)
+    
+    page_size = get_page_size(request.GET.get('page_size'))
+    cursor = request.GET.get('cursor')
+    
+    key = payload_key('list', (category, difficulty, page_size, cursor))
+    content = cache.get(key)
+    if content is not None:
+        return HttpResponse(content, content_type='application/json')
+    
     courses = Course.objects.filter(is_active=True)
+    if category:
+        courses = courses.filter(category=category)
+    if difficulty:
+        courses = courses.filter(difficulty=difficulty)
+    
+    try:
+        page = KeysetPage(courses.values(*COURSE_LIST_FIELDS, 'created_at'), cursor, page_size)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
-    courses_data = [{
-        'id': course.id,
-        'title': course.title,
-        'slug': course.slug,
-        'description': course.description,
-        'category': course.category,
-        'difficulty': course.difficulty,
-        'duration': course.duration,
-    } for course in courses]
+    response = StreamingJsonResponse(
+        'courses',
+        stream_items(request, page, lambda row: {field: row[field] for field in COURSE_LIST_FIELDS}),
+        tail=lambda: {'next_cursor': page.next_cursor, 'page_size': page_size},
+    )
+    response.streaming_content = cache_stream(key, response.streaming_content)
+    return response
+
+# ETag revalidation only: arbitrary queries are not stored server-side,
+# where they would evict the cached catalogue payloads
+@condition(etag_func=catalogue_etag)
+async def course_search(request):
+    """Full-text search over active courses, best matches first"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'Query parameter q is required'}, status=400)
+    limit = get_page_size(request.GET.get('limit'))
     
-    return JsonResponse({'courses': courses_data})
+    results = await sync_to_async(search_courses)(query, limit)
+    return JsonResponse({'query': query, 'results': results})
 
-def course_detail(request, slug):
+@condition(etag_func=catalogue_etag)
+@replica_reads(unless=catalogue_changed_recently)
+async def course_detail(request, slug):
     """Get course details"""
-    course = get_object_or_404(Course, slug=slug)
+    async def build():
+        course = await aget_object_or_404(Course, slug=slug)
+        
+        course_data = {
+            'id': course.id,
+            'title': course.title,
+            'slug': course.slug,
+            'description': course.description,
+            'category': course.category,
+            'difficulty': course.difficulty,
+            'duration': course.duration,
+            'content': course.content,
+            'content_html': (await aget_rendered_content(course))['html'],
+        }
+        
+        return {'course': course_data}, 200
     
-    course_data = {
-        'id': course.id,
-        'title': course.title,
-        'slug': course.slug,
-        'description': course.description,
-        'category': course.category,
-        'difficulty': course.difficulty,
-        'duration': course.duration,
-        'content': course.content,
-    }
+    return await cached_json_response('detail', (slug,), build)
+
+# Outermost, so 304s from condition() carry Vary too
+@vary_on_headers('Accept-Encoding')
+@condition(etag_func=content_etag)
+async def course_content(request, slug):
+    """Rendered course content as HTML, pre-gzipped for clients that accept it"""
+    course = await aget_object_or_404(Course.objects.only('id', 'content', 'updated_at'), slug=slug)
+    rendered = await aget_rendered_content(course)
     
-    return JsonResponse({'course': course_data})
+    if accepts_gzip(request):
+        response = HttpResponse(rendered['gzip'], content_type='text/html; charset=utf-8')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(rendered['html'], content_type='text/html; charset=utf-8')
+    return response
+
+async def course_stats(request, slug):
+    """Attempt, pass-rate and certificate counters for one course"""
+    row = await Course.objects.filter(slug=slug).values(*(f'stats__{f}' for f in STATS_FIELDS)).afirst()
+    if row is None:
+        return JsonResponse({'error': 'Course not found'}, status=404)
+    stats = CourseStats(**{f: row[f'stats__{f}'] or 0 for f in STATS_FIELDS})
+    return JsonResponse({'slug': slug, 'stats': stats_payload(stats)})
+
+async def course_stats_bulk(request):
+    """Stats for several courses at once (?slugs=a,b,c), for catalogue cards"""
+    slugs = list(dict.fromkeys(s for s in request.GET.get('slugs', '').split(',') if s))
+    if not slugs:
+        return JsonResponse({'error': 'slugs parameter required'}, status=400)
+    if len(slugs) > getattr(settings, 'COURSE_LIST_MAX_PAGE_SIZE', 100):
+        return JsonResponse({'error': 'Too many slugs'}, status=400)
+    
+    rows = CourseStats.objects.filter(course__slug__in=slugs).values('course__slug', *STATS_FIELDS)
+    found = {row.pop('course__slug'): CourseStats(**row) async for row in rows}
+    return JsonResponse({'stats': {slug: stats_payload(found.get(slug)) for slug in slugs}})
 
 @login_required
-def quiz_view(request, slug):
+async def quiz_view(request, slug):
     """Get quiz questions for a course"""
-    course = get_object_or_404(Course, slug=slug)
+    course = await aget_object_or_404(Course.objects.only('id'), slug=slug)
+    quiz = await Quiz.objects.filter(course=course).afirst()
+    if quiz is None:
+        return JsonResponse({'error': 'No quiz found for this course'}, status=404)
+    
+    compiled = await aget_compiled_quiz(quiz)
+    if not compiled.is_bank:
+        return JsonResponse({'quiz': compiled.payload})
     
+    # Question bank: a fresh sample per request, loaded by primary key
+    question_ids = compiled.sample()
+    user = await request.auser()
+    return JsonResponse({'quiz': {
+        **compiled.payload,
+        'questions': await aload_questions(question_ids),
+        'attempt_token': sign_attempt(compiled, user.id, question_ids),
+    }})
+
+def _attempt_max_age(quiz):
+    """Seconds an attempt token stays valid: the time limit plus a grace period"""
+    return quiz.time_limit * 60 + getattr(settings, 'QUIZ_ATTEMPT_GRACE', 5 * 60)
+
+def _save_progress(user, course, score, passed, now):
+    """
+    Upsert the learner's progress row: keep the best score and mark it
+    completed on a pass. One UPDATE when the row exists; a concurrent
+    first attempt that loses the INSERT race falls back to the UPDATE.
+    """
+    values = {'score': Greatest('score', Value(score))}
+    if passed:
+        values.update(completed=True, completed_at=now)
+    
+    rows = UserProgress.objects.filter(user=user, course=course)
+    if rows.update(**values):
+        return
     try:
-        quiz = course.quiz
-        questions = quiz.questions.all()
-        
-        questions_data = [{
-            'id': q.id,
-            'question_text': q.question_text,
-            'option_a': q.option_a,
-            'option_b': q.option_b,
-            'option_c': q.option_c,
-            'option_d': q.option_d,
-            'points': q.points,
-        } for q in questions]
-        
-        return JsonResponse({
-            'quiz': {
-                'passing_score': quiz.passing_score,
-                'time_limit': quiz.time_limit,
-                'questions': questions_data
-            }
-        })
-    except Quiz.DoesNotExist:
-        return JsonResponse({'error': 'No quiz found for this course'}, status=404)
+        with transaction.atomic():
+            UserProgress.objects.create(
+                user=user,
+                course=course,
+                score=score,
+                completed=passed,
+                completed_at=now if passed else None,
+            )
+    except IntegrityError:
+        rows.update(**values)
+
+def _issue_certificate(user, course, score):
+    """
+    Return (certificate id, created) for (user, course), creating the
+    certificate on the first pass
+    """
+    existing = Certificate.objects.filter(user=user, course=course).values_list('certificate_id', flat=True)
+    certificate_id = existing.first()
+    if certificate_id is not None:
+        return certificate_id, False
+    try:
+        with transaction.atomic():
+            return Certificate.objects.create(user=user, course=course, score=score).certificate_id, True
+    except IntegrityError:
+        # A concurrent submission issued it first
+        return existing.get(), False
+
+def _record_submission(user, course, score, passed):
+    """
+    Write everything a graded submission changes in one transaction.
+    Returns the certificate id when the learner passed.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        QuizAttempt.objects.create(user=user, course=course, score=score, passed=passed, submitted_at=now)
+        _save_progress(user, course, score, passed, now)
+        certificate_id, issued = _issue_certificate(user, course, score) if passed else (None, False)
+        record_attempt(course.id, score, passed, certificate_issued=issued)
+    return certificate_id
 
 @csrf_exempt
 @login_required
-def submit_quiz(request, slug):
+@throttle('submit', methods=['POST'])
+@concurrency_limit('submit')
+async def submit_quiz(request, slug):
     """Submit quiz answers and calculate score"""
     if request.method != 'POST':
         return JsonResponse({'error': 'POST method required'}, status=405)
     
-    course = get_object_or_404(Course, slug=slug)
-    quiz = get_object_or_404(Quiz, course=course)
+    # Course and quiz in a single query
+    quiz = await aget_object_or_404(Quiz.objects.select_related('course'), course__slug=slug)
+    course = quiz.course
+    user = await request.auser()
     
     try:
         data = json.loads(request.body)
         answers = data.get('answers', {})  # {question_id: answer}
         
-        # Calculate score
-        total_points = 0
-        earned_points = 0
+        # Calculate score against the cached answer key, counting only the
+        # questions this learner was served
+        compiled = await aget_compiled_quiz(quiz)
+        served = None
+        if compiled.is_bank:
+            try:
+                served = load_attempt(data.get('attempt_token'), compiled, user.id, _attempt_max_age(quiz))
+            except InvalidAttempt as e:
+                return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        score = compiled.grade(answers, served)
+        passed = compiled.passed(score)
         
-        for question in quiz.questions.all():
-            total_points += question.points
-            user_answer = answers.get(str(question.id))
-            
-            if user_answer == question.correct_answer:
-                earned_points += question.points
-        
-        score = int((earned_points / total_points) * 100) if total_points > 0 else 0
-        passed = score >= quiz.passing_score
-        
-        # Update or create user progress
-        progress, created = UserProgress.objects.get_or_create(
-            user=request.user,
-            course=course,
-            defaults={'score': score}
-        )
-        
-        if not created:
-            progress.score = max(progress.score, score)
+        # Transactions are not available to async code
+        certificate_id = await aserialized_write(_record_submission, user, course, score, passed)
         
         if passed:
-            progress.completed = True
-            progress.completed_at = timezone.now()
-            progress.save()
-            
-            # Create certificate
-            certificate, cert_created = Certificate.objects.get_or_create(
-                user=request.user,
-                course=course,
-                defaults={'score': score}
-            )
-            
             return JsonResponse({
                 'success': True,
                 'passed': True,
                 'score': score,
-                'certificate_id': certificate.certificate_id,
+                'certificate_id': certificate_id,
                 'message': 'Congratulations! You passed!'
             })
         else:
-            progress.save()
             return JsonResponse({
                 'success': True,
                 'passed': False,
@@ -143,20 +275,26 @@ def submit_quiz(request, slug):
             'message': str(e)
         }, status=400)
 
-@login_required
-def user_progress(request):
-    """Get user's progress across all courses"""
-    progress = UserProgress.objects.filter(user=request.user).select_related('course')
-    
-    progress_data = [{
+def progress_values(user):
+    """A user's progress rows, as .values() dicts for progress_item"""
+    return UserProgress.objects.filter(user=user).values(
+        'course__title', 'course__slug', 'completed', 'score', 'started_at', 'completed_at',
+    )
+
+def progress_item(p):
+    return {
         'course': {
-            'title': p.course.title,
-            'slug': p.course.slug,
+            'title': p['course__title'],
+            'slug': p['course__slug'],
         },
-        'completed': p.completed,
-        'score': p.score,
-        'started_at': p.started_at.isoformat(),
-        'completed_at': p.completed_at.isoformat() if p.completed_at else None
-    } for p in progress]
-    
-    return JsonResponse({'progress': progress_data})
\ No newline at end of file
+        'completed': p['completed'],
+        'score': p['score'],
+        'started_at': p['started_at'].isoformat(),
+        'completed_at': p['completed_at'].isoformat() if p['completed_at'] else None
+    }
+
+@login_required
+async def user_progress(request):
+    """Get user's progress across all courses"""
+    progress = progress_values(await request.auser())
+    return StreamingJsonResponse('progress', stream_items(request, progress, progress_item))
@@ -0,0 +1,51 @@
+# users/backends.py
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def user_cache_key(user_id):
+    return f'users:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that serves the per-request user lookup from the cache.
+
+    AuthenticationMiddleware calls get_user() on every authenticated
+    request; with the user cached (and sessions on cached_db) a warm
+    request reaches the view without touching the database. Entries are
+    dropped on CustomUser save/delete and on logout (see users.signals),
+    so profile, password and is_active changes apply on the next request.
+    """
+
+    def _timeout(self):
+        return getattr(settings, 'USER_CACHE_TIMEOUT', 300)
+
+    def _usable(self, user):
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            # Unknown or inactive users are not cached; they are rare and
+            # should not linger once fixed
+            if user is not None:
+                cache.set(key, user, self._timeout())
+        return self._usable(user)
+
+    async def aget_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(key, user, self._timeout())
+        return self._usable(user)
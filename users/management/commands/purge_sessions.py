@@ -0,0 +1,50 @@
+# users/management/commands/purge_sessions.py
+
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in small chunks so the sessions table is never locked for long'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Sessions deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between chunks, leaving room for other writers')
+        parser.add_argument('--dry-run', action='store_true', help='Count expired sessions only')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1 or options['pause'] < 0:
+            raise CommandError('--chunk-size must be positive and --pause not negative')
+
+        # Fixed up front so sessions expiring mid-run wait for the next run
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        if options['dry_run']:
+            self.stdout.write(f'Would delete {expired.count()} expired sessions')
+            return
+
+        deleted = 0
+        started = time.perf_counter()
+        while True:
+            # Each chunk is its own short autocommit write: select a batch of
+            # keys through the expire_date index, then delete them by key
+            keys = list(expired.values_list('session_key', flat=True)[:chunk_size])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {deleted} sessions deleted')
+            if len(keys) < chunk_size:
+                break
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} expired sessions in {time.perf_counter() - started:.2f}s'
+        ))
@@ -25,4 +25,8 @@ class CustomUser(AbstractUser):
     
     class Meta:
         verbose_name = 'User'
-        verbose_name_plural = 'Users'
\ No newline at end of file
+        verbose_name_plural = 'Users'
+        indexes = [
+            # register_user checks for an existing email on every signup
+            models.Index(fields=['email'], name='user_email_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,20 @@
+# users/signals.py
+
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_cached_user
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out_user(sender, user, **kwargs):
+    if user is not None:
+        invalidate_cached_user(user.pk)
@@ -1,3 +1,79 @@
-from django.test import TestCase
+# users/tests.py
 
-# Create your tests here.
+import json
+
+from django.contrib.auth import get_user
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, TransactionTestCase
+
+from .backends import CachedModelBackend, user_cache_key
+from .models import CustomUser
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('learner', 'learner@example.com', 'password-1')
+
+    def test_get_user_is_served_from_the_cache(self):
+        backend = CachedModelBackend()
+        with self.assertNumQueries(1):
+            self.assertEqual(backend.get_user(self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(backend.get_user(self.user.pk), self.user)
+        self.assertIsNone(backend.get_user(self.user.pk + 1))
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk + 1)))
+
+    def test_saving_or_deleting_drops_the_cached_user(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.assertIsNone(backend.get_user(self.user.pk))
+        self.user.delete()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    def test_warm_requests_load_the_user_without_queries(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/users/profile/').json()['username'], 'learner')
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user(request), self.user)
+
+    def test_profile_changes_apply_on_the_next_request(self):
+        self.client.force_login(self.user)
+        self.client.get('/api/users/profile/')
+        response = self.client.post('/api/users/update-wallet/', json.dumps({'wallet_address': '0xabc'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/users/profile/').json()['wallet_address'], '0xabc')
+
+    def test_logout_drops_the_cached_user(self):
+        self.client.force_login(self.user)
+        self.client.get('/api/users/profile/')
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+        self.assertEqual(self.client.get('/api/users/logout/').status_code, 200)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.assertEqual(self.client.get('/api/users/profile/').status_code, 302)
+
+
+# Register and login hash passwords on the offload pool, whose connections
+# cannot see a TestCase transaction
+class AuthViewTests(TransactionTestCase):
+    def post(self, path, **data):
+        return self.client.post(path, json.dumps(data), content_type='application/json')
+
+    def test_register_then_login(self):
+        response = self.post('/api/users/register/', username='learner', email='learner@example.com',
+                             password='password-1')
+        self.assertTrue(response.json()['success'])
+        duplicate = self.post('/api/users/register/', username='learner', email='other@example.com',
+                              password='password-1')
+        self.assertEqual(duplicate.status_code, 400)
+
+        self.assertEqual(self.post('/api/users/login/', username='learner', password='wrong').status_code, 401)
+        response = self.post('/api/users/login/', username='learner', password='password-1')
+        self.assertEqual(response.json()['email'], 'learner@example.com')
+        self.assertEqual(self.client.get('/api/users/profile/').json()['username'], 'learner')
@@ -1,16 +1,20 @@
 # users/views.py
 
 from django.shortcuts import render, redirect
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import alogin, alogout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from backend.offload import offload
+from backend.throttling import concurrency_limit, throttle
 from .models import CustomUser
 import json
 
 @csrf_exempt
-def register_user(request):
+@throttle('register', methods=['POST'])
+@concurrency_limit('auth')
+async def register_user(request):
     """Handle user registration"""
     if request.method == 'POST':
         try:
@@ -20,21 +24,21 @@ def register_user(request):
             password = data.get('password')
             
             # Check if username exists
-            if CustomUser.objects.filter(username=username).exists():
+            if await CustomUser.objects.filter(username=username).aexists():
                 return JsonResponse({
                     'success': False,
                     'message': 'Username already exists'
                 }, status=400)
             
             # Check if email exists
-            if CustomUser.objects.filter(email=email).exists():
+            if await CustomUser.objects.filter(email=email).aexists():
                 return JsonResponse({
                     'success': False,
                     'message': 'Email already registered'
                 }, status=400)
             
-            # Create user
-            user = CustomUser.objects.create_user(
+            # Create user; hashing the password is CPU-bound
+            user = await offload(CustomUser.objects.create_user)(
                 username=username,
                 email=email,
                 password=password
@@ -54,7 +58,9 @@ def register_user(request):
     return JsonResponse({'error': 'POST method required'}, status=405)
 
 @csrf_exempt
-def login_user(request):
+@throttle('login', methods=['POST'])
+@concurrency_limit('auth')
+async def login_user(request):
     """Handle user login"""
     if request.method == 'POST':
         try:
@@ -62,10 +68,11 @@ def login_user(request):
             username = data.get('username')
             password = data.get('password')
             
-            user = authenticate(request, username=username, password=password)
+            # PBKDF2 runs on the bounded CPU pool, not the event loop
+            user = await offload(authenticate)(request, username=username, password=password)
             
             if user is not None:
-                login(request, user)
+                await alogin(request, user)
                 return JsonResponse({
                     'success': True,
                     'message': 'Login successful',
@@ -86,15 +93,15 @@ def login_user(request):
     return JsonResponse({'error': 'POST method required'}, status=405)
 
 @login_required
-def logout_user(request):
+async def logout_user(request):
     """Handle user logout"""
-    logout(request)
+    await alogout(request)
     return JsonResponse({'success': True, 'message': 'Logged out successfully'})
 
 @login_required
-def user_profile(request):
+async def user_profile(request):
     """Get user profile"""
-    user = request.user
+    user = await request.auser()
     return JsonResponse({
         'username': user.username,
         'email': user.email,
@@ -105,16 +112,16 @@ def user_profile(request):
 
 @csrf_exempt
 @login_required
-def update_wallet(request):
+async def update_wallet(request):
     """Update user's wallet address"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             wallet_address = data.get('wallet_address')
             
-            user = request.user
+            user = await request.auser()
             user.wallet_address = wallet_address
-            user.save()
+            await user.asave()
             
             return JsonResponse({
                 'success': True,